@@ -0,0 +1,380 @@
+"""Composite LLM that fails over (and optionally hedges) across providers.
+
+FailoverLLM wraps an ordered list of LLMs. Each call gets a timeout; on error
+or timeout the next provider is tried. With hedging on, a second provider is
+started when the first one has not answered within its p95 latency, and the
+first answer to arrive wins. A per-provider circuit breaker skips providers
+that keep failing until a cool-down has passed.
+
+Streaming calls fail over only until the first chunk arrives; sync calls fail
+over without hedging.
+
+Latency, tokens, errors and trace spans of the provider calls are recorded
+by LLM.instrumentation, from the events and spans of each provider client.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.llm import LLM
+
+from commons.stats import register_stats
+
+logger = logging.getLogger(__name__)
+
+_instances: List["FailoverLLM"] = []
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. Once `reset_timeout` has
+    passed it is half open and admits a single probe call at a time; the
+    probe's outcome closes it or re-opens it for another cool-down.
+    """
+
+    def __init__(self, threshold: int = 3, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        """Whether allow() would admit a call, without admitting it."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def allow(self) -> bool:
+        """Admit a call; in half_open the admitted call is the probe."""
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.probing = True
+        return True
+
+    def release(self) -> None:
+        """Give back a probe that ended without an outcome (cancelled)."""
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold or self.state == "half_open":
+            # A failed probe re-opens the breaker for another cool-down
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class _Backend:
+    def __init__(self, name: str, llm: LLM, breaker: CircuitBreaker):
+        self.name = name
+        self.llm = llm
+        self.breaker = breaker
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.calls = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def success(self, elapsed: float) -> None:
+        self.calls += 1
+        self.latencies.append(elapsed)
+        self.breaker.record_success()
+
+    def failure(self, error: BaseException) -> None:
+        self.calls += 1
+        self.failures += 1
+        self.last_error = repr(error)[:200]
+        self.breaker.record_failure()
+        logger.warning("LLM %s failed: %s", self.name, self.last_error)
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "breaker": self.breaker.state,
+            "latency_ms_p50": round(1000 * ordered[len(ordered) // 2], 1) if ordered else 0.0,
+            "latency_ms_p95": round(1000 * ordered[int(len(ordered) * 0.95) - 1], 1)
+            if ordered else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class FailoverLLM(LLM):
+    """LLM that tries several providers in order, with optional hedging."""
+
+    timeout: float = Field(default=30.0, description="Seconds allowed per provider call.")
+    hedge: bool = Field(default=False, description="Start a second provider on slow calls.")
+    hedge_delay: float = Field(
+        default=3.0, description="Hedge delay until a provider has enough latency samples."
+    )
+
+    _backends: List[_Backend] = PrivateAttr()
+    _stats: Dict[str, int] = PrivateAttr()
+
+    def __init__(
+        self,
+        llms: Sequence[Tuple[str, LLM]],
+        breaker_threshold: int = 3,
+        breaker_reset: float = 30.0,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            llms (Sequence[Tuple[str, LLM]]): (name, llm) pairs in preference order
+            breaker_threshold (int): Consecutive failures that open a provider's breaker
+            breaker_reset (float): Seconds before an open breaker lets a probe through
+            **kwargs: timeout, hedge, hedge_delay and the usual LLM fields
+        """
+        if not llms:
+            raise ValueError("FailoverLLM needs at least one LLM")
+        super().__init__(**kwargs)
+        self._backends = [
+            _Backend(name, llm, CircuitBreaker(breaker_threshold, breaker_reset))
+            for name, llm in llms
+        ]
+        self._stats = {"failovers": 0, "hedges": 0, "hedge_wins": 0, "exhausted": 0}
+        _instances.append(self)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FailoverLLM"
+
+    @property
+    def name(self) -> str:
+        return " > ".join(backend.name for backend in self._backends)
+
+    @property
+    def primary(self) -> LLM:
+        """First LLM of the chain, the one serving calls while it is healthy."""
+        return self._backends[0].llm
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        primary = self.primary.metadata
+        return LLMMetadata(
+            context_window=min(b.llm.metadata.context_window for b in self._backends),
+            num_output=primary.num_output,
+            is_chat_model=primary.is_chat_model,
+            is_function_calling_model=False,
+            model_name=self.name,
+        )
+
+    def _candidates(self) -> Tuple[List[_Backend], bool]:
+        """Backends to try in order, and whether their breakers are bypassed."""
+        allowed = [backend for backend in self._backends if backend.breaker.available()]
+        if allowed:
+            return allowed, False
+        # Every breaker open: trying anyway beats failing without a call
+        return list(self._backends), True
+
+    @staticmethod
+    def _admit(backend: _Backend, forced: bool) -> Tuple[bool, bool]:
+        """Ask the backend's breaker for a call: (admitted, is the half-open probe)."""
+        if forced:
+            return True, False
+        probe = backend.breaker.state == "half_open"
+        return backend.breaker.allow(), probe
+
+    def _no_backend(self, last_error: Optional[BaseException]) -> BaseException:
+        self._stats["exhausted"] += 1
+        # No call was made when concurrent calls took every half-open probe
+        return last_error or RuntimeError(f"No LLM of {self.name} is available")
+
+    def _hedge_after(self, backend: _Backend) -> float:
+        return min(backend.p95() or self.hedge_delay, self.timeout)
+
+    async def _arun(self, call: Callable[[LLM], Awaitable[Any]]) -> Any:
+        candidates, forced = self._candidates()
+        pending: Dict[asyncio.Task, Tuple[_Backend, float, bool]] = {}
+        next_index = 0
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            nonlocal next_index
+            while next_index < len(candidates):
+                backend = candidates[next_index]
+                next_index += 1
+                admitted, probe = self._admit(backend, forced)
+                if not admitted:
+                    continue
+                task = asyncio.create_task(asyncio.wait_for(call(backend.llm), self.timeout))
+                pending[task] = (backend, time.perf_counter(), probe)
+                return
+
+        launch()
+        try:
+            while pending:
+                wait_timeout = None
+                if self.hedge and not hedged and next_index < len(candidates):
+                    first_backend, first_started, _ = next(iter(pending.values()))
+                    wait_timeout = max(
+                        0.0,
+                        self._hedge_after(first_backend) - (time.perf_counter() - first_started),
+                    )
+                done, _ = await asyncio.wait(
+                    pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    self._stats["hedges"] += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    backend, started, _ = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        backend.failure(e)
+                        last_error = e
+                        continue
+                    backend.success(time.perf_counter() - started)
+                    if backend is not candidates[0]:
+                        self._stats["hedge_wins" if hedged else "failovers"] += 1
+                    return result
+
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            for task, (backend, _, probe) in pending.items():
+                task.cancel()
+                if probe:
+                    backend.breaker.release()
+
+        raise self._no_backend(last_error)
+
+    def _run(self, call: Callable[[LLM], Any]) -> Any:
+        last_error: Optional[BaseException] = None
+        candidates, forced = self._candidates()
+        for backend in candidates:
+            admitted, _ = self._admit(backend, forced)
+            if not admitted:
+                continue
+            started = time.perf_counter()
+            try:
+                result = call(backend.llm)
+            except Exception as e:
+                backend.failure(e)
+                last_error = e
+                continue
+            backend.success(time.perf_counter() - started)
+            if backend is not candidates[0]:
+                self._stats["failovers"] += 1
+            return result
+        raise self._no_backend(last_error)
+
+    async def _astream(self, open_stream: Callable[[LLM], Awaitable[Any]]):
+        last_error: Optional[BaseException] = None
+        candidates, forced = self._candidates()
+        for backend in candidates:
+            admitted, probe = self._admit(backend, forced)
+            if not admitted:
+                continue
+            started = time.perf_counter()
+            try:
+                stream = await asyncio.wait_for(open_stream(backend.llm), self.timeout)
+                try:
+                    first = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    first = None
+            except asyncio.CancelledError:
+                if probe:
+                    backend.breaker.release()
+                raise
+            except Exception as e:
+                backend.failure(e)
+                last_error = e
+                continue
+            backend.success(time.perf_counter() - started)
+            if backend is not candidates[0]:
+                self._stats["failovers"] += 1
+
+            async def gen(first=first, stream=stream):
+                if first is None:
+                    return
+                yield first
+                async for chunk in stream:
+                    yield chunk
+
+            return gen()
+        raise self._no_backend(last_error)
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._run(lambda llm: llm.chat(messages, **kwargs))
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._run(lambda llm: llm.complete(prompt, formatted=formatted, **kwargs))
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._run(lambda llm: llm.stream_chat(messages, **kwargs))
+
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        return self._run(lambda llm: llm.stream_complete(prompt, formatted=formatted, **kwargs))
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._arun(lambda llm: llm.achat(messages, **kwargs))
+
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return await self._arun(lambda llm: llm.acomplete(prompt, formatted=formatted, **kwargs))
+
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        return await self._astream(lambda llm: llm.astream_chat(messages, **kwargs))
+
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        return await self._astream(
+            lambda llm: llm.astream_complete(prompt, formatted=formatted, **kwargs)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "hedge": self.hedge,
+            "providers": {backend.name: backend.stats() for backend in self._backends},
+        }
+
+
+register_stats(
+    "llm_failover", lambda: {instance.name: instance.stats() for instance in _instances}
+)
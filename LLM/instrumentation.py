@@ -0,0 +1,132 @@
+"""LLM latency, token and trace-span recording from llama-index instrumentation events.
+
+Every provider client (Gemini, DeepSeek, Anthropic, ...) dispatches start,
+in-progress (one per stream chunk) and end events around each chat and
+completion call. The events are handled here, so all calls are measured,
+whether they come from a bare client (the default, without LLM_FALLBACKS)
+or from inside a FailoverLLM. FailoverLLM does not dispatch these events
+itself, so no call is counted twice.
+
+A call's latency is the time to its end event, or to its first chunk for
+streams. Its trace span ("llm" in the request breakdown) lasts until the
+end event. For streams that includes the time the agent spends on each
+chunk, which is small next to the provider's.
+
+Errors are seen by a span handler: a call whose span is dropped with an
+exception is counted in LLM_ERRORS. Calls cancelled by their caller (a
+FailoverLLM timeout or a hedge that lost) are not provider errors and are
+only forgotten. Errors raised while a stream is being consumed happen after
+the span has closed and are not counted.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatInProgressEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionInProgressEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.instrumentation.span_handlers import BaseSpanHandler
+
+from commons.logger import record_span
+from commons.metrics import observe_llm_call, observe_llm_error, observe_llm_tokens
+
+# Calls that never reach their end event (a stream that failed or was
+# abandoned midway) are forgotten past this many
+MAX_OPEN_CALLS = 1024
+
+_START_EVENTS = (LLMChatStartEvent, LLMCompletionStartEvent)
+_PROGRESS_EVENTS = (LLMChatInProgressEvent, LLMCompletionInProgressEvent)
+_END_EVENTS = (LLMChatEndEvent, LLMCompletionEndEvent)
+
+
+def backend_name(model_dict: Dict[str, Any]) -> str:
+    """"provider:model" of a client, e.g. "gemini:models/gemini-2.0-flash"."""
+    provider = str(model_dict.get("class_name") or "llm").lower().replace("_llm", "")
+    model = model_dict.get("model") or model_dict.get("model_name") or provider
+    return f"{provider}:{model}"
+
+
+class LLMCallTracker(BaseEventHandler):
+    """Times LLM calls between their start and end events, by span id."""
+
+    # span id -> (backend name, started, first chunk seen)
+    open_calls: Dict[str, Tuple[str, float, bool]] = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMCallTracker"
+
+    def handle(self, event, **kwargs) -> None:
+        key = event.span_id
+        if key is None:
+            return
+        if isinstance(event, _START_EVENTS):
+            if len(self.open_calls) >= MAX_OPEN_CALLS:
+                del self.open_calls[next(iter(self.open_calls))]
+            name = backend_name(event.model_dict or {})
+            self.open_calls[key] = (name, time.perf_counter(), False)
+        elif isinstance(event, _PROGRESS_EVENTS):
+            call = self.open_calls.get(key)
+            if call is not None and not call[2]:
+                name, started, _ = call
+                observe_llm_call(name, time.perf_counter() - started)
+                self.open_calls[key] = (name, started, True)
+        elif isinstance(event, _END_EVENTS):
+            call = self.open_calls.pop(key, None)
+            if call is None:
+                return
+            name, started, streamed = call
+            elapsed = time.perf_counter() - started
+            record_span("llm", name, elapsed, stream=streamed)
+            if not streamed:
+                observe_llm_call(name, elapsed, event.response)
+            elif event.response is not None:
+                # Providers report usage on the last chunk
+                observe_llm_tokens(name, event.response)
+
+
+class LLMErrorTracker(BaseSpanHandler[Any]):
+    """Counts LLM calls whose span is dropped with an error."""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LLMErrorTracker"
+
+    def new_span(self, id_: str, bound_args: Any, instance: Optional[Any] = None, **kwargs) -> None:
+        return None
+
+    def prepare_to_exit_span(
+        self, id_: str, bound_args: Any, instance: Optional[Any] = None, **kwargs
+    ) -> None:
+        return None
+
+    def prepare_to_drop_span(
+        self,
+        id_: str,
+        bound_args: Any,
+        instance: Optional[Any] = None,
+        err: Optional[BaseException] = None,
+        **kwargs,
+    ) -> None:
+        # Only spans with an open call are LLM calls
+        call = LLMCallTracker.open_calls.pop(id_, None)
+        if call is None or err is None or isinstance(err, asyncio.CancelledError):
+            return None
+        name, started, streamed = call
+        record_span("llm", name, time.perf_counter() - started, stream=streamed, error=True)
+        observe_llm_error(name)
+        return None
+
+
+llm_call_tracker = LLMCallTracker()
+llm_error_tracker = LLMErrorTracker()
+get_dispatcher().add_event_handler(llm_call_tracker)
+get_dispatcher().add_span_handler(llm_error_tracker)
@@ -1,9 +1,17 @@
 from llama_index.llms.gemini import Gemini
 from llama_index.llms.deepseek import DeepSeek
 from llama_index.llms.anthropic import Anthropic
+import logging
+import math
 import os
 from dotenv import load_dotenv
 
+from config import settings
+from LLM.recording import RECORD, REPLAY, RecordingLLM
+import LLM.instrumentation  # noqa: F401  (records every LLM call built here)
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 class LLMSettingsManager:
@@ -34,6 +42,30 @@ class LLMSettingsManager:
                 "claude-3-haiku-20240307"
             ]
         }
+
+        # Providers tried after the primary one, e.g.
+        # "anthropic:claude-3-5-haiku-20241022,deepseek:deepseek-chat"
+        self.fallbacks = [
+            tuple(item.strip().split(":", 1))
+            for item in os.getenv("LLM_FALLBACKS", "").split(",")
+            if item.strip()
+        ]
+        self.failover_options = {
+            "timeout": float(os.getenv("LLM_TIMEOUT", "30")),
+            "hedge": os.getenv("LLM_HEDGE", "false").lower() == "true",
+            "hedge_delay": float(os.getenv("LLM_HEDGE_DELAY", "3")),
+            "breaker_threshold": int(os.getenv("LLM_BREAKER_THRESHOLD", "3")),
+            "breaker_reset": float(os.getenv("LLM_BREAKER_RESET", "30")),
+        }
+
+        # How prompt tokens are counted locally for each provider: a
+        # characters-per-token ratio, or "tiktoken" for BPE vocabularies close
+        # to OpenAI's (uses llama-index's shared tokenizer).
+        self.token_counting = {
+            "gemini": 4.0,
+            "deepseek": "tiktoken",
+            "anthropic": 3.5,
+        }
         
     def get_available_models(self, provider: str = None):
         """
@@ -61,7 +93,8 @@ class LLMSettingsManager:
             **kwargs: Additional parameters for LLM initialization
             
         Returns:
-            Corresponding LLM instance
+            Corresponding LLM instance (wrapped in a RecordingLLM when
+            AGENT_RECORD_MODE is record or replay)
         """
         provider = provider.lower()
         if provider not in self.available_models:
@@ -76,24 +109,113 @@ class LLMSettingsManager:
             raise ValueError(f"Invalid model for {provider}: {model}")
             
         temperature = kwargs.get("temperature", 0.1)
+
+        if settings.recording.mode == REPLAY:
+            # Answered from the recording: no client, no API key needed
+            return RecordingLLM(None, f"{provider}:{model}")
             
         if provider == "gemini":
-            return Gemini(model=model, temperature=temperature)
+            llm = Gemini(model=model, temperature=temperature)
             
         elif provider == "deepseek":
-            return DeepSeek(
+            llm = DeepSeek(
                 model=model,
                 api_key=self.api_keys["deepseek"],
                 temperature=temperature,
             )
             
         elif provider == "anthropic":
-            return Anthropic(
+            llm = Anthropic(
                 model=model,
                 api_key=self.api_keys["anthropic"],
                 temperature=temperature,
             )
+
+        if settings.recording.mode == RECORD:
+            return RecordingLLM(llm, f"{provider}:{model}")
+        return llm
     
+    def get_resilient_llm(self, provider: str, **kwargs):
+        """
+        Return the LLM for provider/model, wrapped with the configured fallbacks.
+
+        Without LLM_FALLBACKS (and without LLM_HEDGE) this is get_llm. Fallback
+        providers whose API key is not set are skipped.
+
+        Args:
+            provider (str): Primary LLM provider name
+            **kwargs: Additional parameters for LLM initialization (model, temperature)
+
+        Returns:
+            LLM instance, or a FailoverLLM over the primary and its fallbacks
+        """
+        primary = self.get_llm(provider, **kwargs)
+        model = kwargs.get("model", self.available_models[provider.lower()][0])
+        chain = [(f"{provider.lower()}:{model}", primary)]
+        for fallback_provider, *rest in self.fallbacks:
+            fallback_model = rest[0] if rest else self.available_models[fallback_provider][0]
+            name = f"{fallback_provider}:{fallback_model}"
+            if name == chain[0][0]:
+                continue
+            if fallback_provider in self.api_keys and not self.api_keys[fallback_provider]:
+                logger.warning("Skipping LLM fallback %s: no API key", name)
+                continue
+            chain.append((
+                name,
+                self.get_llm(
+                    fallback_provider,
+                    model=fallback_model,
+                    temperature=kwargs.get("temperature", 0.1),
+                ),
+            ))
+        if len(chain) == 1:
+            return primary
+
+        from LLM.failover import FailoverLLM
+        return FailoverLLM(chain, **self.failover_options)
+
+    def get_provider(self, llm) -> str:
+        """
+        Return the provider name of an LLM instance built by get_llm.
+
+        A FailoverLLM is named after its primary, which serves the calls
+        while healthy, so provider-specific prompt markers and token counting
+        follow that provider.
+
+        Args:
+            llm: LLM instance
+
+        Returns:
+            str: Provider name, or the lower-cased class name for other LLMs
+        """
+        from LLM.failover import FailoverLLM
+        if isinstance(llm, FailoverLLM):
+            return self.get_provider(llm.primary)
+        if isinstance(llm, RecordingLLM):
+            return llm.provider
+        name = type(llm).__name__.lower()
+        for provider in self.available_models:
+            if provider in name:
+                return provider
+        return name
+
+    def count_tokens(self, provider: str, text: str) -> int:
+        """
+        Estimate the number of prompt tokens of text for a provider.
+
+        Args:
+            provider (str): LLM provider name
+            text (str): Text to count
+
+        Returns:
+            int: Token count (approximate for ratio-based providers)
+        """
+        method = self.token_counting.get(provider.lower(), 4.0)
+        if method == "tiktoken":
+            from llama_index.core.utils import get_tokenizer
+            return len(get_tokenizer()(text))
+        return math.ceil(len(text) / method)
+
     def get_default_llm(self):
         """Returns the default LLM instance (Anthropic Claude)"""
         return self.get_llm("anthropic")
@@ -0,0 +1,150 @@
+"""Provider-side prompt caching for the static ReAct system prefix.
+
+The agent's system prompt is sent as a static prefix (instructions and tool
+descriptions, identical for every user) followed by a small per-request
+suffix. Providers cache repeated prefixes in different ways:
+
+- Anthropic: the prefix message is marked with `cache_control`.
+- DeepSeek: prefixes are cached automatically on their side.
+- Gemini: 2.x models cache repeated prefixes implicitly. Explicit
+  CachedContent needs a prompt of several thousand tokens, far more than this
+  prefix.
+
+Hit rates are read from the usage block of every LLM response, through the
+llama-index instrumentation dispatcher.
+"""
+
+import hashlib
+from typing import Any, Dict, Optional
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import LLMChatEndEvent
+
+from commons.stats import register_stats
+
+ANTHROPIC_CACHE_CONTROL = {"cache_control": {"type": "ephemeral"}}
+
+
+def prefix_message_kwargs(provider: str) -> Dict[str, Any]:
+    """
+    Extra ChatMessage kwargs that mark the static prefix as cacheable.
+
+    Args:
+        provider (str): Provider name from LLMSettingsManager.get_provider
+
+    Returns:
+        dict: additional_kwargs for the prefix message (empty when the provider
+            caches prefixes by itself or would reject unknown fields)
+    """
+    if provider == "anthropic":
+        return dict(ANTHROPIC_CACHE_CONTROL)
+    return {}
+
+
+def prefix_digest(prefix: str) -> str:
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def extract_cache_usage(raw: Any) -> Optional[Dict[str, int]]:
+    """
+    Read prompt, cached-prompt and completion token counts from a raw provider response.
+
+    Returns:
+        dict: {"prompt_tokens", "cached_tokens", "cache_write_tokens",
+            "completion_tokens"}, or None if the response carries no usage block
+    """
+    # Anthropic
+    usage = _get(raw, "usage")
+    if usage is not None and _get(usage, "input_tokens") is not None:
+        cached = _get(usage, "cache_read_input_tokens") or 0
+        written = _get(usage, "cache_creation_input_tokens") or 0
+        return {
+            "prompt_tokens": (_get(usage, "input_tokens") or 0) + cached + written,
+            "cached_tokens": cached,
+            "cache_write_tokens": written,
+            "completion_tokens": _get(usage, "output_tokens") or 0,
+        }
+    # DeepSeek / OpenAI-compatible
+    if usage is not None and _get(usage, "prompt_tokens") is not None:
+        cached = _get(usage, "prompt_cache_hit_tokens")
+        if cached is None:
+            cached = _get(_get(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        return {
+            "prompt_tokens": _get(usage, "prompt_tokens") or 0,
+            "cached_tokens": cached,
+            "cache_write_tokens": 0,
+            "completion_tokens": _get(usage, "completion_tokens") or 0,
+        }
+    # Gemini
+    usage = _get(raw, "usage_metadata")
+    if usage is not None:
+        return {
+            "prompt_tokens": _get(usage, "prompt_token_count") or 0,
+            "cached_tokens": _get(usage, "cached_content_token_count") or 0,
+            "cache_write_tokens": 0,
+            "completion_tokens": _get(usage, "candidates_token_count") or 0,
+        }
+    return None
+
+
+class PromptCacheTracker(BaseEventHandler):
+    """Counts cached prompt tokens reported by providers, and distinct prefixes."""
+
+    calls: int = 0
+    calls_with_usage: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    prefixes: Dict[str, int] = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PromptCacheTracker"
+
+    def record_prefix(self, digest: str) -> None:
+        """Count how often each static prefix is sent; more than one means churn."""
+        self.prefixes[digest] = self.prefixes.get(digest, 0) + 1
+
+    def handle(self, event, **kwargs) -> None:
+        if not isinstance(event, LLMChatEndEvent) or event.response is None:
+            return
+        self.calls += 1
+        usage = extract_cache_usage(event.response.raw)
+        if usage is None:
+            return
+        self.calls_with_usage += 1
+        self.prompt_tokens += usage["prompt_tokens"]
+        self.cached_tokens += usage["cached_tokens"]
+        self.cache_write_tokens += usage["cache_write_tokens"]
+        if usage["cached_tokens"]:
+            self.cache_hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "calls_with_usage": self.calls_with_usage,
+            "cache_hits": self.cache_hits,
+            "hit_rate": round(self.cache_hits / self.calls_with_usage, 4)
+            if self.calls_with_usage else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cached_token_ratio": round(self.cached_tokens / self.prompt_tokens, 4)
+            if self.prompt_tokens else 0.0,
+            "distinct_prefixes": len(self.prefixes),
+        }
+
+
+prompt_cache_tracker = PromptCacheTracker()
+get_dispatcher().add_event_handler(prompt_cache_tracker)
+register_stats("prompt_cache", prompt_cache_tracker.stats)
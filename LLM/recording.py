@@ -0,0 +1,552 @@
+"""Record and replay of LLM and tool calls.
+
+With AGENT_RECORD_MODE=record, every LLM built by LLMSettingsManager.get_llm
+and every agent tool appends its calls to AGENT_RECORD_PATH: JSON lines,
+gzipped when the name ends in .gz. Prompt messages are written once and
+referenced by id, so the system header repeated in every step costs a
+single line. Each process (uvicorn worker, Telegram bot) writes its own part,
+the path with its pid inserted (agent.<pid>.jsonl.gz), since appends from
+several processes would interleave; merge_recordings() joins the parts.
+
+With AGENT_RECORD_MODE=replay, no provider client is created and no tool
+touches the network; calls are answered from the recording. An LLM call is
+matched on its exact prompt first, then on its turn (the user query and the
+number of steps since it), so a conversation still replays after formatter
+or parser changes. Identical calls are served in recorded order, and a call
+that is not in the recording raises ReplayMissError.
+"""
+
+import asyncio
+import atexit
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.llm import LLM
+
+from commons.stats import register_stats
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+OBSERVATION_PREFIX = "Observation:"
+CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+class ReplayMissError(Exception):
+    """Raised in replay mode when a call is not in the recording."""
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _role(message: ChatMessage) -> str:
+    return getattr(message.role, "value", message.role)
+
+
+def message_id(message: ChatMessage) -> str:
+    return _digest(_role(message), message.content or "")
+
+
+def prompt_key(messages: Sequence[ChatMessage]) -> str:
+    """Key of the exact prompt."""
+    return _digest(*(message_id(message) for message in messages))
+
+
+def turn_key(messages: Sequence[ChatMessage]) -> Tuple[str, int]:
+    """Key of the last user query and the number of steps (messages) since it."""
+    steps = 0
+    for message in reversed(messages):
+        content = message.content or ""
+        if message.role == MessageRole.USER and not content.startswith(OBSERVATION_PREFIX):
+            return _digest("turn", content, str(steps)), steps
+        steps += 1
+    return _digest("turn", "", str(steps)), steps
+
+
+def tool_key(name: str, inputs: Dict[str, Any]) -> str:
+    return _digest("tool", name, json.dumps(inputs, sort_keys=True, default=str))
+
+
+def _split_name(path: str) -> Tuple[str, str, str]:
+    directory, base = os.path.split(path)
+    name, dot, ext = base.partition(".")
+    return directory, name, dot + ext
+
+
+def part_path(path: str, pid: Any) -> str:
+    """Recording part of one process: recordings/agent.jsonl.gz -> recordings/agent.<pid>.jsonl.gz"""
+    directory, name, ext = _split_name(path)
+    return os.path.join(directory, f"{name}.{pid}{ext}")
+
+
+def recording_parts(path: str) -> List[str]:
+    """Per-process parts of a recording, oldest first."""
+    directory, name, ext = _split_name(path)
+    pattern = re.compile(rf"{re.escape(name)}\.\d+{re.escape(ext)}$")
+    try:
+        names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return []
+    parts = [os.path.join(directory, n) for n in names if pattern.match(n)]
+    return sorted(parts, key=os.path.getmtime)
+
+
+def _open_recording(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _read_recording(path: str) -> Iterator[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with _open_recording(path, "r") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except EOFError:
+            # Gzip member cut short by a killed process: keep what was flushed
+            logger.warning("Recording %s ends early", path)
+
+
+def merge_recordings(path: str) -> int:
+    """
+    Merge the per-process parts of a recording into `path` and delete them.
+
+    Messages shared by several parts are kept once.
+
+    Returns:
+        int: Number of parts merged
+    """
+    parts = recording_parts(path)
+    if not parts:
+        return 0
+    tmp = part_path(path, f"{os.getpid()}.merging")
+    message_ids = set()
+    with _open_recording(tmp, "w") as out:
+        for source in [path, *parts]:
+            for entry in _read_recording(source):
+                if entry["type"] == "message":
+                    if entry["id"] in message_ids:
+                        continue
+                    message_ids.add(entry["id"])
+                out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+    for part in parts:
+        os.remove(part)
+    return len(parts)
+
+
+def _take(queue: Deque[Dict[str, Any]]) -> Dict[str, Any]:
+    # Serve recorded calls in order, then keep repeating the last one
+    return queue.popleft() if len(queue) > 1 else queue[0]
+
+
+class Recorder:
+    """Appends calls to the recording file and serves them back in replay mode."""
+
+    def __init__(self, path: str, mode: str = "", replay_latency: float = 0.0):
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._file = None
+        self._message_ids: set = set()
+        self._messages: Optional[Dict[str, Dict[str, str]]] = None
+        self._llm_by_prompt: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._llm_by_turn: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._tools: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._stats = {
+            "recorded": 0, "llm_replayed": 0, "tool_replayed": 0, "turn_matches": 0, "misses": 0,
+        }
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Every line of the recording, in order."""
+        return _read_recording(self.path)
+
+    # Record
+
+    def _write(self, messages: Sequence[ChatMessage], entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._file is None:
+                # Resolved at the first write, i.e. in the worker process, not the parent
+                path = part_path(self.path, os.getpid())
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._message_ids = {
+                    e["id"] for e in _read_recording(path) if e["type"] == "message"
+                }
+                self._file = _open_recording(path, "a")
+                atexit.register(self.close)
+            for message in messages:
+                mid = message_id(message)
+                if mid not in self._message_ids:
+                    self._message_ids.add(mid)
+                    self._file.write(json.dumps({
+                        "type": "message", "id": mid,
+                        "role": _role(message), "content": message.content or "",
+                    }, ensure_ascii=False) + "\n")
+            self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+            self._stats["recorded"] += 1
+
+    def record_llm(
+        self, name: str, messages: Sequence[ChatMessage], content: str, elapsed: float
+    ) -> None:
+        turn, steps = turn_key(messages)
+        self._write(messages, {
+            "type": "llm",
+            "llm": name,
+            "prompt": prompt_key(messages),
+            "turn": turn,
+            "steps": steps,
+            "messages": [message_id(message) for message in messages],
+            "content": content,
+            "ms": round(elapsed * 1000, 1),
+        })
+
+    def record_tool(
+        self, name: str, inputs: Dict[str, Any], output: Any, error: Optional[str], elapsed: float
+    ) -> None:
+        self._write((), {
+            "type": "tool",
+            "tool": name,
+            "key": tool_key(name, inputs),
+            "input": inputs,
+            "output": output,
+            "error": error,
+            "ms": round(elapsed * 1000, 1),
+        })
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Replay
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._messages is not None:
+                return
+            messages: Dict[str, Dict[str, str]] = {}
+            for entry in self.entries():
+                if entry["type"] == "message":
+                    messages[entry["id"]] = entry
+                elif entry["type"] == "llm":
+                    self._llm_by_prompt.setdefault(entry["prompt"], deque()).append(entry)
+                    self._llm_by_turn.setdefault(entry["turn"], deque()).append(entry)
+                elif entry["type"] == "tool":
+                    self._tools.setdefault(entry["key"], deque()).append(entry)
+            self._messages = messages
+            logger.info(
+                "Loaded recording %s",
+                self.path,
+                extra={"llm_calls": sum(map(len, self._llm_by_prompt.values())),
+                       "tool_calls": sum(map(len, self._tools.values()))},
+            )
+
+    def replay_llm(self, messages: Sequence[ChatMessage]) -> Dict[str, Any]:
+        self._load()
+        queue = self._llm_by_prompt.get(prompt_key(messages))
+        if queue is None:
+            queue = self._llm_by_turn.get(turn_key(messages)[0])
+            if queue is not None:
+                self._stats["turn_matches"] += 1
+        if queue is None:
+            self._stats["misses"] += 1
+            last = (messages[-1].content or "")[:200] if messages else ""
+            raise ReplayMissError(f"No recorded LLM call for prompt ending with: {last!r}")
+        self._stats["llm_replayed"] += 1
+        return _take(queue)
+
+    def replay_tool(self, name: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        self._load()
+        queue = self._tools.get(tool_key(name, inputs))
+        if queue is None:
+            self._stats["misses"] += 1
+            raise ReplayMissError(f"No recorded call of {name} with {inputs!r}")
+        self._stats["tool_replayed"] += 1
+        return _take(queue)
+
+    def rewind(self) -> None:
+        """Serve every recorded call from the start again."""
+        with self._lock:
+            self._messages = None
+            self._llm_by_prompt, self._llm_by_turn, self._tools = {}, {}, {}
+
+    def delay(self, entry: Dict[str, Any]) -> float:
+        return entry.get("ms", 0) / 1000 * self.replay_latency
+
+    def conversations(self) -> List[Dict[str, Any]]:
+        """
+        First step of every recorded LLM turn, for driving a replay.
+
+        Returns:
+            list: {"query", "chat_history" (List[ChatMessage]), "system"} dicts
+        """
+        self._load()
+        seen = set()
+        result = []
+        for queue in self._llm_by_turn.values():
+            for entry in queue:
+                if entry["steps"] != 0 or entry["prompt"] in seen:
+                    continue
+                seen.add(entry["prompt"])
+                stored = [self._messages[mid] for mid in entry["messages"]]
+                history = [
+                    ChatMessage(role=m["role"], content=m["content"])
+                    for m in stored[:-1] if m["role"] != MessageRole.SYSTEM.value
+                ]
+                result.append({
+                    "query": stored[-1]["content"],
+                    "chat_history": history,
+                    "system": "\n".join(
+                        m["content"] for m in stored if m["role"] == MessageRole.SYSTEM.value
+                    ),
+                })
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "mode": self.mode, "path": self.path}
+
+
+recorder = Recorder(
+    settings.recording.path,
+    mode=settings.recording.mode,
+    replay_latency=settings.recording.replay_latency,
+)
+register_stats("recording", recorder.stats)
+
+
+def _chunks(content: str) -> List[str]:
+    return CHUNK_PATTERN.findall(content) or [""]
+
+
+def _user_prompt(prompt: str) -> List[ChatMessage]:
+    return [ChatMessage(role=MessageRole.USER, content=prompt)]
+
+
+class RecordingLLM(LLM):
+    """
+    LLM that records the calls of a wrapped LLM, or replays them without one.
+
+    Only the text of each response is kept; usage and raw provider payloads
+    are not, so replayed calls report no tokens.
+    """
+
+    llm_name: str = Field(description="provider:model of the recorded LLM.")
+
+    _llm: Optional[LLM] = PrivateAttr()
+    _recorder: Recorder = PrivateAttr()
+
+    def __init__(self, llm: Optional[LLM], llm_name: str, rec: Recorder = recorder, **kwargs: Any):
+        """
+        Args:
+            llm (LLM, optional): LLM to record; None replays
+            llm_name (str): "provider:model", stored with every call
+            rec (Recorder): Recording to write to or read from
+        """
+        super().__init__(llm_name=llm_name, **kwargs)
+        self._llm = llm
+        self._recorder = rec
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RecordingLLM"
+
+    @property
+    def provider(self) -> str:
+        return self.llm_name.split(":", 1)[0]
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        if self._llm is not None:
+            return self._llm.metadata
+        return LLMMetadata(model_name=self.llm_name, is_chat_model=True)
+
+    def _record(self, messages: Sequence[ChatMessage], content: str, started: float) -> None:
+        self._recorder.record_llm(self.llm_name, messages, content, time.perf_counter() - started)
+
+    # Chat
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            time.sleep(self._recorder.delay(entry))
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=entry["content"]))
+        started = time.perf_counter()
+        response = self._llm.chat(messages, **kwargs)
+        self._record(messages, response.message.content or "", started)
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            await asyncio.sleep(self._recorder.delay(entry))
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=entry["content"]))
+        started = time.perf_counter()
+        response = await self._llm.achat(messages, **kwargs)
+        self._record(messages, response.message.content or "", started)
+        return response
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            time.sleep(self._recorder.delay(entry))
+
+            def replay() -> ChatResponseGen:
+                content = ""
+                for chunk in _chunks(entry["content"]):
+                    content += chunk
+                    yield ChatResponse(
+                        message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                        delta=chunk,
+                    )
+
+            return replay()
+        started = time.perf_counter()
+        stream = self._llm.stream_chat(messages, **kwargs)
+
+        def record() -> ChatResponseGen:
+            last, deltas = None, ""
+            for last in stream:
+                deltas += last.delta or ""
+                yield last
+            self._record(messages, (last and last.message.content) or deltas, started)
+
+        return record()
+
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            await asyncio.sleep(self._recorder.delay(entry))
+
+            async def replay() -> ChatResponseAsyncGen:
+                content = ""
+                for chunk in _chunks(entry["content"]):
+                    content += chunk
+                    yield ChatResponse(
+                        message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                        delta=chunk,
+                    )
+
+            return replay()
+        started = time.perf_counter()
+        stream = await self._llm.astream_chat(messages, **kwargs)
+
+        async def record() -> ChatResponseAsyncGen:
+            last, deltas = None, ""
+            async for last in stream:
+                deltas += last.delta or ""
+                yield last
+            self._record(messages, (last and last.message.content) or deltas, started)
+
+        return record()
+
+    # Completion: recorded as a prompt of one user message
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        messages = _user_prompt(prompt)
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            time.sleep(self._recorder.delay(entry))
+            return CompletionResponse(text=entry["content"])
+        started = time.perf_counter()
+        response = self._llm.complete(prompt, formatted=formatted, **kwargs)
+        self._record(messages, response.text, started)
+        return response
+
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        messages = _user_prompt(prompt)
+        if self._llm is None:
+            entry = self._recorder.replay_llm(messages)
+            await asyncio.sleep(self._recorder.delay(entry))
+            return CompletionResponse(text=entry["content"])
+        started = time.perf_counter()
+        response = await self._llm.acomplete(prompt, formatted=formatted, **kwargs)
+        self._record(messages, response.text, started)
+        return response
+
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        response = self.complete(prompt, formatted=formatted, **kwargs)
+
+        def gen() -> CompletionResponseGen:
+            yield CompletionResponse(text=response.text, delta=response.text)
+
+        return gen()
+
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        response = await self.acomplete(prompt, formatted=formatted, **kwargs)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            yield CompletionResponse(text=response.text, delta=response.text)
+
+        return gen()
+
+
+def recorded_tool(name: str, fn: Callable[..., Any], rec: Recorder = recorder) -> Callable[..., Any]:
+    """
+    Record or replay the calls of an async tool function, per rec.mode.
+
+    Calls are keyed on the tool name and its arguments; outputs are stored as
+    JSON (other values as their str()), and errors are replayed as Exception
+    with the recorded message. Outside record/replay mode fn is returned as is.
+    """
+    if rec.mode not in (RECORD, REPLAY):
+        return fn
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        inputs = dict(signature.bind_partial(*args, **kwargs).arguments)
+        if rec.mode == REPLAY:
+            entry = rec.replay_tool(name, inputs)
+            await asyncio.sleep(rec.delay(entry))
+            if entry["error"] is not None:
+                raise Exception(entry["error"])
+            return entry["output"]
+        started = time.perf_counter()
+        try:
+            output = await fn(*args, **kwargs)
+        except Exception as e:
+            rec.record_tool(name, inputs, None, str(e), time.perf_counter() - started)
+            raise
+        rec.record_tool(name, inputs, output, None, time.perf_counter() - started)
+        return output
+
+    return wrapper
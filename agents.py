@@ -1,7 +1,13 @@
-from typing import List, Optional, Sequence
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence, Tuple
 
-from llama_index.core import PromptTemplate
-from llama_index.core.agent import ReActAgent
+from llama_index.core.agent import AgentRunner, ReActAgentWorker
 from llama_index.core.agent.react.formatter import (
     ReActChatFormatter,
     get_react_tool_descriptions,
@@ -11,24 +17,96 @@ from llama_index.core.agent.react.prompts import (
     REACT_CHAT_SYSTEM_HEADER,
 )
 from llama_index.core.agent.react.types import (
+    ActionReasoningStep,
     BaseReasoningStep,
     ObservationReasoningStep,
 )
-from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.tools import BaseTool, FunctionTool
 from llama_index.core.tools import BaseTool, ToolOutput
-from utils.output_parser import ReActOutputParser
+from utils.output_parser import MultiActionReasoningStep, ReActOutputParser, ReActStreamParser
+from utils.concurrency import agent_runs
+from utils.response_cache import response_cache
+from utils.fast_path import fast_path
+from utils.observation import EXPAND_TOOL, observation_compactor
+from utils.query_router import (
+    COMPLEX,
+    DIRECT,
+    SIMPLE,
+    RouteDecision,
+    classify_query,
+    current_route,
+    router_stats,
+)
 from tools import (
     search_token,
     get_trending_pairs,
     scan_token,
+    scan_tokens,
+    expand_observation,
 )
 
-from prompts.react import REACT_CHAT_SYSTEM_HEADER_CUSTOM
+from prompts.react import (
+    DIRECT_REPLY_SYSTEM_PROMPT,
+    REACT_CHAT_SYSTEM_HEADER_CUSTOM,
+    REACT_CHAT_USER_HEADER,
+)
 from LLM.llm_settings_manager import LLMSettingsManager
+from LLM.prompt_cache import prefix_digest, prefix_message_kwargs, prompt_cache_tracker
+from LLM.recording import recorded_tool
+from config import settings
+from commons.logger import span
+from commons.metrics import MAX_ITERATIONS, REACT_ITERATIONS, TOOL_ERRORS, TOOL_LATENCY
+
+logger = logging.getLogger(__name__)
 
 llm_manager = LLMSettingsManager()
-llm = llm_manager.get_llm("gemini", model="models/gemini-2.0-flash")
+llm = llm_manager.get_resilient_llm("gemini", model="models/gemini-2.0-flash")
+
+# Per-request values (e.g. jwt_token) for the prompt suffix and the tools.
+# Kept in a context variable so one formatter/worker can serve every request.
+agent_request_context: ContextVar[Dict[str, Any]] = ContextVar(
+    "agent_request_context", default={}
+)
+
+# Names of the tools called by the agent run in progress, when collected
+run_tool_names: ContextVar[Optional[List[str]]] = ContextVar("run_tool_names", default=None)
+
+# Request values handed to tools but never rendered into the prompt
+SECRET_CONTEXT_KEYS = frozenset({"jwt_token"})
+
+
+@contextmanager
+def request_context(**kwargs):
+    """Bind per-request prompt values for the agent run in this context."""
+    token = agent_request_context.set(kwargs)
+    try:
+        yield
+    finally:
+        agent_request_context.reset(token)
+
+def with_request_jwt(fn):
+    """
+    Hide a tool's jwt_token parameter from the LLM and fill it from the request.
+
+    The tool schema is built from the wrapper's signature, so the model never
+    sees or has to copy the token; it is read from agent_request_context when
+    the tool runs.
+    """
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        kwargs["jwt_token"] = agent_request_context.get().get("jwt_token") or ""
+        return await fn(*args, **kwargs)
+
+    wrapper.__signature__ = signature.replace(
+        parameters=[p for name, p in signature.parameters.items() if name != "jwt_token"]
+    )
+    return wrapper
+
 
 class CustomReActChatFormatter(ReActChatFormatter):
     """ReAct chat formatter."""
@@ -37,18 +115,67 @@ class CustomReActChatFormatter(ReActChatFormatter):
         self,
         system_header: str = REACT_CHAT_SYSTEM_HEADER,  # default system header
         context: str = "",  # default context (optional)
+        user_header: Optional[str] = None,  # per-request suffix template
+        prefix_kwargs: Optional[Dict[str, Any]] = None,  # e.g. cache_control
         **kwargs,
     ):
         """
         Initialize the CustomReActChatFormatter.
 
         Args:
-            system_header (str): The system header template string.
+            system_header (str): The system header template string. It is
+                rendered once per tool set and sent as a static prefix.
             context (str): Additional context to include in the format.
+            user_header (str, optional): Template with a {user_info} field,
+                rendered per request from the non-secret request context.
+            prefix_kwargs (dict, optional): additional_kwargs of the prefix
+                message, used to mark it for provider-side caching.
             **kwargs: Additional keyword arguments to store and use in formatting.
         """
         super().__init__(system_header=system_header, context=context)
         self._kwargs = kwargs
+        self._user_header = user_header
+        self._prefix_kwargs = prefix_kwargs or {}
+        self._tool_args_cache: Dict[Tuple[int, ...], Dict[str, str]] = {}
+        self._header_cache: Dict[Tuple[int, ...], Tuple[str, str]] = {}
+
+    def _tool_format_args(self, tools: Sequence[BaseTool]) -> Dict[str, str]:
+        """Render the tool description block once per tool set."""
+        key = tuple(id(tool) for tool in tools)
+        format_args = self._tool_args_cache.get(key)
+        if format_args is None:
+            format_args = {
+                "tool_desc": "\n".join(get_react_tool_descriptions(tools)),
+                "tool_names": ", ".join([tool.metadata.get_name() for tool in tools]),
+            }
+            self._tool_args_cache[key] = format_args
+        return format_args
+
+    def _static_header(self, tools: Sequence[BaseTool]) -> Tuple[str, str]:
+        """Render the system header once per tool set; it must not vary per request."""
+        key = tuple(id(tool) for tool in tools)
+        cached = self._header_cache.get(key)
+        if cached is None:
+            format_args = dict(self._tool_format_args(tools))
+            if self.context:
+                format_args["context"] = self.context
+            header = self.system_header.format(**{**format_args, **self._kwargs})
+            cached = (header, prefix_digest(header))
+            self._header_cache[key] = cached
+        return cached
+
+    def _user_info(self) -> str:
+        if not self._user_header:
+            return ""
+        values = {
+            k: v for k, v in agent_request_context.get().items()
+            if k not in SECRET_CONTEXT_KEYS and v
+        }
+        if not values:
+            return ""
+        return self._user_header.format(
+            user_info="\n".join(f"{k}: {v}" for k, v in values.items())
+        )
 
     def format(
         self,
@@ -60,16 +187,19 @@ class CustomReActChatFormatter(ReActChatFormatter):
         """Format chat history into list of ChatMessage."""
         current_reasoning = current_reasoning or []
 
-        format_args = {
-            "tool_desc": "\n".join(get_react_tool_descriptions(tools)),
-            "tool_names": ", ".join([tool.metadata.get_name() for tool in tools]),
-        }
-
-        if self.context:
-            format_args["context"] = self.context
+        fmt_sys_header, digest = self._static_header(tools)
+        prompt_cache_tracker.record_prefix(digest)
+        system_messages = [
+            ChatMessage(
+                role=MessageRole.SYSTEM,
+                content=fmt_sys_header,
+                additional_kwargs=dict(self._prefix_kwargs),
+            )
+        ]
+        user_info = self._user_info()
+        if user_info:
+            system_messages.append(ChatMessage(role=MessageRole.SYSTEM, content=user_info))
 
-        combined_args = {**format_args, **self._kwargs}
-        fmt_sys_header = self.system_header.format(**combined_args)
         reasoning_history = []
         for reasoning_step in current_reasoning:
             if isinstance(reasoning_step, ObservationReasoningStep):
@@ -85,7 +215,7 @@ class CustomReActChatFormatter(ReActChatFormatter):
             reasoning_history.append(message)
 
         return [
-            ChatMessage(role=MessageRole.SYSTEM, content=fmt_sys_header),
+            *system_messages,
             *chat_history,
             *reasoning_history,
         ]
@@ -108,35 +238,27 @@ class CustomReActChatFormatter(ReActChatFormatter):
             system_header=system_header,
             context=context or "",
         )
-        
-def custom_failure_handler(callback_manager, exception):
-    error_message = f"The agent encountered an error: {str(exception)}"
-    return ToolOutput(content=error_message, tool_name="Error Handler")
-
 
-react_system_prompt = PromptTemplate(REACT_CHAT_SYSTEM_HEADER_CUSTOM)
 
 tools = [
     FunctionTool.from_defaults(
-        fn=get_trending_pairs,
+        async_fn=recorded_tool("get_trending_pairs", with_request_jwt(get_trending_pairs)),
         name="get_trending_pairs", 
         description=(
             "Get trending trading pairs on the market."
             """Input args:
-                jwt_token (str): User's authorization token
                 resolution (str, optional): Time frame (default: "5m")
                 limit (int, optional): Maximum number of pairs to return (default: 5)"""
             "Output: Price, market cap, liquidity, volume and performance metrics"
         ),
     ),
     FunctionTool.from_defaults(
-        fn=search_token,
+        async_fn=recorded_tool("search_token", with_request_jwt(search_token)),
         name="search_token",
         description=(
             "Retrieves the token address based on the token name, symbol, or ticker."
             """Input args: 
-                query (str): Token name, symbol, or ticker (e.g., 'SUDENG', 'hippo').
-                jwt_token (str): User's authorization token"""
+                query (str): Token name, symbol, or ticker (e.g., 'SUDENG', 'hippo')."""
             "Output: Returns token information including:"
             "- Token address (contract address)"
             "- Token name"
@@ -146,7 +268,7 @@ tools = [
         ),
     ),
     FunctionTool.from_defaults(
-        fn=scan_token,
+        async_fn=recorded_tool("scan_token", scan_token),
         name="scan_token",
         description=(
             "Analyze token's trading metrics."
@@ -155,37 +277,699 @@ tools = [
             "Output: Price, market cap, liquidity, volume and transaction counts"
         ),
     ),
+    FunctionTool.from_defaults(
+        async_fn=recorded_tool("scan_tokens", scan_tokens),
+        name="scan_tokens",
+        description=(
+            "Analyze the trading metrics of several tokens in one call. Prefer this over "
+            "repeated scan_token calls when comparing tokens or following up on a list."
+            """Input args:
+                token_addresses (List[str]): Token contract addresses"""
+            "Output: One table row per token with price, market cap, liquidity, "
+            "price changes, 24h volume and transaction counts"
+        ),
+    ),
+    FunctionTool.from_defaults(
+        async_fn=recorded_tool(EXPAND_TOOL, expand_observation),
+        name=EXPAND_TOOL,
+        description=(
+            "Get the full output of an earlier tool call whose Observation ends with "
+            "a [truncated: ...] notice. Only call it when the rows shown are not enough."
+            """Input args:
+                handle (str): Handle given in the truncation notice"""
+            "Output: The complete output of that tool call"
+        ),
+    ),
 ]
 
 
-def react_chat(
+def format_observations(actions: List[ActionReasoningStep], texts: List[str]) -> str:
+    """Merge the (compacted) results of one step's actions into a single Observation."""
+    if len(actions) == 1:
+        return texts[0]
+    return "\n\n".join(
+        f"[{i}] {action.action}({action.action_input}):\n{text}"
+        for i, (action, text) in enumerate(zip(actions, texts), start=1)
+    )
+
+
+class ParallelReActAgentWorker(ReActAgentWorker):
+    """
+    ReAct worker that accepts several Action blocks in one LLM turn.
+
+    The actions of a step run concurrently and must all finish within
+    settings.runtime.step_deadline seconds; their outputs are returned to
+    the LLM as one numbered Observation, saving one LLM round trip per
+    extra tool call.
+    """
+
+    @staticmethod
+    def _count_step(task, step_output):
+        task.extra_state["iterations"] = task.extra_state.get("iterations", 0) + 1
+        if step_output.is_last:
+            REACT_ITERATIONS.labels(current_route.get() or "none").observe(
+                task.extra_state["iterations"]
+            )
+        return step_output
+
+    def _run_step(self, step, task):
+        with span("step", "react_step"):
+            return self._count_step(task, super()._run_step(step, task))
+
+    async def _arun_step(self, step, task):
+        with span("step", "react_step"):
+            return self._count_step(task, await super()._arun_step(step, task))
+
+    async def _arun_step_stream(self, step, task):
+        with span("step", "react_step", stream=True):
+            return self._count_step(task, await super()._arun_step_stream(step, task))
+
+    def _extract_reasoning_step(
+        self, output: ChatResponse, is_streaming: bool = False
+    ) -> Tuple[str, List[BaseReasoningStep], bool]:
+        if output.message.content is None:
+            raise ValueError("Got empty message.")
+        message_content = output.message.content
+        try:
+            reasoning_step = self._output_parser.parse(message_content, is_streaming)
+        except BaseException as exc:
+            raise ValueError(f"Could not parse output: {message_content}") from exc
+        return message_content, [reasoning_step], reasoning_step.is_done
+
+    @staticmethod
+    def _step_actions(
+        step: BaseReasoningStep,
+    ) -> Tuple[List[ActionReasoningStep], List[ActionReasoningStep]]:
+        """Actions to run in this step, and those past the per-step limit."""
+        actions = step.actions if isinstance(step, MultiActionReasoningStep) else [step]
+        limit = settings.runtime.max_parallel_actions
+        return actions[:limit], actions[limit:]
+
+    def _dropped_outputs(self, dropped: List[ActionReasoningStep]) -> List[ToolOutput]:
+        """Error outputs telling the LLM which actions were not run."""
+        limit = settings.runtime.max_parallel_actions
+        return [
+            self._error_output(action, f"not run: limit {limit} actions per step.")
+            for action in dropped
+        ]
+
+    @staticmethod
+    def _error_output(action: ActionReasoningStep, message: str) -> ToolOutput:
+        return ToolOutput(
+            content=f"Error: {message}",
+            tool_name=action.action,
+            raw_input={"kwargs": action.action_input},
+            raw_output=None,
+            is_error=True,
+        )
+
+    def _observation(self, actions: List[ActionReasoningStep], outputs: List[ToolOutput]) -> str:
+        """Compact each output for the LLM of this worker and merge them."""
+        count_tokens = functools.partial(
+            llm_manager.count_tokens, llm_manager.get_provider(self._llm)
+        )
+        texts = [
+            observation_compactor.compact(action.action, output, count_tokens)
+            for action, output in zip(actions, outputs)
+        ]
+        return format_observations(actions, texts)
+
+    @staticmethod
+    def _observe_tool(name: str, started: float, tool_output: ToolOutput) -> ToolOutput:
+        TOOL_LATENCY.labels(name).observe(time.perf_counter() - started)
+        if tool_output.is_error:
+            TOOL_ERRORS.labels(name).inc()
+        return tool_output
+
+    async def _acall_action(self, tools_dict, action: ActionReasoningStep) -> ToolOutput:
+        tool = tools_dict.get(action.action)
+        if tool is None:
+            return self._error_output(action, f"No such tool named `{action.action}`.")
+        with self.callback_manager.event(
+            CBEventType.FUNCTION_CALL,
+            payload={
+                EventPayload.FUNCTION_CALL: action.action_input,
+                EventPayload.TOOL: tool.metadata,
+            },
+        ) as event:
+            started = time.perf_counter()
+            try:
+                with span("tool", action.action):
+                    tool_output = await tool.acall(**action.action_input)
+            except Exception as e:
+                tool_output = self._error_output(action, str(e))
+            event.on_end(payload={EventPayload.FUNCTION_OUTPUT: str(tool_output)})
+        return self._observe_tool(action.action, started, tool_output)
+
+    def _call_action(self, tools_dict, action: ActionReasoningStep) -> ToolOutput:
+        tool = tools_dict.get(action.action)
+        if tool is None:
+            return self._error_output(action, f"No such tool named `{action.action}`.")
+        with self.callback_manager.event(
+            CBEventType.FUNCTION_CALL,
+            payload={
+                EventPayload.FUNCTION_CALL: action.action_input,
+                EventPayload.TOOL: tool.metadata,
+            },
+        ) as event:
+            started = time.perf_counter()
+            try:
+                with span("tool", action.action):
+                    tool_output = tool.call(**action.action_input)
+            except Exception as e:
+                tool_output = self._error_output(action, str(e))
+            event.on_end(payload={EventPayload.FUNCTION_OUTPUT: str(tool_output)})
+        return self._observe_tool(action.action, started, tool_output)
+
+    async def _aprocess_actions(
+        self,
+        task,
+        tools,
+        output: ChatResponse,
+        is_streaming: bool = False,
+    ) -> Tuple[List[BaseReasoningStep], bool]:
+        try:
+            _, current_reasoning, is_done = self._extract_reasoning_step(output, is_streaming)
+        except ValueError as exp:
+            tool_output = self._handle_reasoning_failure_fn(self.callback_manager, exp)
+            task.extra_state["sources"].append(tool_output)
+            return [ObservationReasoningStep(observation=str(tool_output))], False
+        if is_done:
+            return current_reasoning, True
+
+        tools_dict = {tool.metadata.name: tool for tool in tools}
+        actions, dropped = self._step_actions(current_reasoning[-1])
+        pending = [
+            asyncio.ensure_future(self._acall_action(tools_dict, action))
+            for action in actions
+        ]
+        done, not_done = await asyncio.wait(pending, timeout=settings.runtime.step_deadline)
+        for action, future in zip(actions, pending):
+            if future in not_done:
+                future.cancel()
+                TOOL_ERRORS.labels(action.action).inc()
+        outputs = [
+            future.result() if future in done else self._error_output(
+                action,
+                f"`{action.action}` did not finish within {settings.runtime.step_deadline}s.",
+            )
+            for action, future in zip(actions, pending)
+        ]
+        actions = actions + dropped
+        outputs += self._dropped_outputs(dropped)
+
+        task.extra_state["sources"].extend(outputs)
+        current_reasoning.append(
+            ObservationReasoningStep(observation=self._observation(actions, outputs))
+        )
+        return current_reasoning, False
+
+    def _process_actions(
+        self,
+        task,
+        tools,
+        output: ChatResponse,
+        is_streaming: bool = False,
+    ) -> Tuple[List[BaseReasoningStep], bool]:
+        """Sync path: same multi-action handling, tools run one after another."""
+        try:
+            _, current_reasoning, is_done = self._extract_reasoning_step(output, is_streaming)
+        except ValueError as exp:
+            tool_output = self._handle_reasoning_failure_fn(self.callback_manager, exp)
+            task.extra_state["sources"].append(tool_output)
+            return [ObservationReasoningStep(observation=str(tool_output))], False
+        if is_done:
+            return current_reasoning, True
+
+        tools_dict = {tool.metadata.name: tool for tool in tools}
+        actions, dropped = self._step_actions(current_reasoning[-1])
+        outputs = [self._call_action(tools_dict, action) for action in actions]
+        actions = actions + dropped
+        outputs += self._dropped_outputs(dropped)
+
+        task.extra_state["sources"].extend(outputs)
+        current_reasoning.append(
+            ObservationReasoningStep(observation=self._observation(actions, outputs))
+        )
+        return current_reasoning, False
+
+
+class AgentTemplate:
+    """
+    Agent parts that are identical for every request, built once at startup.
+
+    The formatter (with the rendered tool descriptions) and one ReActAgentWorker
+    per (llm, max_iterations) are shared; a request only creates an AgentRunner
+    holding its own memory. Per-request prompt values come from request_context.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        system_header: str,
+        user_header: Optional[str] = None,
+    ):
+        self.tools = list(tools)
+        self.system_header = system_header
+        self.user_header = user_header
+        self.output_parser = ReActOutputParser()
+        self._formatters: Dict[str, CustomReActChatFormatter] = {}
+        self._workers: Dict[Tuple[int, int], ReActAgentWorker] = {}
+        # Render the static prefix now instead of on the first request
+        self.formatter = self.get_formatter("default")
+
+    def get_formatter(self, provider: str) -> CustomReActChatFormatter:
+        """One formatter per provider, since prefix cache markers differ."""
+        formatter = self._formatters.get(provider)
+        if formatter is None:
+            formatter = CustomReActChatFormatter(
+                system_header=self.system_header,
+                user_header=self.user_header,
+                prefix_kwargs=prefix_message_kwargs(provider),
+            )
+            formatter._static_header(self.tools)
+            self._formatters[provider] = formatter
+        return formatter
+
+    def get_worker(self, llm, max_iterations: int = 10) -> ReActAgentWorker:
+        key = (id(llm), max_iterations)
+        worker = self._workers.get(key)
+        if worker is None:
+            worker = ParallelReActAgentWorker.from_tools(
+                tools=self.tools,
+                llm=llm,
+                max_iterations=max_iterations,
+                react_chat_formatter=self.get_formatter(llm_manager.get_provider(llm)),
+                output_parser=self.output_parser,
+                verbose=False,
+            )
+            self._workers[key] = worker
+        return worker
+
+    def create_agent(
+        self,
+        llm=None,
+        chat_history: List[ChatMessage] = None,
+        max_iterations=10,
+    ) -> AgentRunner:
+        """Create a lightweight per-request agent around the shared worker."""
+        return AgentRunner(
+            agent_worker=self.get_worker(llm, max_iterations),
+            memory=ChatMemoryBuffer.from_defaults(chat_history=chat_history or [], llm=llm),
+            llm=llm,
+        )
+
+
+agent_template = AgentTemplate(
+    tools=tools,
+    system_header=REACT_CHAT_SYSTEM_HEADER_CUSTOM,
+    user_header=REACT_CHAT_USER_HEADER,
+)
+
+
+async def areact_chat(
+    query: str,
+    llm=None,
+    chat_history: List[ChatMessage] = None,
+    max_iterations=10,
+    jwt_token=None,
+) -> str:
+    """
+    Run the ReAct agent on a query inside the event loop.
+
+    LLM calls go through the provider's async client and every tool is
+    registered with an async implementation, so a long ReAct run never
+    blocks other requests on the same worker.
+    """
+    agent = agent_template.create_agent(
+        llm=llm,
+        chat_history=chat_history,
+        max_iterations=max_iterations,
+    )
+    with request_context(jwt_token=jwt_token):
+        async with agent_runs.track():
+            try:
+                response = await agent.achat(query)
+            except ValueError as e:
+                if "Reached max iterations" in str(e):
+                    _observe_max_iterations(max_iterations)
+                raise
+    collected = run_tool_names.get()
+    if collected is not None:
+        collected.extend(source.tool_name for source in response.sources)
+    return str(response)
+
+
+def _observe_max_iterations(max_iterations: int) -> None:
+    # Runs that stop at the limit never reach a last step, count them here
+    tier = current_route.get() or "none"
+    MAX_ITERATIONS.labels(tier).inc()
+    REACT_ITERATIONS.labels(tier).observe(max_iterations)
+
+
+def _reasoning_step_events(step: BaseReasoningStep) -> List[Dict[str, Any]]:
+    """Convert a ReAct reasoning step into stream events."""
+    if isinstance(step, ActionReasoningStep):
+        return [
+            {"event": "thought", "data": step.thought},
+            {"event": "action", "data": {"tool": step.action, "input": step.action_input}},
+        ]
+    if isinstance(step, MultiActionReasoningStep):
+        return [{"event": "thought", "data": step.thought}] + [
+            {"event": "action", "data": {"tool": action.action, "input": action.action_input}}
+            for action in step.actions
+        ]
+    if isinstance(step, ObservationReasoningStep):
+        return [{"event": "observation", "data": step.observation}]
+    return []
+
+
+def _stream_answer_start(parser: ReActStreamParser) -> Optional[int]:
+    """Where the answer starts in a streamed final output, or None while undecided."""
+    start = parser.answer_start
+    if start is not None:
+        return start
+    stripped = parser.text.lstrip()
+    if "Thought:".startswith(stripped) or stripped.startswith("Thought:"):
+        return None
+    # No ReAct prefix: the whole output is the answer
+    return 0
+
+
+async def astream_react_chat(
     query: str,
     llm=None,
     chat_history: List[ChatMessage] = None,
     max_iterations=10,
     jwt_token=None,
-):
-    formatter = CustomReActChatFormatter(jwt_token=jwt_token)
-    agent = ReActAgent.from_tools(
-        tools=tools,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run the agent step by step and yield events as they are produced.
+
+    Yields dicts of the form {"event": <type>, "data": <payload>} where type is
+    one of "thought", "action", "observation" (one per ReAct step, emitted as
+    soon as the step finishes) and "token" (final answer, streamed from the LLM
+    as it arrives). The last event is {"event": "answer", "data": <full text>}.
+    """
+    agent = agent_template.create_agent(
         llm=llm,
-        verbose=True,
         chat_history=chat_history,
-        react_chat_formatter=formatter,
         max_iterations=max_iterations,
-        output_parser=ReActOutputParser()
     )
-    agent.update_prompts({"agent_worker:system_prompt": react_system_prompt})
-    response = agent.chat(query)
-    
-    
-    # start task
-    # task = agent.create_task(query)
-    # print(f'task: {task}')
-    # step_output = agent.run_step(task.task_id)
-    # print(f'step_output.output: {step_output.output}')
-    
-    
-    response = str(response)
-    agent.reset()
-    return response
+    with request_context(jwt_token=jwt_token):
+        async with agent_runs.track():
+            task = agent.create_task(query)
+            emitted = 0
+            for _ in range(max_iterations):
+                step_output = await agent.astream_step(task.task_id)
+                reasoning = task.extra_state.get("current_reasoning", [])
+                for step in reasoning[emitted:]:
+                    for event in _reasoning_step_events(step):
+                        yield event
+                emitted = len(reasoning)
+                if step_output.is_last:
+                    break
+            else:
+                _observe_max_iterations(max_iterations)
+                raise ValueError("Reached max iterations.")
+
+            output = step_output.output
+            answer = ""
+            if hasattr(output, "async_response_gen"):
+                # The final stream may still carry the "Thought: ... Answer:" prefix;
+                # tokens are held back until the parser has seen the answer start.
+                parser = ReActStreamParser()
+                sent: Optional[int] = None
+                async for token in output.async_response_gen():
+                    parser.feed(token)
+                    if sent is None:
+                        sent = _stream_answer_start(parser)
+                        if sent is None:
+                            continue
+                    chunk = parser.text[sent:]
+                    if not answer:
+                        chunk = chunk.lstrip()
+                    if chunk:
+                        answer += chunk
+                        sent = len(parser.text)
+                        yield {"event": "token", "data": chunk}
+                if sent is None:
+                    # Never got past a Thought: send what there is, as before
+                    parser.close()
+                    answer = parser.text[parser.answer_start or 0:].strip()
+                    if answer:
+                        yield {"event": "token", "data": answer}
+            else:
+                answer = str(output)
+                yield {"event": "token", "data": answer}
+
+            collected = run_tool_names.get()
+            if collected is not None:
+                collected.extend(
+                    source.tool_name for source in task.extra_state.get("sources", [])
+                )
+            agent.finalize_response(task.task_id, step_output)
+            yield {"event": "answer", "data": answer}
+
+
+_tier_llms: Dict[Tuple[str, str], Any] = {("gemini", "models/gemini-2.0-flash"): llm}
+
+
+def get_tier_llm(tier: str):
+    """LLM used for a routing tier; instances are shared between requests."""
+    if tier == COMPLEX:
+        key = (settings.router.complex_provider, settings.router.complex_model)
+    else:
+        key = (settings.router.fast_provider, settings.router.fast_model)
+    if key not in _tier_llms:
+        _tier_llms[key] = llm_manager.get_resilient_llm(key[0], model=key[1])
+    return _tier_llms[key]
+
+
+def route_query(query: str) -> RouteDecision:
+    if not settings.router.enabled:
+        return RouteDecision(COMPLEX, "router disabled", 0.0)
+    return classify_query(query)
+
+
+async def adirect_reply(query: str, chat_history: List[ChatMessage] = None) -> str:
+    """Answer greetings and small talk with one short call to the fast model."""
+    messages = [
+        ChatMessage(role=MessageRole.SYSTEM, content=DIRECT_REPLY_SYSTEM_PROMPT),
+        *(chat_history or [])[-4:],
+        ChatMessage(role=MessageRole.USER, content=query),
+    ]
+    response = await get_tier_llm(DIRECT).achat(messages)
+    return (response.message.content or "").strip()
+
+
+async def arouted_chat(
+    query: str,
+    chat_history: List[ChatMessage] = None,
+    jwt_token=None,
+) -> str:
+    """
+    Answer a query by fast path, from the response cache, or through _arouted_chat.
+
+    The fast path answers bare coin types and "trending" with one tool call.
+    The cache is used only with RESPONSE_CACHE_ENABLED; answers are stored
+    with the TTL of the tools the run called.
+    """
+    if settings.router.fast_path_enabled:
+        answer = await fast_path.try_answer(query)
+        if answer is not None:
+            return answer
+
+    if not settings.cache.response_enabled:
+        return await _arouted_chat(query, chat_history, jwt_token)
+
+    cached_answer = response_cache.get(query, jwt_token)
+    if cached_answer is not None:
+        logger.info("Response cache hit", extra={"query": query[:80]})
+        return cached_answer
+
+    collector_token = run_tool_names.set([])
+    try:
+        answer = await _arouted_chat(query, chat_history, jwt_token)
+        response_cache.put(query, answer, run_tool_names.get(), jwt_token)
+        return answer
+    finally:
+        run_tool_names.reset(collector_token)
+
+
+async def _arouted_chat(
+    query: str,
+    chat_history: List[ChatMessage] = None,
+    jwt_token=None,
+) -> str:
+    """
+    Answer a query on the cheapest path that can handle it.
+
+    Greetings get a direct reply without tools, single lookups run the agent on
+    the fast model with few iterations (escalating to the large model if they
+    run out), everything else runs on the large model.
+
+    Args:
+        query (str): User's message
+        chat_history (List[ChatMessage], optional): Previous conversation
+        jwt_token (str, optional): User's authorization token for the tools
+
+    Returns:
+        str: The answer
+    """
+    decision = route_query(query)
+    route_token = current_route.set(decision.tier)
+    started = time.perf_counter()
+    tier = decision.tier
+    error = False
+    try:
+        if tier == DIRECT:
+            return await adirect_reply(query, chat_history)
+        if tier == SIMPLE:
+            try:
+                return await areact_chat(
+                    query=query,
+                    llm=get_tier_llm(SIMPLE),
+                    chat_history=chat_history,
+                    max_iterations=settings.router.simple_max_iterations,
+                    jwt_token=jwt_token,
+                )
+            except ValueError as e:
+                if "Reached max iterations" not in str(e):
+                    raise
+                logger.info("Route simple ran out of iterations, escalating to %s", COMPLEX)
+                router_stats.record_escalation(SIMPLE)
+                tier = COMPLEX
+                current_route.set(COMPLEX)
+        return await areact_chat(
+            query=query,
+            llm=get_tier_llm(COMPLEX),
+            chat_history=chat_history,
+            max_iterations=settings.router.complex_max_iterations,
+            jwt_token=jwt_token,
+        )
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        router_stats.record(tier, elapsed, error=error)
+        current_route.reset(route_token)
+        logger.info(
+            "Route %s->%s",
+            decision.tier,
+            tier,
+            extra={
+                "reason": decision.reason,
+                "classify_ms": round(decision.classify_ms, 3),
+                "duration_ms": round(elapsed * 1000, 1),
+            },
+        )
+
+
+def _reset_var(var: ContextVar, token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # Generator closed from another context (e.g. a client disconnect):
+        # the value was set in this generator's context, which is discarded
+        pass
+
+
+async def astream_routed_chat(
+    query: str,
+    chat_history: List[ChatMessage] = None,
+    jwt_token=None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Streaming counterpart of arouted_chat; yields astream_react_chat events.
+
+    A simple-tier run that runs out of iterations before its answer started
+    streaming is escalated to the complex tier, as in _arouted_chat; the
+    steps already streamed stay, and the complex run's steps follow.
+    """
+    if settings.router.fast_path_enabled:
+        answer = await fast_path.try_answer(query)
+        if answer is not None:
+            yield {"event": "token", "data": answer}
+            yield {"event": "answer", "data": answer}
+            return
+
+    use_cache = settings.cache.response_enabled
+    if use_cache:
+        cached_answer = response_cache.get(query, jwt_token)
+        if cached_answer is not None:
+            logger.info("Response cache hit", extra={"query": query[:80]})
+            yield {"event": "token", "data": cached_answer}
+            yield {"event": "answer", "data": cached_answer}
+            return
+    collector_token = run_tool_names.set([]) if use_cache else None
+
+    decision = route_query(query)
+    route_token = current_route.set(decision.tier)
+    started = time.perf_counter()
+    tier = decision.tier
+    error = False
+
+    def cache_answer(event):
+        if event["event"] == "answer" and use_cache:
+            response_cache.put(query, event["data"], run_tool_names.get() or [], jwt_token)
+
+    try:
+        if tier == DIRECT:
+            answer = await adirect_reply(query, chat_history)
+            if use_cache:
+                response_cache.put(query, answer, [], jwt_token)
+            yield {"event": "token", "data": answer}
+            yield {"event": "answer", "data": answer}
+            return
+        if tier == SIMPLE:
+            # Same escalation as _arouted_chat, as long as no answer token went out
+            answering = False
+            try:
+                async for event in astream_react_chat(
+                    query=query,
+                    llm=get_tier_llm(SIMPLE),
+                    chat_history=chat_history,
+                    max_iterations=settings.router.simple_max_iterations,
+                    jwt_token=jwt_token,
+                ):
+                    answering = answering or event["event"] == "token"
+                    cache_answer(event)
+                    yield event
+                return
+            except ValueError as e:
+                if answering or "Reached max iterations" not in str(e):
+                    raise
+                logger.info("Route simple ran out of iterations, escalating to %s", COMPLEX)
+                router_stats.record_escalation(SIMPLE)
+                tier = COMPLEX
+                current_route.set(COMPLEX)
+        async for event in astream_react_chat(
+            query=query,
+            llm=get_tier_llm(COMPLEX),
+            chat_history=chat_history,
+            max_iterations=settings.router.complex_max_iterations,
+            jwt_token=jwt_token,
+        ):
+            cache_answer(event)
+            yield event
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        router_stats.record(tier, elapsed, error=error)
+        _reset_var(current_route, route_token)
+        if collector_token is not None:
+            _reset_var(run_tool_names, collector_token)
+        logger.info(
+            "Route %s->%s",
+            decision.tier,
+            tier,
+            extra={
+                "reason": decision.reason,
+                "classify_ms": round(decision.classify_ms, 3),
+                "duration_ms": round(elapsed * 1000, 1),
+            },
+        )
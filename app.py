@@ -5,12 +5,43 @@ from fastapi import FastAPI, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi import Request
+from contextlib import asynccontextmanager
 
+from commons.http_client import http_client
+from commons.logger import TraceMiddleware, setup_logging, shutdown_logging
+from commons.metrics import MetricsMiddleware, mark_worker_dead
+from commons.webhook_dispatcher import webhook_dispatcher
+from config import settings
+from utils.conversation_store import open_conversation_store
+from utils.market_snapshot import market_snapshot
+from utils.token_index import token_index
 
 from routes.health import router as health_router
-from routes.chat_agent import router as chat_agent_router
+from routes.metrics import router as metrics_router
+from routes.chat_agent import router as chat_agent_router, job_queue
 
-app = FastAPI()
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_conversation_store()
+    await http_client.start()
+    await webhook_dispatcher.start()
+    await job_queue.start()
+    if settings.market.enabled:
+        await market_snapshot.start()
+    if settings.token_index.enabled:
+        await token_index.start()
+    yield
+    await token_index.stop()
+    await market_snapshot.stop()
+    await job_queue.stop()
+    await webhook_dispatcher.stop()
+    await http_client.close()
+    mark_worker_dead()
+    shutdown_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
@@ -28,7 +59,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(TraceMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 v1_router = APIRouter(prefix="/v1")
@@ -71,5 +105,6 @@ async def redirect():
 
 v1_router.include_router(chat_agent_router, prefix="/chat", tags=["Chat"])
 v1_router.include_router(health_router, prefix="/health", tags=["Health"])
+v1_router.include_router(metrics_router, prefix="/metrics", tags=["Health"])
 
 app.include_router(v1_router)
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of the per-request agent setup cost.
+
+Compares the legacy path (ReActAgent.from_tools + update_prompts + rendering the
+tool descriptions on every request, kept here as _build_agent_legacy) with
+AgentTemplate.create_agent. Both sides format the first prompt, since that is
+where the tool block used to be rendered.
+No LLM call is made (MockLLM); agents.py still builds the default Gemini client
+at import time, so run this with the same environment as the API.
+
+Usage:
+    python -m benchmarks.agent_setup --iterations 500
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from llama_index.core import PromptTemplate
+from llama_index.core.agent import ReActAgent
+from llama_index.core.base.llms.types import ChatMessage
+from llama_index.core.llms import MockLLM
+
+from agents import CustomReActChatFormatter, agent_template, request_context, tools
+from prompts.react import REACT_CHAT_SYSTEM_HEADER_CUSTOM
+from utils.output_parser import ReActOutputParser
+
+react_system_prompt = PromptTemplate(REACT_CHAT_SYSTEM_HEADER_CUSTOM)
+
+
+def _build_agent_legacy(
+    llm=None,
+    chat_history: List[ChatMessage] = None,
+    max_iterations=10,
+    jwt_token=None,
+) -> ReActAgent:
+    """Per-request construction used before AgentTemplate."""
+    formatter = CustomReActChatFormatter(jwt_token=jwt_token)
+    agent = ReActAgent.from_tools(
+        tools=tools,
+        llm=llm,
+        verbose=False,
+        chat_history=chat_history,
+        react_chat_formatter=formatter,
+        max_iterations=max_iterations,
+        output_parser=ReActOutputParser()
+    )
+    agent.update_prompts({"agent_worker:system_prompt": react_system_prompt})
+    return agent
+
+
+def _measure(build, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _legacy(llm):
+    agent = _build_agent_legacy(llm=llm, chat_history=[], jwt_token="benchmark")
+    agent.agent_worker._react_chat_formatter.format(tools, chat_history=[])
+
+
+def _template(llm):
+    agent = agent_template.create_agent(llm=llm, chat_history=[])
+    with request_context(jwt_token="benchmark"):
+        agent.agent_worker._react_chat_formatter.format(tools, chat_history=[])
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    llm = MockLLM()
+    # Warm up imports and the template's worker cache
+    _legacy(llm)
+    _template(llm)
+
+    legacy = _summary(_measure(lambda: _legacy(llm), args.iterations))
+    template = _summary(_measure(lambda: _template(llm), args.iterations))
+
+    print(f"legacy   : {legacy}")
+    print(f"template : {template}")
+    print(f"saved per request: {legacy['mean_ms'] - template['mean_ms']:.3f} ms (mean)")
+
+
+if __name__ == "__main__":
+    main()
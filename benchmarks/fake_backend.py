@@ -0,0 +1,95 @@
+"""
+Local stand-in for the RaidenX and AgentFAI APIs, used by the load test.
+
+Serves the recorded search, top-pair, trending and thread-message payloads
+of the fixtures file after `latency` seconds, and records webhook callbacks
+so the load test can time the async route from submission to delivery.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+WEBHOOK_PATH = "/api/v1/backend/message/agent-webhook-trigger"
+
+
+class FakeBackend:
+    """aiohttp server answering the routes the agent's tools and webhooks call."""
+
+    def __init__(self, fixtures: Dict[str, Any], latency: float = 0.05):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self._webhooks: Dict[str, asyncio.Future] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start listening (on a free port by default) and return the base URL."""
+        app = web.Application()
+        app.router.add_get("/api/v1/search", self._search)
+        app.router.add_get("/api/v1/sui/tokens/{address}/top-pair", self._top_pair)
+        app.router.add_get("/api/v1/sui/pairs/trending", self._trending)
+        app.router.add_get("/api/v1/backend/thread/{thread_id}/messages", self._thread_messages)
+        app.router.add_post(WEBHOOK_PATH, self._webhook)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def expect_webhook(self, message_id: str) -> asyncio.Future:
+        """Future resolved with the arrival time (perf_counter) of the message's webhook."""
+        future = asyncio.get_running_loop().create_future()
+        self._webhooks[message_id] = future
+        return future
+
+    async def _respond(self, route: str, payload: Any, status: int = 200) -> web.Response:
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response(payload, status=status)
+
+    async def _search(self, request: web.Request) -> web.Response:
+        docs = self.fixtures["search"].get(request.query.get("search", "").upper(), [])
+        return await self._respond("search", {"docs": docs, "totalDocs": len(docs)})
+
+    async def _top_pair(self, request: web.Request) -> web.Response:
+        pair = self.fixtures["top_pairs"].get(request.match_info["address"])
+        if pair is None:
+            return await self._respond("top_pair", {"message": "Not found"}, status=404)
+        return await self._respond("top_pair", pair)
+
+    async def _trending(self, request: web.Request) -> web.Response:
+        return await self._respond("trending", self.fixtures["trending"])
+
+    async def _thread_messages(self, request: web.Request) -> web.Response:
+        thread_id = request.match_info["thread_id"]
+        messages = [
+            {**message, "id": f"{thread_id}-{i}", "threadId": thread_id}
+            for i, message in enumerate(self.fixtures["thread_messages"])
+        ]
+        return await self._respond("thread_messages", messages)
+
+    async def _webhook(self, request: web.Request) -> web.Response:
+        arrived = time.perf_counter()
+        payload = await request.json()
+        message_id = payload.get("messageId") or payload.get("message_id")
+        future = self._webhooks.pop(message_id, None)
+        if future is not None and not future.done():
+            if "error" in payload:
+                future.set_exception(RuntimeError(payload["error"]))
+            else:
+                future.set_result(arrived)
+        self.requests["webhook"] += 1
+        return web.json_response({"status": "ok"})
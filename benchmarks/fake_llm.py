@@ -0,0 +1,156 @@
+"""
+Scripted stand-in for the chat LLM, used by the load test.
+
+Each transcript is the list of turns the agent should produce for queries
+containing its `match` string. The turn to replay is the number of
+Observations already in the prompt, so a run goes through the same tool
+calls as the recorded one, and concurrent runs do not share any state.
+Queries that match no transcript get `default_reply`.
+
+Every call waits `latency` seconds (plus up to `jitter`) on the event loop,
+like a provider round trip; streams then yield the reply word by word.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Sequence
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+OBSERVATION_PREFIX = "Observation:"
+
+
+class ScriptedLLM(CustomLLM):
+    """Replays ReAct transcripts with a configurable latency."""
+
+    latency: float = Field(default=0.5, description="Seconds per call.")
+    jitter: float = Field(default=0.0, description="Random extra seconds per call.")
+    _transcripts: List[Dict[str, Any]] = PrivateAttr()
+    _default_reply: str = PrivateAttr()
+
+    def __init__(
+        self,
+        transcripts: Sequence[Dict[str, Any]],
+        default_reply: str,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._transcripts = [
+            {"match": t["match"].lower(), "turns": list(t["turns"])} for t in transcripts
+        ]
+        self._default_reply = default_reply
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ScriptedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted", is_chat_model=True)
+
+    def _delay(self) -> float:
+        return self.latency + random.uniform(0, self.jitter)
+
+    def _reply(self, messages: Sequence[ChatMessage]) -> str:
+        query, observations = "", 0
+        for message in reversed(messages):
+            content = message.content or ""
+            if content.startswith(OBSERVATION_PREFIX):
+                observations += 1
+            elif message.role == MessageRole.USER:
+                query = content.lower()
+                break
+        react = any("Action Input" in (m.content or "") for m in messages
+                    if m.role == MessageRole.SYSTEM)
+        for transcript in self._transcripts:
+            if transcript["match"] in query:
+                turns = transcript["turns"]
+                reply = turns[min(observations, len(turns) - 1)]
+                break
+        else:
+            reply = self._default_reply
+        if not react and "Answer:" in reply:
+            # Direct replies and summaries are plain text
+            reply = reply.split("Answer:", 1)[1].strip()
+        return reply
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        time.sleep(self._delay())
+        reply = self._reply(messages)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=reply))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        await asyncio.sleep(self._delay())
+        reply = self._reply(messages)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=reply))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        time.sleep(self._delay())
+        reply = self._reply(messages)
+
+        def gen() -> ChatResponseGen:
+            content = ""
+            for word in reply.split(" "):
+                delta = word if not content else f" {word}"
+                content += delta
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                    delta=delta,
+                )
+
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        await asyncio.sleep(self._delay())
+        reply = self._reply(messages)
+
+        async def gen() -> ChatResponseAsyncGen:
+            content = ""
+            for word in reply.split(" "):
+                delta = word if not content else f" {word}"
+                content += delta
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                    delta=delta,
+                )
+                await asyncio.sleep(0)
+
+        return gen()
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self._delay())
+        return CompletionResponse(
+            text=self._reply([ChatMessage(role=MessageRole.USER, content=prompt)])
+        )
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        time.sleep(self._delay())
+        text = self._reply([ChatMessage(role=MessageRole.USER, content=prompt)])
+
+        def gen() -> CompletionResponseGen:
+            yield CompletionResponse(text=text, delta=text)
+
+        return gen()
@@ -0,0 +1,320 @@
+"""
+Offline load test of the chat API.
+
+Starts a fake RaidenX/AgentFAI server in this process and app:app in a
+uvicorn subprocess (benchmarks.loadtest_app), with every LLM replaced by a
+scripted one that replays the ReAct transcripts of the fixtures file after a
+set latency. Nothing leaves the machine, so runs are comparable between
+commits.
+
+Routes:
+    sync   POST /v1/chat/threads/messages/sync, timed until the response
+    async  POST /v1/chat/threads/messages, timed until its webhook arrives
+
+For each route the report gives p50/p95/p99 latency, throughput, status
+counts and the event-loop lag of the app workers during the run. Results
+are written as JSON; --compare prints the change against an earlier file.
+
+Usage:
+    python -m benchmarks.loadtest --requests 200 --concurrency 20
+    python -m benchmarks.loadtest --routes sync --llm-latency 1.0 --workers 2
+    python -m benchmarks.loadtest --compare benchmarks/results/loadtest-abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+import aiohttp
+
+from benchmarks.fake_backend import FakeBackend
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures" / "loadtest.json"
+RESULTS_DIR = Path(__file__).parent / "results"
+ROUTES = {
+    "sync": "/v1/chat/threads/messages/sync",
+    "async": "/v1/chat/threads/messages",
+}
+# Metrics shown by --compare, with whether higher is better
+COMPARED = (
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("throughput_rps", True),
+    ("loop_lag_p99_ms", False),
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+
+    return {
+        "mean_ms": round(1000 * statistics.mean(ordered), 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(1000 * ordered[-1], 1),
+    }
+
+
+def _app_env(backend_url: str, data_dir: str, args) -> Dict[str, str]:
+    env = dict(os.environ)
+    # Metrics of a single run are not scraped; keep prometheus in process mode
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    env.update({
+        "RAIDENX_API_COMMON_URL": backend_url,
+        "RAIDENX_API_INSIGHT_URL": backend_url,
+        "RAIDENX_API_ORDERS_URL": backend_url,
+        "RAIDENX_API_WALLETS_URL": backend_url,
+        "AGENTFAI_API_URL": backend_url,
+        "CONVERSATION_DB_PATH": os.path.join(data_dir, "chat_history.db"),
+        "JOB_QUEUE_DB_PATH": os.path.join(data_dir, "jobs.db"),
+        "WEBHOOK_OUTBOX_PATH": os.path.join(data_dir, "webhook_outbox.db"),
+        "LOG_LEVEL": args.log_level,
+        "LOADTEST_FIXTURES": str(args.fixtures),
+        "LOADTEST_LLM_LATENCY": str(args.llm_latency),
+        "LOADTEST_LLM_JITTER": str(args.llm_jitter),
+    })
+    return env
+
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str, process, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} during startup")
+        try:
+            async with session.get(f"{url}/v1/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"App not ready after {timeout}s")
+
+
+async def _send(
+    session: aiohttp.ClientSession,
+    backend: FakeBackend,
+    url: str,
+    route: str,
+    index: int,
+    query: str,
+    webhook_timeout: float,
+) -> Dict[str, Any]:
+    message_id = f"{route}-{index}"
+    body = {"content": query, "message_id": message_id, "thread_id": f"loadtest-{route}-{index}"}
+    delivered = backend.expect_webhook(message_id) if route == "async" else None
+    started = time.perf_counter()
+    try:
+        async with session.post(f"{url}{ROUTES[route]}", json=body) as response:
+            await response.read()
+            status = response.status
+        accepted = time.perf_counter()
+        if delivered is None or status != 200:
+            return {"status": status, "latency": accepted - started}
+        arrived = await asyncio.wait_for(delivered, webhook_timeout)
+        return {"status": status, "latency": arrived - started, "accept": accepted - started}
+    except asyncio.TimeoutError:
+        return {"status": "webhook_timeout", "latency": None}
+    except (aiohttp.ClientError, RuntimeError) as e:
+        return {"status": type(e).__name__, "latency": None}
+
+
+async def _run_route(session, backend, url: str, route: str, queries: List[str], args) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(index: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await _send(
+                session, backend, url, route, index, queries[index % len(queries)],
+                args.webhook_timeout,
+            )
+
+    started_at = time.time()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == 200]
+    report = {
+        "requests": len(results),
+        "ok": len(ok),
+        "status_counts": dict(Counter(str(r["status"]) for r in results)),
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        **_latency_summary([r["latency"] for r in ok]),
+    }
+    if route == "async":
+        report["accept"] = _latency_summary([r["accept"] for r in ok if "accept" in r])
+    report["loop_lag"] = await _loop_lag(session, url, started_at, args.workers)
+    lags = [worker["p99_ms"] for worker in report["loop_lag"] if worker.get("samples")]
+    report["loop_lag_p99_ms"] = max(lags) if lags else None
+    return report
+
+
+async def _loop_lag(session, url: str, since: float, workers: int) -> List[Dict[str, Any]]:
+    # Each call is answered by one worker; ask until every worker was seen
+    by_pid: Dict[int, Dict[str, Any]] = {}
+    for _ in range(workers * 5):
+        async with session.get(f"{url}/loadtest/loop-lag", params={"since": str(since)}) as response:
+            summary = await response.json()
+        by_pid[summary["pid"]] = summary
+        if len(by_pid) >= workers:
+            break
+    return sorted(by_pid.values(), key=lambda worker: worker["pid"])
+
+
+async def run(args) -> Dict[str, Any]:
+    with open(args.fixtures, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    queries = args.query or fixtures["queries"]
+
+    backend = FakeBackend(fixtures, latency=args.backend_latency)
+    backend_url = await backend.start()
+    port = args.port or _free_port()
+    url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as data_dir:
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "benchmarks.loadtest_app:app",
+                "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(args.workers), "--log-level", "warning",
+            ],
+            cwd=ROOT,
+            env=_app_env(backend_url, data_dir, args),
+        )
+        connector = aiohttp.TCPConnector(limit=args.concurrency + 5)
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                await _wait_ready(session, url, process, args.startup_timeout)
+                for i in range(args.warmup):
+                    await _send(session, backend, url, "sync", -1 - i, queries[i % len(queries)],
+                                args.webhook_timeout)
+                results = {}
+                for route in args.routes:
+                    results[route] = await _run_route(session, backend, url, route, queries, args)
+                    print(f"{route:5}: {_one_line(results[route])}")
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            await backend.stop()
+
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "backend_latency": args.backend_latency,
+            "queries": queries,
+        },
+        "results": results,
+        "backend_requests": dict(backend.requests),
+    }
+
+
+def _one_line(report: Dict[str, Any]) -> str:
+    return (
+        f"{report['ok']}/{report['requests']} ok, {report['throughput_rps']} req/s, "
+        f"p50 {report.get('p50_ms')} ms, p95 {report.get('p95_ms')} ms, "
+        f"p99 {report.get('p99_ms')} ms, loop lag p99 {report['loop_lag_p99_ms']} ms"
+    )
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the compared metrics of both runs and the relative change."""
+    print(f"\nbaseline {baseline.get('commit')} -> current {current.get('commit')}")
+    if baseline.get("config") != current.get("config"):
+        print("warning: the runs used different settings")
+    for route, report in current["results"].items():
+        base = baseline.get("results", {}).get(route)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED:
+            old, new = base.get(metric), report.get(metric)
+            if not old or new is None:
+                continue
+            change = 100 * (new - old) / old
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  (worse)" if worse and abs(change) >= 5 else ""
+            print(f"{route:5} {metric:16} {old:>10} -> {new:>10} {change:+6.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--routes", nargs="+", choices=sorted(ROUTES), default=["sync", "async"])
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--backend-latency", type=float, default=0.05,
+                        help="Seconds per RaidenX/AgentFAI call")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--query", action="append", help="Query to send (repeatable); "
+                        "defaults to the fixtures' queries")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--webhook-timeout", type=float, default=120)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of the app")
+    parser.add_argument("--output", type=Path, help="Results file "
+                        "(default: benchmarks/results/loadtest-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = args.output or RESULTS_DIR / f"loadtest-{report['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding="utf-8")), report)
+
+
+if __name__ == "__main__":
+    main()
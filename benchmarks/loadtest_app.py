@@ -0,0 +1,97 @@
+"""
+ASGI entry point of the load test: app:app with the scripted LLM.
+
+Every LLM the settings manager builds is replaced by one ScriptedLLM before
+the app is imported, so the routes, router, agent and tools run unchanged
+and only the provider round trip is simulated. Each worker also measures
+its event-loop lag and serves it on /loadtest/loop-lag.
+
+Configured by the load test through the environment:
+    LOADTEST_FIXTURES      fixtures file (transcripts and replies)
+    LOADTEST_LLM_LATENCY   seconds per LLM call
+    LOADTEST_LLM_JITTER    random extra seconds per LLM call
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from benchmarks.fake_llm import ScriptedLLM
+from LLM.llm_settings_manager import LLMSettingsManager
+
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures" / "loadtest.json"
+
+with open(os.getenv("LOADTEST_FIXTURES", DEFAULT_FIXTURES), encoding="utf-8") as f:
+    fixtures = json.load(f)
+
+scripted_llm = ScriptedLLM(
+    fixtures["transcripts"],
+    fixtures["default_reply"],
+    latency=float(os.getenv("LOADTEST_LLM_LATENCY", "0.5")),
+    jitter=float(os.getenv("LOADTEST_LLM_JITTER", "0")),
+)
+LLMSettingsManager.get_llm = lambda self, provider, **kwargs: scripted_llm
+
+from app import app  # noqa: E402
+
+
+class LoopLagMonitor:
+    """Samples how late a short sleep wakes up, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval: float = 0.02, max_samples: int = 200_000):
+        self.interval = interval
+        # (wall time, lag seconds), in time order
+        self._samples = deque(maxlen=max_samples)
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self._samples.append((time.time(), max(0.0, lag)))
+
+    def summary(self, since: float = 0.0) -> dict:
+        samples = list(self._samples)
+        start = bisect.bisect_left(samples, (since,))
+        lags = sorted(lag for _, lag in samples[start:])
+        if not lags:
+            return {"pid": os.getpid(), "samples": 0}
+
+        def pick(q: float) -> float:
+            return round(1000 * lags[min(len(lags) - 1, int(len(lags) * q))], 2)
+
+        return {
+            "pid": os.getpid(),
+            "samples": len(lags),
+            "p50_ms": pick(0.50),
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+            "max_ms": round(1000 * lags[-1], 2),
+        }
+
+
+loop_lag = LoopLagMonitor()
+_app_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def _lifespan(app_):
+    async with _app_lifespan(app_) as state:
+        monitor = asyncio.create_task(loop_lag.run())
+        try:
+            yield state
+        finally:
+            monitor.cancel()
+
+
+app.router.lifespan_context = _lifespan
+
+
+@app.get("/loadtest/loop-lag", include_in_schema=False)
+async def loop_lag_summary(since: float = 0.0):
+    return loop_lag.summary(since)
@@ -0,0 +1,97 @@
+"""
+Observation size before and after compaction, on the load test fixtures.
+
+Each tool's output is built by the tool's own formatter from the fixture
+payloads (no network) and passed through utils.observation. The report gives,
+per tool, the raw and sent tokens, whether the cap truncated it and the
+compaction time. It also gives the prompt tokens saved over a run where the
+Observation is resent on each of the --iterations later ReAct steps.
+
+Usage:
+    python -m benchmarks.observations --provider gemini --iterations 3
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from llama_index.core.tools import ToolOutput
+
+import tools.scan_token as scan_module
+from LLM.llm_settings_manager import LLMSettingsManager
+from tools.get_trending_pairs import format_trending_pairs
+from tools.scan_token import format_top_pair, scan_tokens
+from utils.observation import ObservationCompactor
+
+FIXTURES = Path(__file__).parent / "fixtures" / "loadtest.json"
+
+
+def _tool_outputs(fixtures):
+    top_pairs = fixtures["top_pairs"]
+
+    async def fetch_top_pair(address):
+        return top_pairs.get(address)
+
+    # scan_tokens is exercised as is, with the fixtures standing in for RaidenX
+    scan_module.fetch_top_pair = fetch_top_pair
+    search_doc = next(iter(fixtures["search"].values()))[0]
+    outputs = [
+        ("get_trending_pairs", format_trending_pairs(fixtures["trending"], 5)),
+        ("scan_token", format_top_pair(next(iter(top_pairs.values())))),
+        ("scan_tokens", asyncio.run(scan_tokens(list(top_pairs)))),
+        ("search_token", {
+            "address": search_doc["tokenBase"]["address"],
+            "name": search_doc["tokenBase"]["name"],
+            "symbol": search_doc["tokenBase"]["symbol"],
+            "priceUsd": search_doc["tokenBase"]["priceUsd"],
+            "liquidityUsd": float(search_doc["liquidityUsd"]),
+        }),
+    ]
+    return [
+        (name, ToolOutput(content=str(raw), tool_name=name, raw_input={}, raw_output=raw))
+        for name, raw in outputs
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--provider", default="gemini", help="Token counter to use")
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="Later ReAct steps that resend each Observation")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timing repetitions")
+    args = parser.parse_args()
+
+    with open(FIXTURES, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    manager = LLMSettingsManager()
+
+    def count_tokens(text):
+        return manager.count_tokens(args.provider, text)
+
+    print(f"{'tool':<20}{'raw':>8}{'sent':>8}{'saved':>8}{'run saved':>11}{'us':>9}  truncated")
+    total_raw = total_sent = 0
+    for name, output in _tool_outputs(fixtures):
+        compactor = ObservationCompactor()
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            text = compactor.compact(name, output, count_tokens)
+            samples.append((time.perf_counter() - started) * 1e6)
+        raw, sent = count_tokens(str(output)), count_tokens(text)
+        total_raw, total_sent = total_raw + raw, total_sent + sent
+        print(
+            f"{name:<20}{raw:>8}{sent:>8}{100 * (1 - sent / raw):>7.1f}%"
+            f"{(raw - sent) * (1 + args.iterations):>11}{statistics.median(samples):>9.1f}"
+            f"  {'yes' if 'expand_observation' in text else 'no'}"
+        )
+    print(
+        f"{'total':<20}{total_raw:>8}{total_sent:>8}{100 * (1 - total_sent / total_raw):>7.1f}%"
+        f"{(total_raw - total_sent) * (1 + args.iterations):>11}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Benchmark and fuzz check of the ReAct output parser.
+
+The corpus below holds agent turns in the shapes Gemini and Claude produce for
+this agent's prompt and tools (with their real argument names): single and parallel tool calls, final answers, "Action:
+None" answers, hallucinated observations, code fences and CRLF line endings.
+
+The benchmark compares ReActOutputParser with the regex parser it replaced
+(kept here as `_legacy_parse`, minus its stdout prints, so the figures
+understate the old cost), one-shot and fed in streaming-sized chunks.
+
+--fuzz mutates the corpus (truncation, re-chunking, whitespace and keyword
+noise) and checks that:
+    - feeding any chunking gives the same step as parsing the whole output
+    - the parser only ever raises ValueError
+    - on the unmutated corpus it agrees with the legacy parser
+
+Usage:
+    python -m benchmarks.output_parser --iterations 2000
+    python -m benchmarks.output_parser --fuzz 20000 --seed 1
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+from llama_index.core.agent.react.types import ActionReasoningStep, ResponseReasoningStep
+
+from utils.output_parser import (
+    MultiActionReasoningStep,
+    ReActOutputParser,
+    ReActStreamParser,
+    parse_action_input,
+)
+
+CORPUS = [
+    # Gemini: single tool call
+    'Thought: The user wants the price of HIPPO. I need to find the token first.\n'
+    'Action: search_token\n'
+    'Action Input: {"query": "HIPPO"}',
+    # Gemini: parallel tool calls
+    'Thought: I need data for both tokens, the lookups are independent.\n'
+    'Action: scan_token\n'
+    'Action Input: {"token_address": "0x8993129d72e733985f7f1a00396cbd055bad6f817fee36576ce483c8bbb8b87b::sudeng::SUDENG"}\n'
+    'Action: scan_token\n'
+    'Action Input: {"token_address": "0xf22da9a24ad027cccb5f2d496cbe91de953d363513db08a3a734d361c7c17503::LOFI::LOFI"}',
+    # Gemini: tool call wrapped in a code fence
+    '```\nThought: I should look at what is trending right now.\nAction: get_trending_pairs\n'
+    'Action Input: {"resolution": "1h"}\n```',
+    # Gemini: list argument
+    'Thought: The user pasted two coin types, I can scan them together.\n'
+    'Action: scan_tokens\n'
+    'Action Input: {"token_addresses": ["0x2::sui::SUI", "0x5d4b302506645c37ff133b98c4b50a5ae14841659738d6d733d59d0d217a93bf::coin::COIN"]}',
+    # Gemini: final answer
+    'Thought: I have the trending pairs, I can answer now.\n'
+    'Answer: Here are the top trending pairs on Sui in the last hour:\n\n'
+    '1. **HIPPO/SUI** - $0.0123 (+12.4%)\n2. **LOFI/SUI** - $0.0412 (-3.1%)',
+    # Gemini: "Action: None" answer
+    'Thought: This is a greeting, no tool is needed.\nAction: None\n'
+    'Hello! I can help you with token prices, trending pairs and token scans on Sui.',
+    # Gemini: answer without any Thought
+    'SUI is trading at $3.52, up 4.2% over the last 24 hours.',
+    # Gemini: only a Thought
+    'Thought: The user thanked me. I will reply politely. You are welcome!',
+    # Claude: longer thought, single-quoted input
+    "Thought: The user is asking about a token by its ticker. Before I can scan it I "
+    "need its contract address, so I'll search for it first.\n"
+    "Action: search_token\n"
+    "Action Input: {'query': 'BLUB'}",
+    # Claude: hallucinated observation after the call
+    'Thought: I need the token details.\n'
+    'Action: search_token\n'
+    'Action Input: {"query": "FUD"}\n'
+    'Observation: {"address": "0x76cb::fud::FUD", "price": 0.0000001}\n'
+    'Thought: I can answer now.\nAnswer: FUD trades at $0.0000001.',
+    # Claude: markdown answer with colons and a table
+    'Thought: I now have everything needed to compare both tokens.\n'
+    'Answer: ## Comparison\n\n| Token | Price | Liquidity |\n|---|---|---|\n'
+    '| HIPPO | $0.0123 | $1.2M |\n| LOFI | $0.0412 | $800K |\n\n'
+    'Note: liquidity is summed over all pools.',
+    # Claude: CRLF line endings
+    'Thought: The user wants trending pairs.\r\nAction: get_trending_pairs\r\n'
+    'Action Input: {"resolution": "5m"}\r\n',
+    # Claude: extra blank lines and indentation
+    'Thought: I will scan the token the user pasted.\n\n'
+    '  Action: scan_token\n\n'
+    '  Action Input: {\n    "token_address": "0x2::sui::SUI"\n  }\n',
+    # Claude: thought spanning several lines
+    'Thought: The user asked two things.\nFirst the price of SUI, then the trending pairs.\n'
+    'Both can run at once.\n'
+    'Action: scan_token\nAction Input: {"token_address": "0x2::sui::SUI"}\n'
+    'Action: get_trending_pairs\nAction Input: {"resolution": "24h"}',
+    # Claude: answer in Vietnamese
+    'Thought: Người dùng hỏi giá SUI, tôi đã có dữ liệu.\n'
+    'Answer: Giá SUI hiện tại là $3.52, tăng 4.2% trong 24 giờ qua.',
+    # Malformed: Action without input
+    'Thought: I need to search.\nAction: search_token\n',
+    # Malformed: input without an action
+    'Thought: Searching.\nAction Input: {"query": "SUI"}',
+]
+
+
+def _legacy_parse(output: str, is_streaming: bool = False):
+    """The regex parser ReActOutputParser used before the single-pass rewrite."""
+
+    def extract_tool_use(text):
+        match = re.search(
+            r"Thought:\s*(.*?)[\n\r]+\s*Action:\s*([^\n\r]+)[\n\r]+\s*Action Input:\s*(\{[^}]+\})",
+            text,
+            re.DOTALL,
+        )
+        if not match:
+            raise ValueError(f"Could not parse output. Please follow the thought-action-input format: {text}")
+        return match.group(1).strip(), match.group(2).strip(), match.group(3).strip()
+
+    def extract_final_response(text):
+        match1 = re.search(r"\s*Thought:(.*?)Answer:(.*?)(?:$)", text, re.DOTALL)
+        match2 = re.search(r"\s*Thought:(.*?)Action:\s*None\s*(.*?)(?:$)", text, re.DOTALL)
+        match3 = re.search(r"\s*Thought:(.*?)(?:$)", text, re.DOTALL)
+        if match1:
+            return match1.group(1).strip(), match1.group(2).strip()
+        if match2:
+            return match2.group(1).strip(), match2.group(2).strip()
+        thought = match3.group(1).strip()
+        parts = thought.split(".")
+        return thought, parts[-1].strip() if len(parts[-1]) > 3 else parts[-2].strip()
+
+    def action_step(text):
+        thought, action, action_input = extract_tool_use(text)
+        observation_at = text.find("Observation:")
+        head = text[:observation_at] if observation_at != -1 else text
+        tool_uses = re.findall(r"Action:\s*([^\n\r]+)[\n\r]+\s*Action Input:\s*(\{[^}]+\})", head)
+        steps = [
+            ActionReasoningStep(
+                thought=thought, action=name.strip(), action_input=parse_action_input(raw.strip())
+            )
+            for name, raw in tool_uses
+        ]
+        if len(steps) > 1:
+            return MultiActionReasoningStep(thought=thought, actions=steps)
+        return ActionReasoningStep(
+            thought=thought, action=action, action_input=parse_action_input(action_input)
+        )
+
+    if "Thought:" not in output:
+        return ResponseReasoningStep(
+            thought="(Implicit) I can answer without any more tools!",
+            response=output,
+            is_streaming=is_streaming,
+        )
+    if "Action:" in output and "Action: None" not in output:
+        return action_step(output)
+    if "Answer:" in output or "Action: None" in output:
+        thought, answer = extract_final_response(output)
+        return ResponseReasoningStep(thought=thought, response=answer, is_streaming=is_streaming)
+    if "Action Input:" in output:
+        return action_step(output)
+    thought, answer = extract_final_response(output)
+    return ResponseReasoningStep(thought=thought, response=answer, is_streaming=is_streaming)
+
+
+def _outcome(parse, output):
+    try:
+        return parse(output)
+    except ValueError:
+        return ValueError
+
+
+def _chunks(text, rng, max_size=24):
+    chunks, position = [], 0
+    while position < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+
+def _streamed(chunks):
+    parser = ReActStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.reasoning_step()
+
+
+def _mutate(text, rng):
+    mutation = rng.randrange(6)
+    if mutation == 0:
+        return text[:rng.randrange(len(text) + 1)]
+    if mutation == 1:
+        return text.replace("\n", "\r\n")
+    if mutation == 2:
+        return re.sub(r"\n", lambda _: "\n" + " " * rng.randint(0, 3), text)
+    if mutation == 3:
+        keyword = rng.choice(["Thought:", "Action:", "Action Input:", "Answer:", "Observation:"])
+        at = rng.randrange(len(text) + 1)
+        return text[:at] + keyword + text[at:]
+    if mutation == 4:
+        at = rng.randrange(len(text) + 1)
+        return text[:at] + rng.choice(["{", "}", '"', "'", "\\", ":"]) + text[at:]
+    return text + "\n" + rng.choice(CORPUS)
+
+
+def _fuzz(iterations, seed):
+    rng = random.Random(seed)
+    parser = ReActOutputParser()
+    failures = 0
+
+    for text in CORPUS:
+        new, old = _outcome(parser.parse, text), _outcome(_legacy_parse, text)
+        if new != old:
+            failures += 1
+            print(f"differs from legacy:\n{text!r}\n  new: {new!r}\n  old: {old!r}")
+
+    for _ in range(iterations):
+        text = _mutate(rng.choice(CORPUS), rng)
+        try:
+            whole = _outcome(parser.parse, text)
+            streamed = _outcome(_streamed, _chunks(text, rng))
+        except Exception as e:
+            failures += 1
+            print(f"raised {e!r} on:\n{text!r}")
+            continue
+        if whole != streamed:
+            failures += 1
+            print(f"streaming differs on:\n{text!r}\n  whole: {whole!r}\n  streamed: {streamed!r}")
+
+    print(f"fuzz: {iterations} mutated outputs, {failures} failures")
+    return failures
+
+
+def _measure(parse, inputs, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        for item in inputs:
+            _outcome(parse, item)
+        samples.append((time.perf_counter() - started) * 1_000_000 / len(inputs))
+    return samples
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_us": round(statistics.mean(samples), 2),
+        "p50_us": round(ordered[len(ordered) // 2], 2),
+        "p95_us": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--fuzz", type=int, default=0, help="Number of mutated outputs to check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.fuzz:
+        raise SystemExit(1 if _fuzz(args.fuzz, args.seed) else 0)
+
+    rng = random.Random(args.seed)
+    chunked = [_chunks(text, rng, max_size=8) for text in CORPUS]
+    output_parser = ReActOutputParser()
+
+    legacy = _summary(_measure(_legacy_parse, CORPUS, args.iterations))
+    single_pass = _summary(_measure(output_parser.parse, CORPUS, args.iterations))
+    streamed = _summary(_measure(_streamed, chunked, args.iterations))
+
+    print(f"legacy      : {legacy} per output")
+    print(f"single pass : {single_pass} per output")
+    print(f"streamed    : {streamed} per output (8-char chunks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Replay recorded conversations through the agent, without network access.
+
+Record first, with the API or the Telegram bot running as usual:
+    AGENT_RECORD_MODE=record AGENT_RECORD_PATH=recordings/agent.jsonl.gz ...
+
+Each recording process writes its own part (recordings/agent.<pid>.jsonl.gz);
+the parts are merged into AGENT_RECORD_PATH at the start of the replay.
+
+Every recorded ReAct conversation is then run through agents.areact_chat (or
+astream_react_chat with --stream), with the LLM and the tools answered from
+the recording. LLM calls take no time by default (--latency 1 replays the
+recorded latency), so the figures are the agent's own overhead: prompt
+formatting, output parsing, step bookkeeping and tool dispatch.
+
+The run fails (exit code 1) when a call is missing from the recording or
+when the answers differ between iterations, so it can gate CI.
+
+Usage:
+    python -m benchmarks.replay --path recordings/agent.jsonl.gz --iterations 20
+    python -m benchmarks.replay --stream --profile
+"""
+
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import statistics
+import time
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)], 3),
+    }
+
+
+async def _run_once(agents, conversation, stream: bool) -> str:
+    kwargs = dict(
+        query=conversation["query"],
+        llm=agents.llm,
+        chat_history=conversation["chat_history"],
+        jwt_token="replay",
+    )
+    if not stream:
+        return await agents.areact_chat(**kwargs)
+    answer = ""
+    async for event in agents.astream_react_chat(**kwargs):
+        if event["event"] == "answer":
+            answer = event["data"]
+    return answer
+
+
+async def _replay(agents, recorder, conversations, iterations: int, stream: bool):
+    run_ms, step_ms, answers, misses = [], [], {}, []
+    for _ in range(iterations):
+        recorder.rewind()
+        for index, conversation in enumerate(conversations):
+            llm_calls = recorder.stats()["llm_replayed"]
+            started = time.perf_counter()
+            try:
+                answer = await _run_once(agents, conversation, stream)
+            except Exception as e:
+                misses.append(f"{conversation['query'][:60]!r}: {e}")
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            steps = max(1, recorder.stats()["llm_replayed"] - llm_calls)
+            run_ms.append(elapsed)
+            step_ms.append(elapsed / steps)
+            answers.setdefault(index, set()).add(answer)
+    return run_ms, step_ms, answers, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", help="Recording (default: AGENT_RECORD_PATH)")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--stream", action="store_true", help="Use astream_react_chat")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Fraction of the recorded latency to wait per call")
+    parser.add_argument("--profile", action="store_true", help="Print the top cProfile entries")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so the mode is set before importing the agent
+    os.environ["AGENT_RECORD_MODE"] = "replay"
+    os.environ["AGENT_REPLAY_LATENCY"] = str(args.latency)
+    if args.path:
+        os.environ["AGENT_RECORD_PATH"] = args.path
+
+    import agents
+    from LLM.recording import merge_recordings, recorder
+
+    merged = merge_recordings(recorder.path)
+    if merged:
+        print(f"merged        : {merged} recording parts into {recorder.path}")
+
+    # Direct replies and history summaries are recorded too; only ReAct prompts replay here
+    conversations = [c for c in recorder.conversations() if "Action Input" in c["system"]]
+    if not conversations:
+        raise SystemExit(f"No ReAct conversations in {recorder.path}")
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    run_ms, step_ms, answers, misses = asyncio.run(
+        _replay(agents, recorder, conversations, args.iterations, args.stream)
+    )
+    if profiler:
+        profiler.disable()
+
+    unstable = [conversations[i]["query"][:60] for i, seen in answers.items() if len(seen) > 1]
+    print(f"conversations : {len(conversations)} x {args.iterations} iterations")
+    if run_ms:
+        print(f"per run       : {_summary(run_ms)}")
+        print(f"per LLM step  : {_summary(step_ms)}")
+    print(f"recorder      : {recorder.stats()}")
+    for miss in misses[:10]:
+        print(f"miss          : {miss}")
+    for query in unstable:
+        print(f"not determin. : {query!r}")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    raise SystemExit(1 if misses or unstable else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Shared pooled HTTP client for outbound API calls.
+
+One aiohttp session (and keep-alive connection pool) is kept per upstream base
+URL, so repeated tool calls reuse TCP/TLS connections instead of paying a new
+DNS lookup and handshake every time. The FastAPI lifespan owns start/close;
+sessions are also created lazily so scripts and the Telegram bot can use the
+client without a lifespan.
+"""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from commons.logger import TRACE_HEADER, current_trace_id, span
+from commons.stats import register_stats
+from config import settings
+
+DEFAULT_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class HttpClientError(Exception):
+    """Raised when a request fails after all retries (connection error or timeout)."""
+
+
+@dataclass
+class HttpResponse:
+    """Fully read HTTP response; the connection is already back in the pool."""
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes
+    url: str
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise HttpClientError(f"{self.status_code} error for {self.url}: {self.text[:200]}")
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    latency_total: float = 0.0
+    status_counts: Dict[int, int] = field(default_factory=dict)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HttpClient:
+    """Keep-alive pools per base URL with timeouts and jittered retries."""
+
+    def __init__(self, base_urls: Iterable[str] = ()):
+        self._base_urls = [_origin(url) for url in base_urls]
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self._timeout = aiohttp.ClientTimeout(
+            connect=settings.http.connect_timeout,
+            sock_read=settings.http.read_timeout,
+        )
+
+    async def start(self) -> None:
+        """Open a pool for every configured base URL."""
+        for origin in self._base_urls:
+            self._session(origin)
+
+    async def close(self) -> None:
+        """Close every pool; later calls will lazily reopen them."""
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
+
+    def _session(self, origin: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=settings.http.pool_size,
+                keepalive_timeout=settings.http.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+            self._sessions[origin] = session
+            self._stats.setdefault(origin, PoolStats())
+        return session
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter: spreads retries of concurrent callers over the window
+        ceiling = min(settings.http.backoff_max, settings.http.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        json_body: Any = None,
+        retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES,
+        max_retries: Optional[int] = None,
+    ) -> HttpResponse:
+        """
+        Send a request through the pool for the URL's origin.
+
+        Args:
+            method (str): HTTP method
+            url (str): Absolute URL
+            params (dict, optional): Query parameters
+            headers (dict, optional): Request headers
+            json_body (Any, optional): JSON payload
+            retry_statuses (Iterable[int]): Status codes that are retried
+            max_retries (int, optional): Override of settings.http.max_retries
+
+        Returns:
+            HttpResponse: The last response received (possibly a non-2xx one)
+
+        Raises:
+            HttpClientError: If every attempt failed with a connection error or timeout
+        """
+        origin = _origin(url)
+        session = self._session(origin)
+        stats = self._stats[origin]
+        retries = settings.http.max_retries if max_retries is None else max_retries
+        retry_statuses = frozenset(retry_statuses)
+
+        trace = current_trace_id()
+        if trace:
+            headers = {**(headers or {}), TRACE_HEADER: trace}
+
+        parts = urlsplit(url)
+        with span("io", f"{method} {parts.path}", host=parts.netloc):
+            attempt = 0
+            while True:
+                stats.requests += 1
+                stats.in_flight += 1
+                started = time.perf_counter()
+                try:
+                    async with session.request(
+                        method, url, params=params, headers=headers, json=json_body
+                    ) as response:
+                        body = await response.read()
+                        result = HttpResponse(
+                            status_code=response.status,
+                            headers=dict(response.headers),
+                            body=body,
+                            url=str(response.url),
+                        )
+                    error = None
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    result, error = None, e
+                finally:
+                    stats.in_flight -= 1
+                    stats.latency_total += time.perf_counter() - started
+
+                if result is not None:
+                    stats.status_counts[result.status_code] = stats.status_counts.get(result.status_code, 0) + 1
+                    if result.status_code not in retry_statuses or attempt >= retries:
+                        return result
+                elif attempt >= retries:
+                    stats.failures += 1
+                    raise HttpClientError(
+                        f"{method} {url} failed after {attempt + 1} attempts: {error!r}"
+                    ) from error
+
+                stats.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-origin pool statistics."""
+        result = {}
+        for origin, stats in self._stats.items():
+            session = self._sessions.get(origin)
+            connector = session.connector if session is not None else None
+            result[origin] = {
+                "open": session is not None and not session.closed,
+                "pool_limit": connector.limit_per_host if connector else 0,
+                "requests": stats.requests,
+                "retries": stats.retries,
+                "failures": stats.failures,
+                "in_flight": stats.in_flight,
+                "avg_latency_ms": round(1000 * stats.latency_total / stats.requests, 2)
+                if stats.requests else 0.0,
+                "status_counts": dict(stats.status_counts),
+            }
+        return result
+
+
+http_client = HttpClient(
+    base_urls=[
+        *settings.raiden.get_config().values(),
+        settings.agent.api_url,
+    ]
+)
+
+register_stats("http_pools", http_client.stats)
@@ -0,0 +1,283 @@
+"""Structured logging and per-request tracing.
+
+Log calls only put the record on a bounded queue (QueueHandler); a
+QueueListener thread formats it (JSON lines by default) and writes it, so a
+slow stdout or pm2 pipe never blocks the event loop. When the queue is full,
+records are dropped and counted instead of waiting.
+
+Every record carries the trace id of the request it belongs to. Spans time a
+unit of work:
+
+    with span("tool", "search_token"):
+        ...
+
+Each span is logged (DEBUG) with its duration, and its time is added to the
+trace's breakdown by kind. When the trace ends, one INFO record gives the
+total time split into llm, tool and io time. Only the outermost span of
+those kinds counts towards the breakdown, so HTTP calls made inside a tool
+are tool time, not io time as well. Concurrent spans (parallel tool calls)
+add up, so the parts can exceed the total.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from commons.stats import register_stats
+from config import settings
+
+# Span kinds that make up the per-trace breakdown
+BREAKDOWN_KINDS = ("llm", "tool", "io")
+TRACE_HEADER = "X-Trace-Id"
+
+trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+# Shared (mutable) by every task of the trace, so concurrent tools add up
+_trace_totals: ContextVar[Optional[Dict[str, float]]] = ContextVar("trace_totals", default=None)
+# Breakdown kind of the enclosing span, if any
+_breakdown_kind: ContextVar[Optional[str]] = ContextVar("breakdown_kind", default=None)
+
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_listener: Optional[logging.handlers.QueueListener] = None
+_stats = {"dropped": 0}
+
+logger = logging.getLogger("agent.trace")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are added as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TraceFilter(logging.Filter):
+    """Adds the trace id; runs in the caller, where the context is."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id.get()
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+
+def _output_handler(file_path: str, log_format: str) -> logging.Handler:
+    handler: logging.Handler
+    if file_path:
+        try:
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            handler = logging.FileHandler(file_path, encoding="utf-8")
+        except OSError as e:
+            sys.stderr.write(f"Cannot log to {file_path} ({e}), logging to stdout\n")
+            handler = logging.StreamHandler(sys.stdout)
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s")
+        )
+    return handler
+
+
+def setup_logging(
+    level: str = settings.log.level,
+    log_format: str = settings.log.format,
+    file_path: str = settings.log.file_path,
+    queue_size: int = settings.log.queue_size,
+) -> None:
+    """
+    Route the root logger through the background queue; safe to call twice.
+
+    Args:
+        level (str): Root log level
+        log_format (str): "json" or "text"
+        file_path (str): Log file, or empty for stdout
+        queue_size (int): Records that can wait for the writer thread
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(_TraceFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    # Keep third-party debug output (HTTP clients, LLM SDKs) out of DEBUG runs
+    for name in ("httpx", "httpcore", "urllib3", "asyncio"):
+        logging.getLogger(name).setLevel(max(root.level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, _output_handler(file_path, log_format), respect_handler_level=True
+    )
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def current_trace_id() -> Optional[str]:
+    return trace_id.get()
+
+
+@contextmanager
+def start_trace(name: str, trace: Optional[str] = None, **fields: Any) -> Iterator[str]:
+    """
+    Run the enclosed code under a trace id and log its breakdown at the end.
+
+    Args:
+        name (str): What is traced, e.g. the route path
+        trace (str, optional): Id to continue (from a header or a queued job)
+        **fields: Extra fields for the summary record
+
+    Yields:
+        str: The trace id
+    """
+    current = trace or uuid.uuid4().hex[:16]
+    totals: Dict[str, float] = {}
+    id_token = trace_id.set(current)
+    totals_token = _trace_totals.set(totals)
+    kind_token = _breakdown_kind.set(None)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = repr(e)[:200]
+        raise
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        breakdown = {f"{kind}_ms": round(totals.get(kind, 0.0), 1) for kind in BREAKDOWN_KINDS}
+        logger.info(
+            "trace finished",
+            extra={
+                "trace": name,
+                "duration_ms": round(total_ms, 1),
+                **breakdown,
+                "other_ms": round(max(0.0, total_ms - sum(breakdown.values())), 1),
+                "spans": {kind: round(ms, 1) for kind, ms in totals.items()
+                          if kind not in BREAKDOWN_KINDS},
+                "error": error,
+                **fields,
+            },
+        )
+        # Generators may be finalized in another context, where reset() fails
+        for var, token in ((trace_id, id_token), (_trace_totals, totals_token),
+                           (_breakdown_kind, kind_token)):
+            try:
+                var.reset(token)
+            except ValueError:
+                var.set(None)
+
+
+def record_span(kind: str, name: str, duration: float, **fields: Any) -> None:
+    """
+    Log a span measured by the caller and add it to the trace breakdown.
+
+    Args:
+        kind (str): "llm", "tool", "io" or any other label (e.g. "step")
+        name (str): Operation name
+        duration (float): Seconds
+        **fields: Extra fields for the span record
+    """
+    duration_ms = duration * 1000
+    totals = _trace_totals.get()
+    if totals is not None and (kind not in BREAKDOWN_KINDS or _breakdown_kind.get() is None):
+        totals[kind] = totals.get(kind, 0.0) + duration_ms
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "span",
+            extra={"kind": kind, "span": name, "duration_ms": round(duration_ms, 2), **fields},
+        )
+
+
+@contextmanager
+def span(kind: str, name: str, **fields: Any) -> Iterator[None]:
+    """Time the enclosed code as a span; see record_span."""
+    kind_token = None
+    if kind in BREAKDOWN_KINDS and _breakdown_kind.get() is None:
+        kind_token = _breakdown_kind.set(kind)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = repr(e)[:200]
+        raise
+    finally:
+        if kind_token is not None:
+            _breakdown_kind.reset(kind_token)
+        record_span(kind, name, time.perf_counter() - started, error=error, **fields)
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware running each HTTP request in its own trace.
+
+    An incoming X-Trace-Id header is continued, and the id is returned in the
+    response headers. The trace ends when the response body has been sent,
+    so streamed responses are timed in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.lower().encode())
+        with start_trace(
+            scope.get("path", ""),
+            trace=incoming.decode("latin-1")[:64] if incoming else None,
+            method=scope.get("method"),
+        ) as current:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (TRACE_HEADER.lower().encode(), current.encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+register_stats(
+    "logging",
+    lambda: {"dropped": _stats["dropped"], "queued": _listener.queue.qsize() if _listener else 0},
+)
@@ -0,0 +1,177 @@
+"""Prometheus metrics for requests, LLM calls, tools, the job queue and market data.
+
+With PROMETHEUS_MULTIPROC_DIR set (runserver.sh and the Dockerfile do it),
+every uvicorn worker writes its samples to files in that directory and
+/v1/metrics aggregates all of them, whichever worker answers the scrape.
+The directory must be emptied before the workers start. Without it, the
+metrics of the answering process are served (single worker, scripts).
+"""
+
+import os
+import time
+from typing import Any, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import REGISTRY, multiprocess
+
+from LLM.prompt_cache import extract_cache_usage
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Agent runs take seconds; LLM calls and tools take from ~100 ms
+REQUEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+CALL_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+REQUEST_LATENCY = Histogram(
+    "agent_request_duration_seconds",
+    "End-to-end latency of HTTP requests and queued message jobs.",
+    ["endpoint", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "agent_llm_call_duration_seconds",
+    "Latency of successful LLM calls (time to first chunk for streams).",
+    ["provider", "model"],
+    buckets=CALL_BUCKETS,
+)
+LLM_ERRORS = Counter(
+    "agent_llm_call_errors_total",
+    "Failed LLM calls (calls cancelled on timeout are not counted).",
+    ["provider", "model"],
+)
+LLM_TOKENS = Histogram(
+    "agent_llm_tokens",
+    "Tokens per LLM call.",
+    ["provider", "model", "type"],
+    buckets=TOKEN_BUCKETS,
+)
+TOOL_LATENCY = Histogram(
+    "agent_tool_duration_seconds",
+    "Latency of agent tool calls.",
+    ["tool"],
+    buckets=CALL_BUCKETS,
+)
+TOOL_ERRORS = Counter(
+    "agent_tool_errors_total",
+    "Tool calls that returned an error (including step deadline timeouts).",
+    ["tool"],
+)
+REACT_ITERATIONS = Histogram(
+    "agent_react_iterations",
+    "ReAct steps per agent run.",
+    ["tier"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+OBSERVATION_TOKENS = Counter(
+    "agent_observation_tokens_total",
+    "Observation tokens per tool, as returned (raw) and as sent to the LLM (sent).",
+    ["tool", "stage"],
+)
+MAX_ITERATIONS = Counter(
+    "agent_max_iterations_total",
+    "Agent runs that stopped at max_iterations.",
+    ["tier"],
+)
+QUEUE_DEPTH = Gauge(
+    "agent_job_queue_depth",
+    "Jobs accepted but not started yet.",
+    multiprocess_mode="livesum",
+)
+QUEUE_RUNNING = Gauge(
+    "agent_job_queue_running",
+    "Jobs currently running.",
+    multiprocess_mode="livesum",
+)
+MARKET_SNAPSHOT_UPDATED = Gauge(
+    "agent_market_snapshot_updated_timestamp_seconds",
+    "Unix time of the last market snapshot refresh (oldest worker).",
+    multiprocess_mode="min",
+)
+
+
+def split_backend_name(name: str) -> Tuple[str, str]:
+    """("gemini", "models/gemini-2.0-flash") from "gemini:models/gemini-2.0-flash"."""
+    provider, _, model = name.partition(":")
+    return provider, model or provider
+
+
+def observe_llm_call(name: str, duration: float, response: Optional[Any] = None) -> None:
+    """
+    Record a successful LLM call and, if the response reports them, its tokens.
+
+    Args:
+        name (str): Backend name, "provider:model"
+        duration (float): Seconds
+        response (optional): Chat/completion response (or last stream chunk)
+    """
+    LLM_LATENCY.labels(*split_backend_name(name)).observe(duration)
+    if response is not None:
+        observe_llm_tokens(name, response)
+
+
+def observe_llm_tokens(name: str, response: Any) -> None:
+    usage = extract_cache_usage(getattr(response, "raw", None))
+    if usage is not None:
+        provider, model = split_backend_name(name)
+        LLM_TOKENS.labels(provider, model, "prompt").observe(usage["prompt_tokens"])
+        LLM_TOKENS.labels(provider, model, "completion").observe(usage["completion_tokens"])
+
+
+def observe_llm_error(name: str) -> None:
+    LLM_ERRORS.labels(*split_backend_name(name)).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition text of every worker's metrics, and its content type."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges when it shuts down."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request into REQUEST_LATENCY.
+
+    Requests are labelled with the route template (unmatched paths share one
+    label) and the response status, and end when the body has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched route to the (shared) scope
+            endpoint = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.labels(endpoint, str(status)).observe(time.perf_counter() - started)
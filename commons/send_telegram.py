@@ -1,10 +1,13 @@
 import asyncio
+import logging
 import os
 from telethon import TelegramClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class TelegramMessenger:
     def __init__(self):
         self.api_id = os.getenv("TELEGRAM_API_ID")
@@ -24,13 +27,13 @@ class TelegramMessenger:
                 await client.connect()
                 await client.send_message(self.group_id, message)
         except TimeoutError:
-            print("Gửi tin nhắn bị timeout, thử lại sau 5 giây...")
+            logger.warning("Gửi tin nhắn bị timeout, thử lại sau 5 giây...")
             await asyncio.sleep(5)
             async with TelegramClient(self.session_name, self.api_id, self.api_hash) as client:
                 await client.connect()
                 await client.send_message(self.group_id, message)
         except Exception as e:
-            print(f"Lỗi khi gửi tin nhắn: {str(e)}")
+            logger.error("Lỗi khi gửi tin nhắn: %s", e)
 
 # async def main():
 #     messenger = TelegramMessenger()
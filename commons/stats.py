@@ -0,0 +1,27 @@
+"""Registry of runtime statistics exposed by /v1/health/stats."""
+
+from typing import Any, Callable, Dict
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Register a callable returning a JSON-serialisable snapshot of a component.
+
+    Args:
+        name (str): Section name in the stats response
+        provider (Callable): Function returning the component statistics
+    """
+    _providers[name] = provider
+
+
+def collect_stats() -> Dict[str, Any]:
+    """Collect the statistics of every registered component."""
+    result = {}
+    for name, provider in _providers.items():
+        try:
+            result[name] = provider()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
@@ -0,0 +1,276 @@
+"""Delivery of agent results to the AgentFAI webhook.
+
+One long-lived aiohttp session is reused for every callback. Timeouts, 429 and
+5xx answers are retried with exponential backoff; callbacks that still fail are
+written to a SQLite outbox and re-sent by a background loop, so an answer is
+not lost when the backend is briefly down. The outbox database is opened in
+start() (the app lifespan), off the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from commons.logger import TRACE_HEADER, current_trace_id, span
+from commons.stats import register_stats
+from config.settings import settings
+from utils.concurrency import run_sync
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class _Outbox:
+    """SQLite table of undelivered callbacks, shareable between workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, url: str, payload: Dict[str, Any], retry_in: float) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO outbox (url, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+            (url, json.dumps(payload, ensure_ascii=False), now, now + retry_in),
+        )
+
+    def claim_due(self, limit: int, claim_seconds: float) -> List[Tuple[int, str, Dict[str, Any], int]]:
+        """Reserve due rows so other workers do not send them at the same time."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, url, payload, attempts FROM outbox "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + claim_seconds, row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def remove(self, row_id: int) -> None:
+        self._connect().execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def reschedule(self, row_id: int, attempts: int, retry_in: float) -> None:
+        self._connect().execute(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+            (attempts, time.time() + retry_in, row_id),
+        )
+
+    def size(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+class WebhookDispatcher:
+    """Sends webhook callbacks with retries and an outbox."""
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        outbox_path: Optional[str] = None,
+        outbox_interval: float = 30.0,
+        outbox_max_attempts: int = 20,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.outbox_interval = outbox_interval
+        self.outbox_max_attempts = outbox_max_attempts
+        self.outbox_path = outbox_path
+        # Opened by start(); shared by every worker through the database file
+        self._outbox: Optional[_Outbox] = None
+        # Rows in the outbox as of the last flush, plus those added since
+        self._outbox_size = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._stats = {
+            "delivered": 0,
+            "retries": 0,
+            "failed_attempts": 0,
+            "outboxed": 0,
+            "outbox_delivered": 0,
+            "dropped": 0,
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Content-Type": "application/json",
+                    "X-API-KEY": self.api_key,
+                },
+            )
+        return self._session
+
+    async def start(self) -> None:
+        self._get_session()
+        if self.outbox_path and self._outbox is None:
+            self._outbox = await run_sync(_Outbox, self.outbox_path)
+            self._outbox_size = await run_sync(self._outbox.size)
+            self._tasks.append(asyncio.create_task(self._outbox_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _post_once(
+        self, url: str, payload: Dict[str, Any], trace: Optional[str] = None
+    ) -> Tuple[bool, bool]:
+        """Returns (delivered, retryable)."""
+        headers = {TRACE_HEADER: trace} if trace else None
+        try:
+            async with self._get_session().post(url, json=payload, headers=headers) as response:
+                body = await response.text()
+                if response.status < 300:
+                    return True, False
+                logger.warning(
+                    "Webhook rejected", extra={"status": response.status, "body": body[:200]}
+                )
+                return False, response.status in RETRY_STATUSES
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Webhook request error: %r", e)
+            return False, True
+
+    async def _send(self, url: str, payload: Dict[str, Any], trace: Optional[str] = None) -> bool:
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            delivered, retryable = await self._post_once(url, payload, trace)
+            if delivered:
+                self._stats["delivered"] += 1
+                self._latencies.append(time.perf_counter() - started)
+                return True
+            self._stats["failed_attempts"] += 1
+            if not retryable:
+                self._stats["dropped"] += 1
+                return False
+            if attempt < self.max_retries:
+                self._stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+        if self._outbox is not None:
+            await run_sync(self._outbox.add, url, payload, self.outbox_interval)
+            self._stats["outboxed"] += 1
+            self._outbox_size += 1
+        else:
+            self._stats["dropped"] += 1
+        return False
+
+    async def deliver(self, payload: Dict[str, Any], url: Optional[str] = None) -> bool:
+        """
+        Deliver one callback.
+
+        Args:
+            payload (dict): JSON body of the callback
+            url (str, optional): Override of the configured webhook URL
+
+        Returns:
+            bool: True if delivered now; False if it was queued in the outbox
+                (or dropped after a non-retryable error)
+        """
+        url = url or self.url
+        trace = current_trace_id()
+        with span("io", "webhook"):
+            return await self._send(url, payload, trace)
+
+    async def _outbox_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.outbox_interval)
+            try:
+                rows = await run_sync(self._outbox.claim_due, 50, self.outbox_interval * 2)
+                for row_id, url, payload, attempts in rows:
+                    delivered, retryable = await self._post_once(url, payload)
+                    if delivered:
+                        self._stats["outbox_delivered"] += 1
+                        await run_sync(self._outbox.remove, row_id)
+                    elif not retryable or attempts + 1 >= self.outbox_max_attempts:
+                        self._stats["dropped"] += 1
+                        logger.error(
+                            "Dropping webhook outbox entry %s after %s attempts", row_id, attempts + 1
+                        )
+                        await run_sync(self._outbox.remove, row_id)
+                    else:
+                        await run_sync(
+                            self._outbox.reschedule,
+                            row_id,
+                            attempts + 1,
+                            min(3600, self.outbox_interval * (2 ** attempts)),
+                        )
+                self._outbox_size = await run_sync(self._outbox.size)
+            except Exception as e:
+                logger.warning("Webhook outbox flush failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            **self._stats,
+            "outbox_size": self._outbox_size,
+            "latency_ms_p50": round(1000 * latencies[len(latencies) // 2], 1) if latencies else 0.0,
+            "latency_ms_p95": round(1000 * latencies[int(len(latencies) * 0.95) - 1], 1)
+            if latencies else 0.0,
+        }
+
+
+WEBHOOK_PATH = "/api/v1/backend/message/agent-webhook-trigger"
+
+webhook_dispatcher = WebhookDispatcher(
+    url=f"{settings.agent.api_url}{WEBHOOK_PATH}",
+    api_key=settings.agent.api_key,
+    timeout=settings.webhook.timeout,
+    max_retries=settings.webhook.max_retries,
+    retry_delay=settings.webhook.retry_delay,
+    outbox_path=settings.webhook.outbox_path if settings.webhook.outbox_enabled else None,
+    outbox_interval=settings.webhook.outbox_interval,
+)
+register_stats("webhooks", webhook_dispatcher.stats)
@@ -12,6 +12,7 @@ class RaidenSettings:
     api_insight_url: str = os.getenv('RAIDENX_API_INSIGHT_URL', 'https://api-insight.dextrade.bot')
     api_orders_url: str = os.getenv('RAIDENX_API_ORDERS_URL', 'https://api-orders.dextrade.bot')
     api_wallets_url: str = os.getenv('RAIDENX_API_WALLETS_URL', 'https://api-wallets.dextrade.bot')
+    scan_concurrency: int = int(os.getenv('RAIDENX_SCAN_CONCURRENCY', '5'))
 
     def get_config(self) -> Dict[str, str]:
         """Returns RaidenX configuration as dictionary"""
@@ -35,11 +36,306 @@ class AgentSettings:
             'api_key': self.api_key
         }
 
+@dataclass
+class RuntimeSettings:
+    """Settings for agent execution inside each API worker"""
+    sync_tool_workers: int = int(os.getenv('AGENT_SYNC_TOOL_WORKERS', '8'))
+    step_deadline: float = float(os.getenv('AGENT_STEP_DEADLINE', '30'))
+    max_parallel_actions: int = int(os.getenv('AGENT_MAX_PARALLEL_ACTIONS', '5'))
+
+    def get_config(self) -> Dict[str, float]:
+        """Returns runtime configuration as dictionary"""
+        return {
+            'sync_tool_workers': self.sync_tool_workers,
+            'step_deadline': self.step_deadline,
+            'max_parallel_actions': self.max_parallel_actions
+        }
+
+@dataclass
+class StorageSettings:
+    """Settings for conversation history storage"""
+    conversation_backend: str = os.getenv('CONVERSATION_STORE', 'sqlite')
+    conversation_db_path: str = os.getenv('CONVERSATION_DB_PATH', 'chat_history.db')
+    history_max_messages: int = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '20'))
+    legacy_history_file: str = os.getenv('CHAT_HISTORY_FILE', 'chat_history.json')
+    thread_history_window: int = int(os.getenv('THREAD_HISTORY_WINDOW', '20'))
+    thread_history_ttl: float = float(os.getenv('THREAD_HISTORY_TTL', '60'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns storage configuration as dictionary"""
+        return {
+            'conversation_backend': self.conversation_backend,
+            'conversation_db_path': self.conversation_db_path,
+            'history_max_messages': self.history_max_messages,
+            'legacy_history_file': self.legacy_history_file,
+            'thread_history_window': self.thread_history_window,
+            'thread_history_ttl': self.thread_history_ttl
+        }
+
+@dataclass
+class HttpSettings:
+    """Settings for the shared outbound HTTP client"""
+    connect_timeout: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+    read_timeout: float = float(os.getenv('HTTP_READ_TIMEOUT', '15'))
+    pool_size: int = int(os.getenv('HTTP_POOL_SIZE', '20'))
+    keepalive_timeout: float = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+    max_retries: int = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+    backoff_base: float = float(os.getenv('HTTP_BACKOFF_BASE', '0.2'))
+    backoff_max: float = float(os.getenv('HTTP_BACKOFF_MAX', '2'))
+
+    def get_config(self) -> Dict[str, float]:
+        """Returns HTTP client configuration as dictionary"""
+        return {
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'pool_size': self.pool_size,
+            'keepalive_timeout': self.keepalive_timeout,
+            'max_retries': self.max_retries,
+            'backoff_base': self.backoff_base,
+            'backoff_max': self.backoff_max
+        }
+
+@dataclass
+class CacheSettings:
+    """Settings for market-data tool caches (TTLs in seconds)"""
+    trending_ttl: float = float(os.getenv('CACHE_TRENDING_TTL', '15'))
+    top_pair_ttl: float = float(os.getenv('CACHE_TOP_PAIR_TTL', '30'))
+    search_ttl: float = float(os.getenv('CACHE_SEARCH_TTL', '300'))
+    max_entries: int = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    stale_while_revalidate: bool = os.getenv('CACHE_STALE_WHILE_REVALIDATE', 'false').lower() == 'true'
+    response_enabled: bool = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+    response_similarity: float = float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.8'))
+    response_static_ttl: float = float(os.getenv('RESPONSE_CACHE_STATIC_TTL', '3600'))
+    response_max_entries: int = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+
+    def get_config(self) -> Dict[str, float]:
+        """Returns cache configuration as dictionary"""
+        return {
+            'trending_ttl': self.trending_ttl,
+            'top_pair_ttl': self.top_pair_ttl,
+            'search_ttl': self.search_ttl,
+            'max_entries': self.max_entries,
+            'stale_while_revalidate': self.stale_while_revalidate,
+            'response_enabled': self.response_enabled,
+            'response_similarity': self.response_similarity,
+            'response_static_ttl': self.response_static_ttl,
+            'response_max_entries': self.response_max_entries
+        }
+
+@dataclass
+class QueueSettings:
+    """Settings for the background job queue of the async message route"""
+    workers: int = int(os.getenv('JOB_QUEUE_WORKERS', '4'))
+    max_size: int = int(os.getenv('JOB_QUEUE_MAX_SIZE', '100'))
+    durable: bool = os.getenv('JOB_QUEUE_DURABLE', 'false').lower() == 'true'
+    db_path: str = os.getenv('JOB_QUEUE_DB_PATH', 'jobs.db')
+    lease_seconds: float = float(os.getenv('JOB_QUEUE_LEASE_SECONDS', '60'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns job queue configuration as dictionary"""
+        return {
+            'workers': self.workers,
+            'max_size': self.max_size,
+            'durable': self.durable,
+            'db_path': self.db_path,
+            'lease_seconds': self.lease_seconds
+        }
+
+@dataclass
+class WebhookSettings:
+    """Settings for delivering agent results to the AgentFAI webhook"""
+    timeout: float = float(os.getenv('WEBHOOK_TIMEOUT', '30'))
+    max_retries: int = int(os.getenv('WEBHOOK_MAX_RETRIES', '3'))
+    retry_delay: float = float(os.getenv('WEBHOOK_RETRY_DELAY', '1'))
+    outbox_enabled: bool = os.getenv('WEBHOOK_OUTBOX', 'true').lower() == 'true'
+    outbox_path: str = os.getenv('WEBHOOK_OUTBOX_PATH', 'webhook_outbox.db')
+    outbox_interval: float = float(os.getenv('WEBHOOK_OUTBOX_INTERVAL', '30'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns webhook delivery configuration as dictionary"""
+        return {
+            'timeout': self.timeout,
+            'max_retries': self.max_retries,
+            'retry_delay': self.retry_delay,
+            'outbox_enabled': self.outbox_enabled,
+            'outbox_path': self.outbox_path,
+            'outbox_interval': self.outbox_interval
+        }
+
+@dataclass
+class ContextSettings:
+    """Settings for the token budget of the chat history sent to the LLM"""
+    budget_tokens: int = int(os.getenv('CONTEXT_TOKEN_BUDGET', '2000'))
+    summary_max_tokens: int = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', '300'))
+    refill_ratio: float = float(os.getenv('CONTEXT_REFILL_RATIO', '0.6'))
+    min_recent_messages: int = int(os.getenv('CONTEXT_MIN_RECENT_MESSAGES', '2'))
+    summarize: bool = os.getenv('CONTEXT_SUMMARIZE', 'true').lower() == 'true'
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns context window configuration as dictionary"""
+        return {
+            'budget_tokens': self.budget_tokens,
+            'summary_max_tokens': self.summary_max_tokens,
+            'refill_ratio': self.refill_ratio,
+            'min_recent_messages': self.min_recent_messages,
+            'summarize': self.summarize
+        }
+
+@dataclass
+class RouterSettings:
+    """Settings for routing queries between the direct, fast and large model paths"""
+    enabled: bool = os.getenv('ROUTER_ENABLED', 'true').lower() == 'true'
+    fast_path_enabled: bool = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+    fast_provider: str = os.getenv('ROUTER_FAST_PROVIDER', 'gemini')
+    fast_model: str = os.getenv('ROUTER_FAST_MODEL', 'models/gemini-2.0-flash')
+    complex_provider: str = os.getenv('ROUTER_COMPLEX_PROVIDER', 'gemini')
+    # Same model as the fast tier by default; set e.g. models/gemini-1.5-pro to opt in
+    complex_model: str = os.getenv('ROUTER_COMPLEX_MODEL', 'models/gemini-2.0-flash')
+    simple_max_iterations: int = int(os.getenv('ROUTER_SIMPLE_MAX_ITERATIONS', '4'))
+    complex_max_iterations: int = int(os.getenv('ROUTER_COMPLEX_MAX_ITERATIONS', '10'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns router configuration as dictionary"""
+        return {
+            'enabled': self.enabled,
+            'fast_path_enabled': self.fast_path_enabled,
+            'fast_provider': self.fast_provider,
+            'fast_model': self.fast_model,
+            'complex_provider': self.complex_provider,
+            'complex_model': self.complex_model,
+            'simple_max_iterations': self.simple_max_iterations,
+            'complex_max_iterations': self.complex_max_iterations
+        }
+
+@dataclass
+class LogSettings:
+    """Settings for structured logging and request tracing"""
+    level: str = os.getenv('LOG_LEVEL', 'INFO').upper()
+    format: str = os.getenv('LOG_FORMAT', 'json').lower()
+    file_path: str = os.getenv('LOG_FILE_PATH', '')
+    queue_size: int = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns logging configuration as dictionary"""
+        return {
+            'level': self.level,
+            'format': self.format,
+            'file_path': self.file_path,
+            'queue_size': self.queue_size
+        }
+
+@dataclass
+class MarketSnapshotSettings:
+    """Settings for the background market-data snapshot (intervals in seconds)
+
+    Every API worker polls: WORKERS x (resolutions + hot_tokens) upstream
+    requests per interval, 5 x (4 + 20) = 120 every 20s with the defaults.
+    """
+    enabled: bool = os.getenv('MARKET_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    interval: float = float(os.getenv('MARKET_SNAPSHOT_INTERVAL', '20'))
+    max_age: float = float(os.getenv('MARKET_SNAPSHOT_MAX_AGE', '60'))
+    resolutions: str = os.getenv('MARKET_SNAPSHOT_RESOLUTIONS', '5m,1h,6h,24h')
+    trending_limit: int = int(os.getenv('MARKET_SNAPSHOT_TRENDING_LIMIT', '10'))
+    hot_tokens: int = int(os.getenv('MARKET_SNAPSHOT_HOT_TOKENS', '20'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns market snapshot configuration as dictionary"""
+        return {
+            'enabled': self.enabled,
+            'interval': self.interval,
+            'max_age': self.max_age,
+            'resolutions': self.resolutions,
+            'trending_limit': self.trending_limit,
+            'hot_tokens': self.hot_tokens
+        }
+
+@dataclass
+class TokenIndexSettings:
+    """Settings for the local token symbol/name index (intervals in seconds)
+
+    Every API worker pulls: WORKERS x resolutions x (pages - 1) upstream
+    requests per interval (page 1 is taken from the market snapshot, which
+    then requests page_size pairs), 5 x 4 x 4 = 80 every 600s by default.
+    """
+    enabled: bool = os.getenv('TOKEN_INDEX_ENABLED', 'true').lower() == 'true'
+    path: str = os.getenv('TOKEN_INDEX_PATH', 'token_index.json')
+    interval: float = float(os.getenv('TOKEN_INDEX_INTERVAL', '600'))
+    pages: int = int(os.getenv('TOKEN_INDEX_PAGES', '5'))
+    page_size: int = int(os.getenv('TOKEN_INDEX_PAGE_SIZE', '100'))
+    expire: float = float(os.getenv('TOKEN_INDEX_EXPIRE', '604800'))
+    fuzzy_threshold: float = float(os.getenv('TOKEN_INDEX_FUZZY_THRESHOLD', '0.5'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns token index configuration as dictionary"""
+        return {
+            'enabled': self.enabled,
+            'path': self.path,
+            'interval': self.interval,
+            'pages': self.pages,
+            'page_size': self.page_size,
+            'expire': self.expire,
+            'fuzzy_threshold': self.fuzzy_threshold
+        }
+
+@dataclass
+class ObservationSettings:
+    """Settings for compacting tool outputs before they are sent back to the LLM"""
+    compact: bool = os.getenv('OBSERVATION_COMPACT', 'true').lower() == 'true'
+    token_cap: int = int(os.getenv('OBSERVATION_TOKEN_CAP', '400'))
+    # Per-tool caps, e.g. "scan_tokens=600,search_token=200"
+    tool_caps: str = os.getenv('OBSERVATION_TOOL_CAPS', 'scan_token=250,scan_tokens=600')
+    store_size: int = int(os.getenv('OBSERVATION_STORE_SIZE', '512'))
+
+    def cap_for(self, tool_name: str) -> int:
+        """Token cap of one tool's observation"""
+        for item in self.tool_caps.split(','):
+            name, _, cap = item.partition('=')
+            if name.strip() == tool_name and cap.strip():
+                return int(cap)
+        return self.token_cap
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns observation configuration as dictionary"""
+        return {
+            'compact': self.compact,
+            'token_cap': self.token_cap,
+            'tool_caps': self.tool_caps,
+            'store_size': self.store_size
+        }
+
+@dataclass
+class RecordingSettings:
+    """Settings for recording and replaying LLM and tool calls"""
+    mode: str = os.getenv('AGENT_RECORD_MODE', '').lower()  # '', 'record' or 'replay'
+    path: str = os.getenv('AGENT_RECORD_PATH', 'recordings/agent.jsonl.gz')
+    replay_latency: float = float(os.getenv('AGENT_REPLAY_LATENCY', '0'))
+
+    def get_config(self) -> Dict[str, str]:
+        """Returns recording configuration as dictionary"""
+        return {
+            'mode': self.mode,
+            'path': self.path,
+            'replay_latency': self.replay_latency
+        }
+
 class Settings:
     """Main application settings"""
     def __init__(self):
         self.raiden = RaidenSettings()
         self.agent = AgentSettings()
+        self.runtime = RuntimeSettings()
+        self.storage = StorageSettings()
+        self.http = HttpSettings()
+        self.cache = CacheSettings()
+        self.queue = QueueSettings()
+        self.webhook = WebhookSettings()
+        self.context = ContextSettings()
+        self.router = RouterSettings()
+        self.log = LogSettings()
+        self.recording = RecordingSettings()
+        self.market = MarketSnapshotSettings()
+        self.token_index = TokenIndexSettings()
+        self.observation = ObservationSettings()
 
 # Create a singleton settings instance
 settings = Settings()
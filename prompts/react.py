@@ -35,6 +35,18 @@ Action Input: the input to the tool, in a JSON format representing the kwargs (e
 
 MUST ALWAYS start with a Thought.
 
+If you need several tool calls that do not depend on each other (for example the same tool for different tokens), you SHOULD request them together after a single Thought, one `Action`/`Action Input` pair per call:
+
+```
+Thought: I need to look up these tokens.
+Action: search_token
+Action Input: {{"query": "HIPPO"}}
+Action: search_token
+Action Input: {{"query": "LOFI"}}
+```
+
+The calls run at the same time and you will receive a single Observation with one numbered result per action, in the same order. Do NOT batch a call that needs the output of another one; wait for its Observation instead.
+
 Please use a valid JSON format for the Action Input. Do NOT do this {{'input': 'hello world', 'num_beams': 5}}.
 
 If this format is used, the user will respond in the following format:
@@ -60,10 +72,19 @@ Answer: Sorry, I cannot answer your query.
 ## Additional Rules
 - You MUST obey the function signature of each tool. Do NOT pass in no arguments if the function expects arguments.
 
-## Here is User informations:
-jwt_token: {jwt_token}
-
 ## Current Conversation
 Below is the current conversation consisting of interleaving human and assistant messages.
 
-"""
\ No newline at end of file
+"""
+
+# Per-request part of the system prompt, sent after the static header above so
+# the header stays a byte-identical (cacheable) prefix. Secrets such as the
+# user's jwt are never rendered here; tools receive them from the request context.
+REACT_CHAT_USER_HEADER = """## Here is User informations:
+{user_info}
+"""
+# System prompt of the direct (no tools) path used for greetings and small talk
+DIRECT_REPLY_SYSTEM_PROMPT = """You are Personal-AGENT, a friendly assistant for crypto and meme coin trading on Sui.
+Reply briefly and warmly to the user's message. You can look up token prices, token addresses,
+trending pairs and token trading metrics; invite the user to ask for them.
+Do not make up any market data."""
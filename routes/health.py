@@ -1,16 +1,34 @@
+import os
+
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+from commons.stats import collect_stats
+from utils.concurrency import agent_runs
+
 router = APIRouter()
 
 class HealthResponse(BaseModel):
     """Response model for health check
-    
+
     Attributes:
         status (str): Status of the health check
+        pid (int): Process ID of the worker that answered
+        agent_runs_in_flight (int): Agent runs currently executing on this worker
     """
     status: str
+    pid: int
+    agent_runs_in_flight: int
 
 @router.get("", response_model=HealthResponse)
 async def health():
-    return HealthResponse(status="ok")
+    return HealthResponse(
+        status="ok",
+        pid=os.getpid(),
+        agent_runs_in_flight=agent_runs.in_flight,
+    )
+
+@router.get("/stats")
+async def health_stats():
+    """Runtime statistics of this worker (connection pools, caches, queues...)"""
+    return {"pid": os.getpid(), **collect_stats()}
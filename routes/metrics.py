@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from commons.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("")
+async def metrics():
+    """Prometheus metrics of every worker (request, LLM, tool and queue latency)"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
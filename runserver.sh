@@ -1 +1,4 @@
-uvicorn app:app --host 0.0.0.0 --port 4012 --workers 5
\ No newline at end of file
+# Workers write their metrics here; /v1/metrics aggregates them
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/personal-agents-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+uvicorn app:app --host 0.0.0.0 --port 4012 --workers 5
@@ -1,19 +1,26 @@
+import logging
 from telethon import TelegramClient, events
 import os
 from dotenv import load_dotenv
 import nest_asyncio
 from utils.chat_session import (
-    load_chat_history,
-    save_chat_history,
     convert_dict_to_chat_messages,
     escape_markdown_v2,
 )
-from agents import react_chat, llm
+from utils.conversation_store import get_conversation_store, open_conversation_store
+from utils.context_window import context_window
+from utils.token_index import token_index
+from config.settings import settings
+from agents import arouted_chat, llm
 from datetime import datetime
 from auth.jwt_generator import get_jwt
+from commons.http_client import http_client
+from commons.logger import setup_logging, shutdown_logging, start_trace
 
 nest_asyncio.apply()
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 API_ID = os.getenv("TELEGRAM_API_ID")
 API_HASH = os.getenv("TELEGRAM_API_HASH")
@@ -26,6 +33,10 @@ client = TelegramClient('bot', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
 
 @client.on(events.NewMessage(pattern='(?!/).+'))
 async def handle_message(event):
+    with start_trace("telegram", chat_id=str(event.chat_id)):
+        await _handle_message(event)
+
+async def _handle_message(event):
     try:
         if not event.is_private:
             return
@@ -35,24 +46,24 @@ async def handle_message(event):
         
         user_message = event.message.text
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        chat_history = load_chat_history()
-
-        if chat_id not in chat_history:
-            chat_history[chat_id] = []
+        store = get_conversation_store()
+        user_entry = {"role": "user", "content": user_message, "time": current_time}
 
-        chat_history[chat_id].append(
-            {"role": "user", "content": user_message, "time": current_time}
+        recent_messages = await store.aget_last_messages(
+            chat_id, settings.storage.history_max_messages - 1
         )
-        last_five_messages = chat_history[chat_id][-10:]
+        recent_messages.append(user_entry)
 
-        chat_history_message = convert_dict_to_chat_messages(last_five_messages)
+        window = await context_window.abuild(
+            chat_id, convert_dict_to_chat_messages(recent_messages), llm
+        )
+        chat_history_message = window.messages
         
         jwt_token=get_jwt(chat_id, user, user)
 
         try:
-            bot_response = react_chat(
+            bot_response = await arouted_chat(
                 query=user_message,
-                llm=llm,
                 chat_history=chat_history_message,
                 jwt_token=jwt_token,
             )
@@ -64,34 +75,36 @@ async def handle_message(event):
         except Exception as e:
             bot_response = f"An unexpected error occurred: {str(e)}"
 
-        chat_history[chat_id].append(
-            {"role": "assistant", "content": bot_response, "time": current_time}
-        )
-
-        if len(chat_history[chat_id]) > 20:
-            chat_history[chat_id] = chat_history[chat_id][-20:]
-
-        save_chat_history(chat_history)
+        await store.aappend_messages(chat_id, [
+            user_entry,
+            {"role": "assistant", "content": bot_response, "time": current_time},
+        ])
 
         try:
             await event.reply(bot_response)
         except Exception as e:
-            print(f"Error sending message: {e}")
+            logger.warning("Error sending message: %s", e)
             await event.reply(bot_response)
 
     except Exception as e:
-        print(f"Error in handle_message: {e}")
+        logger.exception("Error in handle_message: %s", e)
         await event.reply("Sorry, an error occurred while processing your message.")
 
 def main():
     try:
-        print("Bot has started...")
+        client.loop.run_until_complete(open_conversation_store())
+        if settings.token_index.enabled:
+            client.loop.run_until_complete(token_index.aload())
+        logger.info("Bot has started...")
         client.run_until_disconnected()
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Error: %s", e)
+    finally:
+        client.loop.run_until_complete(http_client.close())
+        shutdown_logging()
 
 if __name__ == "__main__":
     try:
         main()
     except Exception as e:
-        print(f"Bot startup error: {e}")
+        logger.exception("Bot startup error: %s", e)
@@ -1,5 +1,6 @@
 from tools.search_tokens import search_token
 from tools.get_trending_pairs import get_trending_pairs 
-from tools.scan_token import scan_token
+from tools.scan_token import scan_token, scan_tokens
+from tools.expand_observation import expand_observation
 
-__all__ = ["search_token", "get_trending_pairs", "scan_token"]
+__all__ = ["search_token", "get_trending_pairs", "scan_token", "scan_tokens", "expand_observation"]
@@ -0,0 +1,17 @@
+from utils.observation import observation_compactor
+
+
+async def expand_observation(handle: str) -> str:
+    """
+    Return the full output of a tool call whose Observation was truncated
+
+    Args:
+        handle (str): Handle from the truncation notice (e.g. 'obs-1a2b3c4d5e')
+
+    Returns:
+        str: Full compacted output, or an error message if the handle is unknown
+    """
+    text = observation_compactor.expand(handle)
+    if text is None:
+        return f"Error: no stored output for handle {handle!r}; call the original tool again"
+    return text
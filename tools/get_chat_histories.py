@@ -4,15 +4,113 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-import requests
 from config import settings
+from commons.http_client import http_client, HttpClientError
+from commons.stats import register_stats
+from utils.conversation_store import get_conversation_store
 
 import json
+import logging
 import os
-from typing import List
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
 from llama_index.core.llms import ChatMessage, MessageRole
 
-def fetch_thread_messages(thread_id: str) -> dict:
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ThreadWindow:
+    messages: List[Dict[str, Any]]
+    version: int
+    fetched_at: float
+    stale: bool = False
+
+
+class ThreadHistoryCache:
+    """
+    Last `window` messages of each thread, with the thread version they were
+    fetched at.
+
+    Each worker keeps its own windows, so an entry is only served while it is
+    younger than `ttl`, not marked stale here, and its version still matches
+    the thread version in the shared conversation store. That version is
+    bumped by save_turn and mark_thread_stale in whichever worker answered,
+    so turns answered by another worker are never missing. Otherwise the
+    thread is fetched again.
+    """
+
+    def __init__(self, window: int, ttl: float, max_threads: int = 1024):
+        self.window = window
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, _ThreadWindow]" = OrderedDict()
+        self._stats = {"hits": 0, "fetches": 0, "messages_fetched": 0}
+
+    def get(self, thread_id: str) -> Optional[_ThreadWindow]:
+        entry = self._threads.get(thread_id)
+        if entry is not None:
+            self._threads.move_to_end(thread_id)
+        return entry
+
+    def is_fresh(self, entry: _ThreadWindow, version: int) -> bool:
+        return (
+            not entry.stale
+            and entry.version == version
+            and time.monotonic() - entry.fetched_at < self.ttl
+        )
+
+    def mark_stale(self, thread_id: str) -> None:
+        entry = self._threads.get(thread_id)
+        if entry is not None:
+            entry.stale = True
+
+    def invalidate(self, thread_id: str) -> None:
+        self._threads.pop(thread_id, None)
+
+    def store(self, thread_id: str, messages: List[Dict[str, Any]], version: int) -> None:
+        self._threads[thread_id] = _ThreadWindow(messages[-self.window:], version, time.monotonic())
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def record(self, kind: str, fetched: int = 0) -> None:
+        self._stats[kind] += 1
+        self._stats["messages_fetched"] += fetched
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "threads": len(self._threads), "window": self.window, "ttl": self.ttl}
+
+
+thread_history = ThreadHistoryCache(
+    window=settings.storage.thread_history_window,
+    ttl=settings.storage.thread_history_ttl,
+)
+register_stats("thread_history", thread_history.stats)
+
+
+async def mark_thread_stale(thread_id: str) -> None:
+    """Make every worker fetch the thread again before reusing its window."""
+    thread_history.mark_stale(thread_id)
+    try:
+        await get_conversation_store().atouch_thread(thread_id)
+    except Exception as e:
+        logger.warning("Could not mark thread %s stale: %s", thread_id, e)
+
+
+async def _request_thread_messages(thread_id: str) -> List[Dict[str, Any]]:
+    url = f"{settings.agent.api_url}/api/v1/backend/thread/{thread_id}/messages"
+    headers = {"X-API-KEY": settings.agent.api_key}
+    response = await http_client.get(url, headers=headers)
+    if response.status_code != 200:
+        raise Exception(f"Error fetching thread messages: {response.status_code} - {response.text}")
+    data = response.json() or []
+    return sorted(data, key=lambda x: x['createdAt'])
+
+
+async def fetch_thread_messages(thread_id: str) -> list:
     """
     Get chat histories for a specific thread
     
@@ -20,42 +118,46 @@ def fetch_thread_messages(thread_id: str) -> dict:
         thread_id (str): Thread ID
         
     Returns:
-        dict: Chat histories sorted by creation time
-
-    The API returns a paginated list of chat messages with the following structure:
-    {
-        "totalDocs": int,      # Total number of messages
-        "totalPages": int,     # Total number of pages
-        "limit": int,          # Number of messages per page
-        "page": int,           # Current page number
-        "docs": [              # Array of message objects
-            {
-                "id": str,         # Message ID
-                "agentId": str,    # ID of the agent
-                "threadId": str,   # Thread ID
-                "question": str,   # User's question
-                "answer": str,     # Agent's response
-                "createdAt": int,  # Message creation timestamp (seconds)
-                "updatedAt": int   # Message update timestamp (seconds)
-            }
-        ]
-    }
+        list: The last messages of the thread (at most the cache window) sorted
+            by creation time, without a trailing user message
+
+    The API returns the thread's chat messages:
+    [
+        {
+            "id": str,         # Message ID
+            "threadId": str,   # Thread ID
+            "role": str,       # "user" or "assistant"
+            "content": str,    # Message text
+            "createdAt": int,  # Message creation timestamp (seconds)
+        }
+    ]
+
+    Results go through `thread_history`: repeated calls inside the TTL do not
+    hit the backend unless the thread changed since, in any worker (see
+    ThreadHistoryCache). A failed fetch leaves the thread stale, so the next
+    call asks the backend again.
     """
     try:
-        url = f"{settings.agent.api_url}/api/v1/backend/thread/{thread_id}/messages"
-        headers = {"X-API-KEY": settings.agent.api_key}
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        
-        if data:
-            data = sorted(data, key=lambda x: x['createdAt'])
-            if data[-1]['role'] == 'user':
-                data.pop()
+        # Read before fetching: a turn saved meanwhile makes the window stale next time
+        version = await get_conversation_store().athread_version(thread_id)
+        entry = thread_history.get(thread_id)
+        if entry is not None and thread_history.is_fresh(entry, version):
+            thread_history.record("hits")
+        else:
+            data = await _request_thread_messages(thread_id)
+            thread_history.record("fetches", len(data))
+            thread_history.store(thread_id, data, version)
+
+        data = list(thread_history.get(thread_id).messages)
+        if data and data[-1]['role'] == 'user':
+            data.pop()
             
         return data
-    except requests.exceptions.RequestException as e:
+    except HttpClientError as e:
+        thread_history.mark_stale(thread_id)
         raise Exception(f"API connection error: {str(e)}")
     except Exception as e:
+        thread_history.mark_stale(thread_id)
         raise Exception(f"Error getting chat histories: {str(e)}")
     
     
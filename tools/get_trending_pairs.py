@@ -4,10 +4,64 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-import requests
 from config import settings
+from commons.http_client import http_client, HttpClientError
+from utils.cache import TTLCache, cached
+from utils.market_snapshot import market_snapshot
 
-def get_trending_pairs(jwt_token: str = "", resolution: str = "5m", limit: int = 5) -> dict:
+
+trending_cache = TTLCache(
+    "trending_pairs",
+    ttl=settings.cache.trending_ttl,
+    maxsize=settings.cache.max_entries,
+    stale_while_revalidate=settings.cache.stale_while_revalidate,
+)
+
+
+def format_trending_pairs(data: list, limit: int) -> dict:
+    """Format trending pair payloads as returned by get_trending_pairs, most liquid first"""
+    sorted_data = sorted(data, key=lambda x: float(x.get('liquidityUsd', 0)), reverse=True)
+    
+    pairs = []
+    
+    for pair in sorted_data[:limit]:
+        price_usd = float(pair.get('tokenBase', {}).get('priceUsd', 0))
+        liquidity_usd = float(pair.get('liquidityUsd', 0))
+        volume_usd = float(pair.get('volumeUsd', 0))
+        
+        token_info = (
+            f"## {pair.get('tokenBase', {}).get('symbol')} | ${'{:,.4f}'.format(price_usd)}\n"
+            f"`{pair.get('tokenBase', {}).get('address')}`\n\n"
+            f"📈 Changes: 5m: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('5m', 0))}% | "
+            f"1h: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('1h', 0))}% | "
+            f"24h: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('24h', 0))}%\n"
+            f"💰 Liquidity: ${'{:,.2f}'.format(liquidity_usd)} | Volume: ${'{:,.2f}'.format(volume_usd)}\n"
+        )
+        
+        pairs.append({
+            'markdown': token_info,
+            'tokenBase': {
+                'address': pair.get('tokenBase', {}).get('address'),
+                'name': pair.get('tokenBase', {}).get('name'),
+                'symbol': pair.get('tokenBase', {}).get('symbol'),
+                'priceUsd': price_usd
+            },
+            'liquidityUsd': liquidity_usd,
+            'volumeUsd': volume_usd,
+            'priceChange': {
+                '5m': pair.get('stats', {}).get('percent', {}).get('5m', 0),
+                '1h': pair.get('stats', {}).get('percent', {}).get('1h', 0),
+                '6h': pair.get('stats', {}).get('percent', {}).get('6h', 0),
+                '24h': pair.get('stats', {}).get('percent', {}).get('24h', 0)
+            }
+        })
+    
+    return {'pairs': pairs}
+
+
+# Trending lists are the same for every user, so jwt_token is not part of the key
+@cached(trending_cache, key=lambda jwt_token="", resolution="5m", limit=5: (resolution, limit))
+async def get_trending_pairs(jwt_token: str = "", resolution: str = "5m", limit: int = 5) -> dict:
     """
     Get a list of trending trading pairs
     
@@ -54,52 +108,17 @@ def get_trending_pairs(jwt_token: str = "", resolution: str = "5m", limit: int =
             "accept": "application/json"
         }
         
-        response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code == 200:
+        # Served from the background snapshot when it is fresh
+        data = market_snapshot.trending(resolution, limit)
+        if data is None:
+            response = await http_client.get(url, headers=headers, params=params)
+            if response.status_code != 200:
+                raise Exception(f"Error fetching trending pairs: {response.status_code} - {response.text}")
             data = response.json()
+
+        return format_trending_pairs(data, limit)
             
-            sorted_data = sorted(data, key=lambda x: float(x.get('liquidityUsd', 0)), reverse=True)
-            
-            pairs = []
-            
-            for pair in sorted_data[:limit]:
-                price_usd = float(pair.get('tokenBase', {}).get('priceUsd', 0))
-                liquidity_usd = float(pair.get('liquidityUsd', 0))
-                volume_usd = float(pair.get('volumeUsd', 0))
-                
-                token_info = (
-                    f"## {pair.get('tokenBase', {}).get('symbol')} | ${'{:,.4f}'.format(price_usd)}\n"
-                    f"`{pair.get('tokenBase', {}).get('address')}`\n\n"
-                    f"📈 Changes: 5m: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('5m', 0))}% | "
-                    f"1h: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('1h', 0))}% | "
-                    f"24h: {'{:.2f}'.format(pair.get('stats', {}).get('percent', {}).get('24h', 0))}%\n"
-                    f"💰 Liquidity: ${'{:,.2f}'.format(liquidity_usd)} | Volume: ${'{:,.2f}'.format(volume_usd)}\n"
-                )
-                
-                pairs.append({
-                    'markdown': token_info,
-                    'tokenBase': {
-                        'address': pair.get('tokenBase', {}).get('address'),
-                        'name': pair.get('tokenBase', {}).get('name'),
-                        'symbol': pair.get('tokenBase', {}).get('symbol'),
-                        'priceUsd': price_usd
-                    },
-                    'liquidityUsd': liquidity_usd,
-                    'volumeUsd': volume_usd,
-                    'priceChange': {
-                        '5m': pair.get('stats', {}).get('percent', {}).get('5m', 0),
-                        '1h': pair.get('stats', {}).get('percent', {}).get('1h', 0),
-                        '6h': pair.get('stats', {}).get('percent', {}).get('6h', 0),
-                        '24h': pair.get('stats', {}).get('percent', {}).get('24h', 0)
-                    }
-                })
-            
-            return {'pairs': pairs}
-        else:
-            raise Exception(f"Error fetching trending pairs: {response.status_code} - {response.text}")
-            
-    except requests.exceptions.RequestException as e:
+    except HttpClientError as e:
         raise Exception(f"API connection error: {str(e)}")
     except Exception as e:
         raise Exception(f"Unknown error: {str(e)}")
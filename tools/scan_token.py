@@ -4,92 +4,202 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-import requests
-from typing import Dict, Any, Optional, Tuple, Union
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Union
 from config import settings
+from commons.http_client import http_client, HttpClientError, DEFAULT_RETRY_STATUSES
+from utils.cache import TTLCache, cached
+from utils.market_snapshot import market_snapshot
 
-def scan_token(token_address: str) -> Optional[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+
+top_pair_cache = TTLCache(
+    "top_pair",
+    ttl=settings.cache.top_pair_ttl,
+    maxsize=settings.cache.max_entries,
+    stale_while_revalidate=settings.cache.stale_while_revalidate,
+)
+
+async def fetch_top_pair(token_address: str) -> Optional[Dict[str, Any]]:
     """
-    Fetch detailed information about the top trading pair for a specific token
+    Raw top trading pair of a token, from the market snapshot when the token
+    is hot and the snapshot fresh, otherwise fetched live
     
     Args:
         token_address (str): Token address
         
     Returns:
-        str: Formatted pair information or None if error occurs
+        dict: Top pair payload from RaidenX or None if error occurs
+    """
+    data = market_snapshot.top_pair(token_address)
+    if data is not None:
+        return data
+    return await _fetch_top_pair_live(token_address)
+
+
+@cached(top_pair_cache, key=lambda token_address: token_address)
+async def _fetch_top_pair_live(token_address: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the raw top trading pair of a token from RaidenX (cached per address)
+    
+    Args:
+        token_address (str): Token address
+        
+    Returns:
+        dict: Top pair payload from RaidenX or None if error occurs
     """
     try:
         url = f"{settings.raiden.api_common_url}/api/v1/sui/tokens/{token_address}/top-pair"
         
-        response = requests.get(url)
+        # 502 means an invalid address upstream, so it is not worth retrying
+        response = await http_client.get(
+            url, retry_statuses=DEFAULT_RETRY_STATUSES - {502}
+        )
         
         if response.status_code == 404:
-            print(f"Token not found: {token_address}")
+            logger.info("Token not found: %s", token_address)
             return None
         elif response.status_code == 502:
-            print(f"Invalid token address: {token_address}")
+            logger.info("Invalid token address: %s", token_address)
             return None
             
         response.raise_for_status()
         
         data = response.json()
         if not data:
-            print(f"No data returned for token {token_address}")
+            logger.info("No data returned for token %s", token_address)
             return None
+        return data
+        
+    except HttpClientError as e:
+        logger.warning("Error fetching top pair: %s", e)
+        return None
 
-        # Extract token info
-        base_token = data.get("tokenBase", {})
-        token_name = base_token.get("name", "")
-        token_symbol = base_token.get("symbol", "")
-        token_address = base_token.get("address", "")
+
+def format_top_pair(data: Dict[str, Any]) -> str:
+    """Format a top pair payload as the markdown report returned by scan_token"""
+    # Extract token info
+    base_token = data.get("tokenBase", {})
+    token_name = base_token.get("name", "")
+    token_symbol = base_token.get("symbol", "")
+    token_address = base_token.get("address", "")
+    
+    # Extract DEX info
+    dex = data.get("dex", {})
+    dex_name = dex.get("name", "")
+    
+    # Calculate age
+    created_at = data.get("createdAt", "")
+    # TODO: Add age calculation logic
+    age = "6d,10h,52m"  # Placeholder
+    
+    # Extract stats
+    stats = data.get("stats", {})
+    percent = stats.get("percent", {})
+    volume = stats.get("volume", {})
+    buy_txn = stats.get("buyTxn", {})
+    sell_txn = stats.get("sellTxn", {})
+    
+    # Format the output
+    output = f"**{token_name} ({token_symbol})**\n"
+    output += f"`{token_address}`\n\n"
+    
+    output += f"**Platform:** {dex_name} | **Age:** {age}\n"
+    
+    # Convert string values to float for formatting
+    mcap = float(data.get('marketCapUsd', '0'))
+    liq = float(data.get('liquidityUsd', '0'))
+    price = float(base_token.get('priceUsd', '0'))
+    
+    output += f"**MCap:** ${mcap/1000:.2f}K | "
+    output += f"**Liq:** ${liq:.2f}K\n"
+    output += f"**Current Price:** ${price:.8f}\n\n"
+    
+    # Format time-based stats
+    output += "**Time-based Statistics:**\n"
+    periods = ["5m", "1h", "6h", "24h"]
+    for period in periods:
+        price_change = float(percent.get(period, 0))
+        vol = float(volume.get(period, 0))
+        buys = int(buy_txn.get(period, 0))
+        sells = int(sell_txn.get(period, 0))
         
-        # Extract DEX info
-        dex = data.get("dex", {})
-        dex_name = dex.get("name", "")
+        output += f"**{period.upper()}:** Price {price_change:>6.2f}% | Vol ${vol/1000:.2f}K | Txns {buys}/{sells}\n"
+    
+    return output
+
+
+async def scan_token(token_address: str) -> Optional[str]:
+    """
+    Fetch detailed information about the top trading pair for a specific token
+    
+    Args:
+        token_address (str): Token address
         
-        # Calculate age
-        created_at = data.get("createdAt", "")
-        # TODO: Add age calculation logic
-        age = "6d,10h,52m"  # Placeholder
+    Returns:
+        str: Formatted pair information or None if error occurs
+    """
+    data = await fetch_top_pair(token_address)
+    if data is None:
+        return None
+    return format_top_pair(data)
+
+
+async def scan_tokens(token_addresses: List[str]) -> str:
+    """
+    Scan several tokens at once and return one compact comparison table
+    
+    Addresses are de-duplicated and fetched concurrently (at most
+    settings.raiden.scan_concurrency at a time), sharing the per-address
+    top pair cache with scan_token.
+    
+    Args:
+        token_addresses (List[str]): Token contract addresses
         
-        # Extract stats
+    Returns:
+        str: Markdown table with one row per token
+    """
+    addresses = list(dict.fromkeys(a.strip() for a in token_addresses if a and a.strip()))
+    if not addresses:
+        return "No token addresses provided"
+
+    semaphore = asyncio.Semaphore(settings.raiden.scan_concurrency)
+
+    async def fetch(address: str):
+        async with semaphore:
+            return await fetch_top_pair(address)
+
+    results = await asyncio.gather(*(fetch(address) for address in addresses))
+
+    rows = [
+        "| Token | Price | MCap | Liq | 5m | 1h | 24h | Vol 24h | Txns 24h | Address |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for address, data in zip(addresses, results):
+        if data is None:
+            rows.append(f"| ? | not found | | | | | | | | `{address}` |")
+            continue
+        base_token = data.get("tokenBase", {})
         stats = data.get("stats", {})
         percent = stats.get("percent", {})
         volume = stats.get("volume", {})
-        buy_txn = stats.get("buyTxn", {})
-        sell_txn = stats.get("sellTxn", {})
-        
-        # Format the output
-        output = f"**{token_name} ({token_symbol})**\n"
-        output += f"`{token_address}`\n\n"
-        
-        output += f"**Platform:** {dex_name} | **Age:** {age}\n"
-        
-        # Convert string values to float for formatting
-        mcap = float(data.get('marketCapUsd', '0'))
-        liq = float(data.get('liquidityUsd', '0'))
-        price = float(base_token.get('priceUsd', '0'))
-        
-        output += f"**MCap:** ${mcap/1000:.2f}K | "
-        output += f"**Liq:** ${liq:.2f}K\n"
-        output += f"**Current Price:** ${price:.8f}\n\n"
-        
-        # Format time-based stats
-        output += "**Time-based Statistics:**\n"
-        periods = ["5m", "1h", "6h", "24h"]
-        for period in periods:
-            price_change = float(percent.get(period, 0))
-            vol = float(volume.get(period, 0))
-            buys = int(buy_txn.get(period, 0))
-            sells = int(sell_txn.get(period, 0))
-            
-            output += f"**{period.upper()}:** Price {price_change:>6.2f}% | Vol ${vol/1000:.2f}K | Txns {buys}/{sells}\n"
-        
-        return output
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching top pair: {str(e)}")
-        return None
+        buys = int(stats.get("buyTxn", {}).get("24h", 0))
+        sells = int(stats.get("sellTxn", {}).get("24h", 0))
+        rows.append(
+            f"| {base_token.get('symbol', '')} "
+            f"| ${float(base_token.get('priceUsd', 0)):.8g} "
+            f"| ${float(data.get('marketCapUsd', 0))/1000:,.2f}K "
+            f"| ${float(data.get('liquidityUsd', 0))/1000:,.2f}K "
+            f"| {float(percent.get('5m', 0)):.2f}% "
+            f"| {float(percent.get('1h', 0)):.2f}% "
+            f"| {float(percent.get('24h', 0)):.2f}% "
+            f"| ${float(volume.get('24h', 0))/1000:,.2f}K "
+            f"| {buys}/{sells} "
+            f"| `{base_token.get('address') or address}` |"
+        )
+    return "\n".join(rows)
 
 # # Example usage:
 # if __name__ == "__main__":
@@ -1,13 +1,86 @@
 import sys
+import time
 from pathlib import Path
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-import requests
 from config import settings
+from commons.http_client import http_client
+from utils.cache import TTLCache, cached
+from utils.market_snapshot import market_snapshot
+from utils.token_index import token_index
 
-def search_token(query: str, jwt_token: str) -> dict:
+
+search_cache = TTLCache(
+    "search_token",
+    ttl=settings.cache.search_ttl,
+    maxsize=settings.cache.max_entries,
+    stale_while_revalidate=settings.cache.stale_while_revalidate,
+)
+
+# Candidates below this liquidity are left out of fuzzy results
+MIN_CANDIDATE_LIQUIDITY = 10000
+
+
+def _token_match(token_info: dict, liquidity_usd: float) -> dict:
+    return {
+        'address': token_info.get('address'),
+        'name': token_info.get('name'),
+        'symbol': token_info.get('symbol'),
+        'priceUsd': token_info.get('priceUsd'),
+        'liquidityUsd': liquidity_usd
+    }
+
+
+def _token_candidate(token_info: dict, liquidity_usd: float) -> dict:
+    return {
+        'token_address': token_info.get('address'),
+        'token_name': token_info.get('name'),
+        'token_symbol': token_info.get('symbol'),
+        'token_priceUsd': token_info.get('priceUsd'),
+        'token_liquidityUsd': liquidity_usd
+    }
+
+
+def _fresh_quote(token: dict) -> tuple:
+    """
+    Price and liquidity of an indexed token, from the market snapshot or from
+    the index if pulled within the search cache TTL; (None, None) otherwise,
+    since the index keeps tokens for days after they were last seen
+    """
+    pair = market_snapshot.top_pair(token['address'])
+    if pair is not None:
+        return (pair.get('tokenBase') or {}).get('priceUsd'), float(pair.get('liquidityUsd') or 0)
+    if time.time() - token['seen'] <= settings.cache.search_ttl:
+        return token['priceUsd'], token['liquidityUsd']
+    return None, None
+
+
+def _index_answer(token: dict, build) -> dict:
+    """Answer for an indexed token, leaving out price and liquidity when not fresh"""
+    price, liquidity = _fresh_quote(token)
+    answer = build({**token, 'priceUsd': price}, liquidity)
+    if price is None:
+        return {key: value for key, value in answer.items() if value is not None}
+    return answer
+
+
+def _search_local(query: str):
+    """Answer from the local token index, or None to ask the remote search"""
+    if not settings.token_index.enabled:
+        return None
+    kind, tokens = token_index.resolve(query, min_liquidity=MIN_CANDIDATE_LIQUIDITY)
+    if kind == "exact":
+        return _index_answer(tokens[0], _token_match)
+    if kind == "fuzzy":
+        return {'tokens': [_index_answer(t, _token_candidate) for t in tokens]}
+    return None
+
+
+# Symbol -> address resolution does not depend on the user
+@cached(search_cache, key=lambda query, jwt_token="": query.strip().upper())
+async def search_token(query: str, jwt_token: str) -> dict:
     """
     Search for tokens based on keywords
 
@@ -20,13 +93,18 @@ def search_token(query: str, jwt_token: str) -> dict:
                 - address (str): Token contract address
                 - name (str): Token name
                 - symbol (str): Token symbol
-                - priceUsd (float): Current token price in USD
+                - priceUsd (float): Current token price in USD, left out when
+                  answered from the token index without a fresh price
                 
     Raises:
-        RequestException: If API request fails
+        HttpClientError: If API request fails
         Exception: If search operation fails with status code and error message
     """
     
+    local = _search_local(query)
+    if local is not None:
+        return local
+
     url = f"{settings.raiden.api_common_url}/api/v1/search"
     headers = {
         "accept": "application/json"
@@ -37,34 +115,25 @@ def search_token(query: str, jwt_token: str) -> dict:
         "page": 1,
         "limit": 10
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = await http_client.get(url, headers=headers, params=params)
     
     if response.status_code == 200:
         data = response.json()
         results = []
         docs = sorted(data.get('docs', []), key=lambda x: float(x.get('liquidityUsd', 0)), reverse=True)
+        # Remote hits are kept so the next lookup of these tokens stays local
+        if settings.token_index.enabled:
+            token_index.ingest(docs)
         
         for doc in docs:
             liquidityUsd = float(doc.get('liquidityUsd', 0))
             token_info = doc.get('tokenBase', {})
             
-            if token_info.get('symbol').upper() == query.upper():
-                return {
-                    'address': token_info.get('address'),
-                    'name': token_info.get('name'),
-                    'symbol': token_info.get('symbol'),
-                    'priceUsd': token_info.get('priceUsd'),
-                    'liquidityUsd': liquidityUsd
-                }
+            if (token_info.get('symbol') or '').upper() == query.strip().upper():
+                return _token_match(token_info, liquidityUsd)
                 
-            if liquidityUsd > 10000:
-                results.append({
-                    'token_address': token_info.get('address'),
-                    'token_name': token_info.get('name'),
-                    'token_symbol': token_info.get('symbol'),
-                    'token_priceUsd': token_info.get('priceUsd'),
-                    'token_liquidityUsd': liquidityUsd
-                })
+            if liquidityUsd > MIN_CANDIDATE_LIQUIDITY:
+                results.append(_token_candidate(token_info, liquidityUsd))
                 
         if not results:
             return f'No tokens found for {query}'
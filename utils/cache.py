@@ -0,0 +1,179 @@
+"""In-process TTL cache with request coalescing for async tool calls."""
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from commons.stats import register_stats
+
+_caches: List["TTLCache"] = []
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after `ttl` seconds.
+
+    Concurrent misses for the same key share one load (single-flight). With
+    `stale_while_revalidate`, an expired entry younger than `ttl + max_stale`
+    is returned immediately while one background task refreshes it.
+
+    Results equal to None are not cached, so failed lookups are retried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        maxsize: int = 1024,
+        stale_while_revalidate: bool = False,
+        max_stale: Optional[float] = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_while_revalidate = stale_while_revalidate
+        self.max_stale = ttl * 4 if max_stale is None else max_stale
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        # key -> background refresh task; also keeps the tasks referenced
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+        _caches.append(self)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if value is None:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value without loading or touching counters."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._store(key, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _run_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        self._store(key, value)
+        return value
+
+    def _load_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if not task.cancelled():
+            # Waiters re-raise it; make sure an unobserved exception is not logged
+            task.exception()
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # The load runs in its own task that every caller (the first one included)
+        # only awaits through a shield: a caller cancelled by a step deadline or a
+        # client disconnect stops waiting, but the load and the other waiters,
+        # possibly from other requests, carry on.
+        loop = asyncio.get_running_loop()
+        task = self._pending.get(key)
+        if task is not None and task.get_loop() is loop:
+            self._stats["coalesced"] += 1
+        else:
+            task = loop.create_task(self._run_load(key, loader))
+            self._pending[key] = task
+            task.add_done_callback(functools.partial(self._load_done, key))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._load(key, loader)
+        except Exception:
+            pass
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss.
+
+        Args:
+            key (Hashable): Cache key
+            loader (Callable): Zero-argument coroutine function producing the value
+
+        Returns:
+            Any: Cached or freshly loaded value
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return value
+            if self.stale_while_revalidate and now - expires_at < self.max_stale:
+                self._stats["stale"] += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.get_running_loop().create_task(
+                        self._refresh(key, loader)
+                    )
+                return value
+
+        self._stats["misses"] += 1
+        return await self._load(key, loader)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["stale"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hit_rate": round((self._stats["hits"] + self._stats["stale"]) / lookups, 4)
+            if lookups else 0.0,
+        }
+
+
+def cached(cache: TTLCache, key: Callable[..., Hashable]):
+    """
+    Decorate an async function so its results go through `cache`.
+
+    Args:
+        cache (TTLCache): Cache instance to use
+        key (Callable): Builds the cache key from the call's arguments; arguments
+            that do not change the result (e.g. jwt_token) should be left out
+
+    The wrapper keeps the function signature, so tool schemas are unchanged.
+    """
+    def decorator(fn: Callable[..., Awaitable[Any]]):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(
+                key(*args, **kwargs), lambda: fn(*args, **kwargs)
+            )
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+register_stats("caches", lambda: {cache.name: cache.stats() for cache in _caches})
@@ -1,33 +1,7 @@
-import json
-import os
 from typing import List
 
 from llama_index.core.llms import ChatMessage, MessageRole
 
-HISTORY_FILE = "chat_history.json"
-
-
-def load_chat_history():
-    try:
-        if os.path.exists(HISTORY_FILE) and os.path.getsize(HISTORY_FILE) > 0:
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        else:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump({}, f)
-            return {}
-    except json.JSONDecodeError:
-        print(f"Lỗi khi đọc file {HISTORY_FILE}. Tạo file mới.")
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f)
-        return {}
-
-
-def save_chat_history(history):
-    """Lưu lịch sử chat vào file JSON"""
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
-
 
 def convert_dict_to_chat_messages(
     chat_dicts: List[dict[str, str]],
@@ -0,0 +1,71 @@
+"""Helpers for running agent work without blocking the event loop."""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+
+from commons.stats import register_stats
+from config import settings
+
+# Bounded pool for blocking code (SQLite, file I/O). Keeping it small caps
+# the number of threads a burst of agent runs can pin inside one worker.
+_sync_executor = ThreadPoolExecutor(
+    max_workers=settings.runtime.sync_tool_workers,
+    thread_name_prefix="agent-sync",
+)
+
+
+async def run_sync(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking callable on the bounded executor and await its result.
+
+    Context variables of the caller are propagated to the worker thread.
+
+    Args:
+        fn (Callable): Blocking function to run
+        *args, **kwargs: Arguments forwarded to fn
+
+    Returns:
+        Any: Whatever fn returns
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_sync_executor, call)
+
+
+class InFlightTracker:
+    """Counts concurrent operations running inside this worker process."""
+
+    def __init__(self):
+        self._in_flight = 0
+        self._total = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    @asynccontextmanager
+    async def track(self):
+        self._in_flight += 1
+        self._total += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+
+# Agent runs currently executing in this worker
+agent_runs = InFlightTracker()
+
+register_stats("agent_runs", lambda: {
+    "in_flight": agent_runs.in_flight,
+    "total": agent_runs.total,
+})
@@ -0,0 +1,229 @@
+"""Token-budgeted chat history with a rolling summary of older turns.
+
+The newest messages are kept verbatim while they fit the token budget; the
+ones before them are replaced by one summary message. The summary is cached
+per thread together with the last message it covers, so it is only extended
+(never recomputed from scratch) when the window moves. When the window has to
+move it is refilled to `refill_ratio` of the budget, leaving room for the next
+few turns without touching the summary again.
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.llms import ChatMessage, MessageRole
+
+from commons.stats import register_stats
+from config.settings import settings
+from LLM.llm_settings_manager import LLMSettingsManager
+
+logger = logging.getLogger(__name__)
+
+# Role/separator overhead added by chat templates, per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """Summarize the conversation below between a user and a crypto trading assistant.
+Keep token names, symbols, addresses, amounts and any decisions or open questions; drop greetings and tables.
+Answer in at most {max_words} words.
+
+{previous}Conversation:
+{conversation}
+
+Summary:"""
+
+
+@dataclass
+class _Summary:
+    boundary: str  # key of the last message covered by the summary
+    text: str
+
+
+@dataclass
+class ContextWindow:
+    """Result of fitting a history into the budget."""
+    messages: List[ChatMessage]
+    tokens_before: int
+    tokens_after: int
+    summarized_messages: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+def _message_key(message: ChatMessage) -> str:
+    raw = f"{message.role}:{message.content or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ContextWindowManager:
+    """Fits chat histories into a per-request token budget."""
+
+    def __init__(
+        self,
+        budget_tokens: int = 2000,
+        summary_max_tokens: int = 300,
+        refill_ratio: float = 0.6,
+        min_recent_messages: int = 2,
+        summarize: bool = True,
+        max_threads: int = 1024,
+    ):
+        self.budget_tokens = budget_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.refill_ratio = refill_ratio
+        self.min_recent_messages = min_recent_messages
+        self.summarize = summarize
+        self.max_threads = max_threads
+        self._llm_manager = LLMSettingsManager()
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._stats = {
+            "requests": 0,
+            "tokens_before": 0,
+            "tokens_after": 0,
+            "summaries_built": 0,
+            "summaries_extended": 0,
+            "summaries_reused": 0,
+            "summary_errors": 0,
+        }
+
+    def count_message(self, provider: str, message: ChatMessage) -> int:
+        return self._llm_manager.count_tokens(provider, message.content or "") + MESSAGE_OVERHEAD_TOKENS
+
+    def _fill_start(self, counts: List[int], target: int) -> int:
+        """Index of the oldest message kept when filling newest-first up to target."""
+        total = 0
+        start = len(counts)
+        for i in range(len(counts) - 1, -1, -1):
+            kept = len(counts) - i - 1
+            if total + counts[i] > target and kept >= self.min_recent_messages:
+                break
+            total += counts[i]
+            start = i
+        return start
+
+    async def _summarize(self, llm, previous: Optional[str], messages: List[ChatMessage]) -> str:
+        conversation = "\n".join(f"{m.role.value}: {m.content or ''}" for m in messages)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(self.summary_max_tokens * 0.75),
+            previous=f"Summary so far:\n{previous}\n\n" if previous else "",
+            conversation=conversation,
+        )
+        response = await llm.acomplete(prompt)
+        return response.text.strip()
+
+    async def abuild(
+        self,
+        thread_id: str,
+        messages: List[ChatMessage],
+        llm,
+    ) -> ContextWindow:
+        """
+        Fit a thread's history into the token budget.
+
+        Args:
+            thread_id (str): Key of the cached rolling summary
+            messages (List[ChatMessage]): History, oldest first
+            llm: LLM that will receive the prompt; selects the token counter
+                and writes the summaries
+
+        Returns:
+            ContextWindow: Messages to send plus token accounting
+        """
+        provider = self._llm_manager.get_provider(llm)
+        counts = [self.count_message(provider, m) for m in messages]
+        tokens_before = sum(counts)
+        keys = [_message_key(m) for m in messages]
+
+        summary = self._summaries.get(thread_id)
+        boundary = None
+        if summary is not None:
+            self._summaries.move_to_end(thread_id)
+            boundary = next(
+                (i for i in range(len(keys) - 1, -1, -1) if keys[i] == summary.boundary), None
+            )
+
+        # Once older turns are summarized, the summary takes part of the budget
+        recent_budget = self.budget_tokens - (self.summary_max_tokens if self.summarize else 0)
+        if tokens_before <= self.budget_tokens and boundary is None:
+            start = 0
+        elif boundary is not None and sum(counts[boundary + 1:]) <= recent_budget:
+            # The cached summary still lines up with a window that fits
+            start = boundary + 1
+        else:
+            start = self._fill_start(counts, int(recent_budget * self.refill_ratio))
+
+        kept = messages[start:]
+        summarized = 0
+        if start > 0 and self.summarize:
+            text = None
+            try:
+                if boundary is not None and boundary == start - 1:
+                    text = summary.text
+                    self._stats["summaries_reused"] += 1
+                elif boundary is not None and boundary < start - 1:
+                    text = await self._summarize(llm, summary.text, messages[boundary + 1:start])
+                    self._stats["summaries_extended"] += 1
+                else:
+                    # No summary yet, or its boundary scrolled out of the
+                    # fetched history: fold everything older into it
+                    text = await self._summarize(
+                        llm, summary.text if summary else None, messages[:start]
+                    )
+                    self._stats["summaries_built"] += 1
+            except Exception as e:
+                self._stats["summary_errors"] += 1
+                logger.warning("Could not summarize history of %s: %s", thread_id, e)
+
+            if text:
+                self._summaries[thread_id] = _Summary(boundary=keys[start - 1], text=text)
+                self._summaries.move_to_end(thread_id)
+                while len(self._summaries) > self.max_threads:
+                    self._summaries.popitem(last=False)
+                kept = [
+                    ChatMessage(
+                        role=MessageRole.SYSTEM,
+                        content=f"Summary of the earlier conversation: {text}",
+                    )
+                ] + kept
+                summarized = start
+
+        tokens_after = sum(self.count_message(provider, m) for m in kept)
+        self._stats["requests"] += 1
+        self._stats["tokens_before"] += tokens_before
+        self._stats["tokens_after"] += tokens_after
+        result = ContextWindow(kept, tokens_before, tokens_after, summarized)
+        logger.debug(
+            "Context window built",
+            extra={
+                "thread_id": thread_id,
+                "messages_before": len(messages),
+                "messages_after": len(kept),
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+            },
+        )
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self._stats["tokens_before"] - self._stats["tokens_after"]
+        return {
+            **self._stats,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self._stats["tokens_before"], 4)
+            if self._stats["tokens_before"] else 0.0,
+            "budget_tokens": self.budget_tokens,
+            "threads": len(self._summaries),
+        }
+
+
+context_window = ContextWindowManager(
+    budget_tokens=settings.context.budget_tokens,
+    summary_max_tokens=settings.context.summary_max_tokens,
+    refill_ratio=settings.context.refill_ratio,
+    min_recent_messages=settings.context.min_recent_messages,
+    summarize=settings.context.summarize,
+)
+register_stats("context_window", context_window.stats)
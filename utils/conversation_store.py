@@ -0,0 +1,362 @@
+"""Conversation history storage.
+
+Messages are stored per thread and trimmed by a retention policy on write, so
+reads and writes only touch the thread being served instead of the whole
+history of every user.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from config import settings
+from utils.concurrency import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionPolicy:
+    """How many messages are kept per thread"""
+    max_messages: int = 20
+
+
+class ConversationStore(ABC):
+    """Interface for per-thread conversation storage."""
+
+    def __init__(self, retention: Optional[RetentionPolicy] = None):
+        self.retention = retention or RetentionPolicy()
+
+    @abstractmethod
+    def append_messages(self, thread_id: str, messages: List[dict]) -> None:
+        """
+        Append messages to a thread and apply the retention policy.
+
+        Args:
+            thread_id (str): Thread ID
+            messages (List[dict]): Messages with at least "role" and "content"
+        """
+
+    @abstractmethod
+    def get_last_messages(self, thread_id: str, n: int) -> List[dict]:
+        """
+        Get the last n messages of a thread, oldest first.
+
+        Args:
+            thread_id (str): Thread ID
+            n (int): Maximum number of messages to return
+
+        Returns:
+            List[dict]: Messages in chronological order
+        """
+
+    @abstractmethod
+    def thread_ids(self) -> List[str]:
+        """Return the IDs of all stored threads."""
+
+    @abstractmethod
+    def touch_thread(self, thread_id: str) -> None:
+        """Bump the thread's version without writing messages."""
+
+    @abstractmethod
+    def thread_version(self, thread_id: str) -> int:
+        """
+        Version of a thread, bumped by every write and by touch_thread.
+
+        Caches of the thread kept by one worker compare it with the version
+        they were built at, to see writes made by the other workers.
+        """
+
+    def import_threads(self, threads: Dict[str, List[dict]]) -> int:
+        """
+        Append the messages of several threads, returning how many were written.
+
+        Durable stores override this to write everything in one transaction.
+        """
+        for thread_id, messages in threads.items():
+            self.append_messages(thread_id, messages)
+        return sum(len(messages) for messages in threads.values())
+
+    def append_message(self, thread_id: str, message: dict) -> None:
+        self.append_messages(thread_id, [message])
+
+    async def aappend_messages(self, thread_id: str, messages: List[dict]) -> None:
+        await run_sync(self.append_messages, thread_id, messages)
+
+    async def aget_last_messages(self, thread_id: str, n: int) -> List[dict]:
+        return await run_sync(self.get_last_messages, thread_id, n)
+
+    async def atouch_thread(self, thread_id: str) -> None:
+        await run_sync(self.touch_thread, thread_id)
+
+    async def athread_version(self, thread_id: str) -> int:
+        return await run_sync(self.thread_version, thread_id)
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store, intended for tests and single-process tools."""
+
+    def __init__(self, retention: Optional[RetentionPolicy] = None):
+        super().__init__(retention)
+        self._lock = threading.Lock()
+        self._threads: Dict[str, Deque[dict]] = defaultdict(
+            lambda: deque(maxlen=self.retention.max_messages)
+        )
+        self._versions: Dict[str, int] = defaultdict(int)
+
+    def append_messages(self, thread_id: str, messages: List[dict]) -> None:
+        with self._lock:
+            self._threads[thread_id].extend(dict(m) for m in messages)
+            self._versions[thread_id] += 1
+
+    def touch_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._versions[thread_id] += 1
+
+    def thread_version(self, thread_id: str) -> int:
+        with self._lock:
+            return self._versions.get(thread_id, 0)
+
+    def get_last_messages(self, thread_id: str, n: int) -> List[dict]:
+        with self._lock:
+            history = self._threads.get(thread_id)
+            if not history or n <= 0:
+                return []
+            return [dict(m) for m in list(history)[-n:]]
+
+    def thread_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._threads)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    SQLite store in WAL mode, safe to share between uvicorn workers.
+
+    Each OS thread gets its own connection; writers from different processes
+    are serialised by SQLite and wait up to `busy_timeout` for the lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention: Optional[RetentionPolicy] = None,
+        busy_timeout: float = 5.0,
+    ):
+        super().__init__(retention)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, id)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_versions (
+                thread_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+            """
+        )
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, thread_id: str) -> None:
+        conn.execute(
+            "INSERT INTO thread_versions (thread_id, version) VALUES (?, 1) "
+            "ON CONFLICT(thread_id) DO UPDATE SET version = version + 1",
+            (thread_id,),
+        )
+
+    def append_messages(self, thread_id: str, messages: List[dict]) -> None:
+        if not messages:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(conn, thread_id, messages)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_threads(self, threads: Dict[str, List[dict]]) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for thread_id, messages in threads.items():
+                if messages:
+                    self._write(conn, thread_id, messages)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return sum(len(messages) for messages in threads.values())
+
+    def _write(self, conn: sqlite3.Connection, thread_id: str, messages: List[dict]) -> None:
+        conn.executemany(
+            "INSERT INTO messages (thread_id, data) VALUES (?, ?)",
+            [(thread_id, json.dumps(m, ensure_ascii=False)) for m in messages],
+        )
+        # Retention: drop everything older than the newest max_messages rows
+        conn.execute(
+            """
+            DELETE FROM messages
+            WHERE thread_id = ? AND id <= (
+                SELECT id FROM messages WHERE thread_id = ?
+                ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+            """,
+            (thread_id, thread_id, self.retention.max_messages),
+        )
+        self._bump(conn, thread_id)
+
+    def get_last_messages(self, thread_id: str, n: int) -> List[dict]:
+        if n <= 0:
+            return []
+        rows = self._connect().execute(
+            "SELECT data FROM messages WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+            (thread_id, n),
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def thread_ids(self) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT thread_id FROM messages"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def touch_thread(self, thread_id: str) -> None:
+        self._bump(self._connect(), thread_id)
+
+    def thread_version(self, thread_id: str) -> int:
+        row = self._connect().execute(
+            "SELECT version FROM thread_versions WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def migrate_json_history(store: ConversationStore, path: str) -> int:
+    """
+    Import the legacy chat_history.json file into a store, once.
+
+    The file is first renamed atomically so that when several workers start
+    together only one of them performs the import; it is left behind as
+    `<path>.migrated` once the import is committed. All threads are written
+    in a single transaction, so a failed import leaves nothing behind and the
+    file gets its original name back, to be retried on the next start.
+
+    Args:
+        store (ConversationStore): Destination store
+        path (str): Path of the legacy JSON history file
+
+    Returns:
+        int: Number of imported messages (0 if there was nothing to migrate)
+    """
+    claimed = f"{path}.migrating.{os.getpid()}"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return 0
+
+    try:
+        with open(claimed, "r", encoding="utf-8") as f:
+            history = json.load(f) if os.path.getsize(claimed) > 0 else {}
+        imported = store.import_threads({
+            thread_id: messages[-store.retention.max_messages:]
+            for thread_id, messages in history.items()
+        })
+    except Exception:
+        logger.exception("Chat history migration from %s failed, keeping the file", path)
+        os.replace(claimed, path)
+        return 0
+    os.replace(claimed, f"{path}.migrated")
+    return imported
+
+
+def create_conversation_store() -> ConversationStore:
+    """Create the store configured in settings.storage."""
+    retention = RetentionPolicy(max_messages=settings.storage.history_max_messages)
+    backend = settings.storage.conversation_backend
+    if backend == "memory":
+        return InMemoryConversationStore(retention)
+    if backend == "sqlite":
+        return SQLiteConversationStore(settings.storage.conversation_db_path, retention)
+    raise ValueError(f"Invalid conversation store backend: {backend}")
+
+
+def _open_store() -> ConversationStore:
+    store = create_conversation_store()
+    # The legacy file is only consumed by a durable backend; importing it
+    # into memory would rename it away and lose it on restart
+    if not isinstance(store, InMemoryConversationStore):
+        migrate_json_history(store, settings.storage.legacy_history_file)
+    return store
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+async def open_conversation_store() -> ConversationStore:
+    """
+    Create the process-wide store and migrate the legacy JSON file.
+
+    Called once at startup (app lifespan, Telegram bot main); the schema
+    setup and the migration run in a worker thread, off the event loop.
+    """
+    global _store
+    if _store is None:
+        store = await run_sync(_open_store)
+        with _store_lock:
+            if _store is None:
+                _store = store
+    return _store
+
+
+def get_conversation_store() -> ConversationStore:
+    """Return the process-wide store opened by open_conversation_store()."""
+    if _store is None:
+        raise RuntimeError("Conversation store is not open, call open_conversation_store() at startup")
+    return _store
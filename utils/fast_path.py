@@ -0,0 +1,146 @@
+"""Rule-based intents answered by one tool call, without the LLM.
+
+Only messages that are nothing but a known pattern are matched:
+
+- one Sui coin type (`0x...::module::SYMBOL`, optionally after "scan")
+  -> scan_token
+- several coin types -> scan_tokens
+- "trending" (optionally "trending pairs", "/trending", or a resolution
+  such as "trending 1h") -> get_trending_pairs
+
+Anything else, or a tool result that is empty, falls back to the agent.
+"""
+
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from commons.stats import register_stats
+from tools import get_trending_pairs, scan_token, scan_tokens
+from utils.query_router import SIMPLE, router_stats
+
+logger = logging.getLogger(__name__)
+
+COIN_TYPE = r"0x[0-9a-fA-F]{1,64}::\w+::\w+"
+SCAN_PATTERN = re.compile(rf"^\s*(?:/?scan\s+)?({COIN_TYPE})\s*$", re.IGNORECASE)
+MULTI_SCAN_PATTERN = re.compile(rf"^\s*(?:/?scan\s+)?({COIN_TYPE}(?:[\s,]+{COIN_TYPE})+)\s*$", re.IGNORECASE)
+TRENDING_PATTERN = re.compile(
+    r"^\s*/?(?:what'?s\s+|show\s+(?:me\s+)?)?trending(?:\s+pairs?)?(?:\s+(5m|1h|6h|24h))?\s*[?!.]*\s*$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class FastPathMatch:
+    intent: str
+    run: Callable[[], Awaitable[Optional[str]]]
+
+
+async def _trending(resolution: str) -> Optional[str]:
+    data = await get_trending_pairs(resolution=resolution)
+    pairs = data.get("pairs", []) if data else []
+    if not pairs:
+        return None
+    return f"# Trending pairs on Sui ({resolution})\n\n" + "\n".join(
+        pair["markdown"] for pair in pairs
+    )
+
+
+def match_intent(query: str) -> Optional[FastPathMatch]:
+    """
+    Match a message that maps to a single tool call.
+
+    Args:
+        query (str): The user's message
+
+    Returns:
+        FastPathMatch or None: The intent and a coroutine function producing
+            the answer (None from it means: let the agent answer)
+    """
+    match = SCAN_PATTERN.match(query)
+    if match:
+        address = match.group(1)
+        return FastPathMatch("scan_token", lambda: scan_token(address))
+
+    match = MULTI_SCAN_PATTERN.match(query)
+    if match:
+        addresses = re.findall(COIN_TYPE, match.group(1))
+        return FastPathMatch("scan_tokens", lambda: scan_tokens(addresses))
+
+    match = TRENDING_PATTERN.match(query)
+    if match:
+        resolution = (match.group(1) or "5m").lower()
+        return FastPathMatch("get_trending_pairs", lambda: _trending(resolution))
+
+    return None
+
+
+class FastPath:
+    """Runs matched intents and tracks hit rate and latency."""
+
+    def __init__(self, agent_latency: Optional[Callable[[], float]] = None):
+        # Returns the typical agent latency (seconds) for the saved-time estimate
+        self.agent_latency = agent_latency
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._stats: Dict[str, Any] = {
+            "lookups": 0,
+            "hits": 0,
+            "fallbacks": 0,
+            "errors": 0,
+            "intents": {},
+        }
+
+    async def try_answer(self, query: str) -> Optional[str]:
+        """Answer query without the LLM, or return None to use the agent."""
+        self._stats["lookups"] += 1
+        match = match_intent(query)
+        if match is None:
+            return None
+
+        started = time.perf_counter()
+        try:
+            answer = await match.run()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning("Fast path %s failed, falling back to the agent: %s", match.intent, e)
+            return None
+        if not answer:
+            self._stats["fallbacks"] += 1
+            return None
+
+        elapsed = time.perf_counter() - started
+        self._latencies.append(elapsed)
+        self._stats["hits"] += 1
+        self._stats["intents"][match.intent] = self._stats["intents"].get(match.intent, 0) + 1
+        logger.info(
+            "Fast path answered",
+            extra={"intent": match.intent, "duration_ms": round(elapsed * 1000, 1)},
+        )
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        mean = sum(latencies) / len(latencies) if latencies else 0.0
+        agent = self.agent_latency() if self.agent_latency else 0.0
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / self._stats["lookups"], 4)
+            if self._stats["lookups"] else 0.0,
+            "latency_ms_p50": round(1000 * latencies[len(latencies) // 2], 1) if latencies else 0.0,
+            "latency_saved_ms_estimate": round(
+                1000 * max(0.0, agent - mean) * self._stats["hits"], 1
+            ) if agent else None,
+        }
+
+
+def _simple_agent_latency() -> float:
+    """Median latency of agent runs on the simple tier, which these intents would use."""
+    samples = sorted(router_stats.latencies.get(SIMPLE, ()))
+    return samples[len(samples) // 2] if samples else 0.0
+
+
+fast_path = FastPath(agent_latency=_simple_agent_latency)
+register_stats("fast_path", fast_path.stats)
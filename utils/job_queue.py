@@ -0,0 +1,355 @@
+"""Bounded in-process job queue for agent runs.
+
+Jobs are grouped per thread: a thread has at most one job running at a time
+and its jobs run in submission order, while different threads are served by
+a fixed number of consumer tasks. When the queue is full, submit() raises
+QueueFullError so the route can answer 429 with Retry-After.
+
+With a durable path, accepted jobs are also written to SQLite and removed once
+processed. Every worker holds a renewable lease on the jobs it accepted, so
+jobs of a worker that died are picked up by another one after the lease ends.
+Per-thread ordering then also holds across workers: a job only starts once
+its worker holds the thread's lease in SQLite and no older job of the thread
+is left; otherwise it is retried after THREAD_RETRY_DELAY seconds.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from commons.metrics import QUEUE_DEPTH, QUEUE_RUNNING
+from utils.concurrency import run_sync
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying a job whose thread is busy in another worker
+THREAD_RETRY_DELAY = 1.0
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class QueueUnavailableError(Exception):
+    """Raised when the queue is not accepting jobs (not started or shutting down)."""
+
+
+@dataclass
+class Job:
+    thread_id: str
+    payload: Dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class _JobStore:
+    """SQLite persistence for accepted jobs with per-worker leases."""
+
+    def __init__(self, path: str, owner: str, lease_seconds: float):
+        self.path = path
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                owner TEXT NOT NULL,
+                lease_until REAL NOT NULL
+            )
+            """
+        )
+        # The worker running a job of each thread; rows past lease_until are free
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_leases (
+                thread_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                lease_until REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, job: Job) -> None:
+        self._connect().execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                job.id,
+                job.thread_id,
+                json.dumps(job.payload, ensure_ascii=False),
+                job.enqueued_at,
+                self.owner,
+                time.time() + self.lease_seconds,
+            ),
+        )
+
+    def acquire_thread(self, job: Job) -> bool:
+        """
+        Take the lease of the job's thread, unless another worker holds a live
+        one or an older job of the thread is still waiting.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            busy = conn.execute(
+                "SELECT 1 FROM thread_leases WHERE thread_id = ? AND owner != ? AND lease_until >= ?",
+                (job.thread_id, self.owner, now),
+            ).fetchone() or conn.execute(
+                "SELECT 1 FROM jobs WHERE thread_id = ? AND id != ? AND enqueued_at < ? LIMIT 1",
+                (job.thread_id, job.id, job.enqueued_at),
+            ).fetchone()
+            if not busy:
+                conn.execute(
+                    "INSERT OR REPLACE INTO thread_leases VALUES (?, ?, ?)",
+                    (job.thread_id, self.owner, now + self.lease_seconds),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return not busy
+
+    def finish(self, job: Job) -> None:
+        """Remove a processed job and release its thread."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+            conn.execute(
+                "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?",
+                (job.thread_id, self.owner),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def renew_and_claim(self, limit: int) -> List[Job]:
+        """Extend our leases and take over up to `limit` jobs whose lease has expired."""
+        now = time.time()
+        lease_until = now + self.lease_seconds
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ?", (lease_until, self.owner)
+            )
+            conn.execute(
+                "UPDATE thread_leases SET lease_until = ? WHERE owner = ?",
+                (lease_until, self.owner),
+            )
+            claimed = conn.execute(
+                "SELECT id, thread_id, payload, enqueued_at FROM jobs "
+                "WHERE owner != ? AND lease_until < ? ORDER BY enqueued_at LIMIT ?",
+                (self.owner, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ?",
+                [(self.owner, lease_until, row[0]) for row in claimed],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            Job(id=row[0], thread_id=row[1], payload=json.loads(row[2]), enqueued_at=row[3])
+            for row in claimed
+        ]
+
+
+class JobQueue:
+    """Bounded queue with N consumers and per-thread ordering (across workers when durable)."""
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = 4,
+        max_size: int = 100,
+        durable_path: Optional[str] = None,
+        lease_seconds: float = 60.0,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        self.lease_seconds = lease_seconds
+        self._durable_path = durable_path
+        self._store: Optional[_JobStore] = None
+        self._ready: Optional[asyncio.Queue] = None
+        self._threads: Dict[str, Deque[Job]] = {}
+        self._pending = 0
+        self._running = 0
+        self._accepting = False
+        self._tasks: List[asyncio.Task] = []
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+        self._run_times: Deque[float] = deque(maxlen=1000)
+        self._stats = {
+            "accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "recovered": 0,
+            "thread_waits": 0,
+        }
+
+    @property
+    def depth(self) -> int:
+        """Jobs accepted but not started yet."""
+        return self._pending
+
+    async def start(self) -> None:
+        self._ready = asyncio.Queue()
+        self._accepting = True
+        if self._durable_path:
+            self._store = _JobStore(self._durable_path, uuid.uuid4().hex, self.lease_seconds)
+            self._tasks.append(asyncio.create_task(self._lease_loop()))
+        self._tasks.extend(
+            asyncio.create_task(self._consume()) for _ in range(self.workers)
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting jobs and give running ones `timeout` seconds to finish."""
+        self._accepting = False
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until a slot frees up."""
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        return max(1, int(avg_run * max(self._pending, 1) / self.workers))
+
+    def _enqueue(self, job: Job) -> None:
+        self._pending += 1
+        QUEUE_DEPTH.inc()
+        queued = self._threads.get(job.thread_id)
+        if queued is not None:
+            # Thread already queued or running: keep order, run after the current job
+            queued.append(job)
+            return
+        self._threads[job.thread_id] = deque([job])
+        self._ready.put_nowait(job.thread_id)
+
+    async def submit(self, thread_id: str, payload: Dict[str, Any]) -> Job:
+        """
+        Accept a job for background processing.
+
+        Args:
+            thread_id (str): Jobs with the same thread_id never run concurrently
+            payload (dict): JSON-serialisable arguments passed to the handler
+
+        Returns:
+            Job: The accepted job
+
+        Raises:
+            QueueUnavailableError: If the queue is not running
+            QueueFullError: If max_size jobs are already waiting
+        """
+        if not self._accepting:
+            raise QueueUnavailableError("Job queue is not accepting jobs")
+        if self._pending >= self.max_size:
+            self._stats["rejected"] += 1
+            raise QueueFullError(self.retry_after())
+        job = Job(thread_id=thread_id, payload=payload)
+        if self._store is not None:
+            await run_sync(self._store.add, job)
+        self._enqueue(job)
+        self._stats["accepted"] += 1
+        return job
+
+    async def _lease_loop(self) -> None:
+        while True:
+            try:
+                # Recovered jobs count against max_size like submitted ones
+                room = max(0, self.max_size - self._pending)
+                for job in await run_sync(self._store.renew_and_claim, room):
+                    self._stats["recovered"] += 1
+                    self._enqueue(job)
+            except Exception as e:
+                logger.warning("Job queue lease renewal failed: %s", e)
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def _consume(self) -> None:
+        while True:
+            thread_id = await self._ready.get()
+            queued = self._threads[thread_id]
+            job = queued[0]
+            if self._store is not None and not await self._acquire(job):
+                self._stats["thread_waits"] += 1
+                asyncio.get_running_loop().call_later(
+                    THREAD_RETRY_DELAY, self._ready.put_nowait, thread_id
+                )
+                continue
+            self._pending -= 1
+            self._running += 1
+            QUEUE_DEPTH.dec()
+            QUEUE_RUNNING.inc()
+            started = time.time()
+            self._wait_times.append(started - job.enqueued_at)
+            try:
+                await self.handler(job.payload)
+                self._stats["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["failed"] += 1
+                logger.exception("Job %s failed: %s", job.id, e)
+            finally:
+                self._running -= 1
+                QUEUE_RUNNING.dec()
+                self._run_times.append(time.time() - started)
+            if self._store is not None:
+                # Before the next job of the thread tries to take the thread lease
+                try:
+                    await run_sync(self._store.finish, job)
+                except Exception as e:
+                    logger.warning("Could not remove job %s from store: %s", job.id, e)
+            queued.popleft()
+            if queued:
+                self._ready.put_nowait(thread_id)
+            else:
+                del self._threads[thread_id]
+
+    async def _acquire(self, job: Job) -> bool:
+        try:
+            return await run_sync(self._store.acquire_thread, job)
+        except Exception as e:
+            logger.warning("Could not lease thread of job %s: %s", job.id, e)
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            **self._stats,
+            "depth": self._pending,
+            "running": self._running,
+            "threads": len(self._threads),
+            "max_size": self.max_size,
+            "workers": self.workers,
+            "durable": self._store is not None,
+            "wait_ms_p50": round(1000 * waits[len(waits) // 2], 1) if waits else 0.0,
+            "wait_ms_p95": round(1000 * waits[int(len(waits) * 0.95) - 1], 1) if waits else 0.0,
+            "wait_ms_max": round(1000 * waits[-1], 1) if waits else 0.0,
+        }
@@ -0,0 +1,255 @@
+"""Background snapshot of RaidenX market data for the tools.
+
+A poller owned by the app lifespan fetches the trending lists of every
+resolution, then the top pair of the hot tokens (those in the trending
+lists), every `interval` seconds. Pairs are trimmed to the fields the tools
+read and indexed by token address and by symbol, so get_trending_pairs and
+scan_token answer from memory and upstream load depends on the interval,
+not on user traffic.
+
+A lookup returns None when its data is older than `max_age` (poller stopped
+or upstream failing) or not in the snapshot; callers then fetch live.
+
+Each trending list is requested with `page_size` pairs (at least
+`trending_limit`). The token index reads the whole first page from here
+(trending_page) instead of requesting it again.
+
+Every worker runs its own poller: upstream sees WORKERS x (resolutions +
+hot_tokens) requests per interval, e.g. 5 x (4 + 20) = 120 every 20s.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from commons.http_client import http_client, DEFAULT_RETRY_STATUSES
+from commons.metrics import MARKET_SNAPSHOT_UPDATED
+from commons.stats import register_stats
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pair fields read by the trending and scan tools
+PAIR_FIELDS = ("pairId", "dex", "createdAt", "tokenBase", "liquidityUsd",
+               "marketCapUsd", "volumeUsd", "stats")
+TOKEN_FIELDS = ("address", "name", "symbol", "priceUsd")
+
+
+def compact_pair(pair: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a pair payload with only the fields the tools use."""
+    result = {key: pair[key] for key in PAIR_FIELDS if key in pair}
+    token = pair.get("tokenBase")
+    if isinstance(token, dict):
+        result["tokenBase"] = {key: token[key] for key in TOKEN_FIELDS if key in token}
+    if isinstance(pair.get("dex"), dict):
+        result["dex"] = {"name": pair["dex"].get("name")}
+    return result
+
+
+def _liquidity(pair: Dict[str, Any]) -> float:
+    try:
+        return float(pair.get("liquidityUsd") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MarketSnapshot:
+    """Trending lists and top pairs refreshed in the background, indexed in memory."""
+
+    def __init__(
+        self,
+        resolutions: Iterable[str],
+        interval: float = 20.0,
+        max_age: float = 60.0,
+        trending_limit: int = 10,
+        hot_tokens: int = 20,
+        page_size: int = 0,
+    ):
+        self.resolutions = list(resolutions)
+        self.interval = interval
+        self.max_age = max_age
+        self.trending_limit = trending_limit
+        self.hot_tokens = hot_tokens
+        self.page_size = max(page_size, trending_limit)
+        # resolution -> (refreshed at, first page in upstream rank order)
+        self._trending: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        # token address -> (refreshed at, top pair)
+        self._top_pairs: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # upper-case symbol -> token addresses, most liquid first
+        self._by_symbol: Dict[str, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._refreshed_at: Optional[float] = None
+        self._stats = {
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "hits": 0,
+            "stale": 0,
+            "misses": 0,
+            "last_refresh_ms": 0.0,
+        }
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logger.warning("Market snapshot refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def _request_trending(self, resolution: str) -> List[Dict[str, Any]]:
+        response = await http_client.get(
+            f"{settings.raiden.api_common_url}/api/v1/sui/pairs/trending",
+            headers={"accept": "application/json"},
+            params={"page": 1, "limit": self.page_size, "resolution": resolution,
+                    "network": "sui"},
+        )
+        response.raise_for_status()
+        return response.json() or []
+
+    async def _request_top_pair(self, address: str) -> Optional[Dict[str, Any]]:
+        response = await http_client.get(
+            f"{settings.raiden.api_common_url}/api/v1/sui/tokens/{address}/top-pair",
+            retry_statuses=DEFAULT_RETRY_STATUSES - {502},
+        )
+        if response.status_code in (404, 502):
+            return None
+        response.raise_for_status()
+        return response.json() or None
+
+    async def refresh(self) -> None:
+        """Fetch every trending list, then the top pair of each hot token."""
+        started = time.perf_counter()
+        lists = await asyncio.gather(
+            *(self._request_trending(resolution) for resolution in self.resolutions),
+            return_exceptions=True,
+        )
+        now = time.monotonic()
+        hot: Dict[str, None] = {}
+        for resolution, pairs in zip(self.resolutions, lists):
+            if isinstance(pairs, BaseException):
+                self._stats["refresh_errors"] += 1
+                logger.warning("Trending %s refresh failed: %s", resolution, pairs)
+                continue
+            self._trending[resolution] = (now, [compact_pair(pair) for pair in pairs])
+            # Hot tokens come from the top of every list, not the whole first page
+            for pair in pairs[: self.trending_limit]:
+                address = (pair.get("tokenBase") or {}).get("address")
+                if address:
+                    hot.setdefault(address)
+
+        semaphore = asyncio.Semaphore(settings.raiden.scan_concurrency)
+
+        async def fetch(address: str):
+            async with semaphore:
+                return await self._request_top_pair(address)
+
+        addresses = list(hot)[: self.hot_tokens]
+        results = await asyncio.gather(*(fetch(a) for a in addresses), return_exceptions=True)
+        now = time.monotonic()
+        for address, pair in zip(addresses, results):
+            if isinstance(pair, BaseException):
+                self._stats["refresh_errors"] += 1
+            elif pair:
+                self._top_pairs[address] = (now, compact_pair(pair))
+        # Tokens that left the hot list stay until they expire, then are dropped
+        for address in [a for a, (at, _) in self._top_pairs.items() if now - at > 2 * self.max_age]:
+            del self._top_pairs[address]
+        self._reindex()
+
+        self._refreshed_at = now
+        MARKET_SNAPSHOT_UPDATED.set(time.time())
+        self._stats["refreshes"] += 1
+        self._stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _reindex(self) -> None:
+        by_symbol: Dict[str, List[Tuple[float, str]]] = {}
+        for address, (_, pair) in self._top_pairs.items():
+            symbol = (pair.get("tokenBase") or {}).get("symbol")
+            if symbol:
+                by_symbol.setdefault(symbol.upper(), []).append((_liquidity(pair), address))
+        self._by_symbol = {
+            symbol: [address for _, address in sorted(entries, reverse=True)]
+            for symbol, entries in by_symbol.items()
+        }
+
+    def _fresh(self, entry: Optional[Tuple[float, Any]]) -> Optional[Any]:
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        if time.monotonic() - entry[0] > self.max_age:
+            self._stats["stale"] += 1
+            return None
+        self._stats["hits"] += 1
+        return entry[1]
+
+    def trending(self, resolution: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """The first `limit` trending pairs of a resolution, or None if not fresh."""
+        if limit > self.page_size:
+            self._stats["misses"] += 1
+            return None
+        pairs = self._fresh(self._trending.get(resolution))
+        return None if pairs is None else pairs[:limit]
+
+    def trending_page(self, resolution: str) -> Optional[List[Dict[str, Any]]]:
+        """The whole first page (page_size pairs) of a resolution, or None if not fresh."""
+        entry = self._trending.get(resolution)
+        if entry is None or time.monotonic() - entry[0] > self.max_age:
+            return None
+        return entry[1]
+
+    def top_pair(self, address: str) -> Optional[Dict[str, Any]]:
+        """Top pair of a token, or None if it is not hot or not fresh."""
+        return self._fresh(self._top_pairs.get(address))
+
+    def find_symbol(self, symbol: str) -> List[Dict[str, Any]]:
+        """Fresh top pairs of the hot tokens with this symbol, most liquid first."""
+        now = time.monotonic()
+        return [
+            pair
+            for at, pair in (self._top_pairs[a] for a in self._by_symbol.get(symbol.upper(), ()))
+            if now - at <= self.max_age
+        ]
+
+    def age(self) -> Optional[float]:
+        """Seconds since the last completed refresh."""
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        age = self.age()
+        return {
+            **self._stats,
+            "running": self._task is not None and not self._task.done(),
+            "age_s": None if age is None else round(age, 1),
+            "trending_age_s": {
+                resolution: round(now - at, 1) for resolution, (at, _) in self._trending.items()
+            },
+            "tokens": len(self._top_pairs),
+            "symbols": len(self._by_symbol),
+            "interval": self.interval,
+            "max_age": self.max_age,
+        }
+
+
+market_snapshot = MarketSnapshot(
+    resolutions=[r.strip() for r in settings.market.resolutions.split(",") if r.strip()],
+    interval=settings.market.interval,
+    max_age=settings.market.max_age,
+    trending_limit=settings.market.trending_limit,
+    hot_tokens=settings.market.hot_tokens,
+    # Page 1 of the token index pull is shared with the snapshot
+    page_size=settings.token_index.page_size if settings.token_index.enabled else 0,
+)
+register_stats("market_snapshot", market_snapshot.stats)
@@ -0,0 +1,223 @@
+"""Compact tool outputs before they go back to the LLM as Observations.
+
+Every Observation is resent on each later ReAct iteration, so its size is
+paid several times per run. Tool outputs are rewritten into a dense,
+tool-aware form:
+
+- get_trending_pairs: one pipe-separated row per pair. The markdown block
+  repeated the structured fields, so it is dropped.
+- scan_token / scan_tokens: the markdown report with bold and code markers,
+  padding and table rules removed.
+- anything else: compact JSON for dicts and lists, collapsed whitespace for
+  text.
+
+Each tool's Observation is then capped at a token budget (settings.observation).
+A capped Observation keeps its first lines and ends with a handle. The agent
+can pass that handle to the expand_observation tool to read the whole
+compacted output. Errors and expansions are sent unchanged.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from commons.metrics import OBSERVATION_TOKENS
+from commons.stats import register_stats
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPAND_TOOL = "expand_observation"
+# Room kept under the cap for the truncation notice
+NOTICE_TOKENS = 30
+
+_MARKUP = re.compile(r"\*\*|`")
+_SPACES = re.compile(r"[ \t]+")
+_TABLE_RULE = re.compile(r"^\|?(\s*:?-+:?\s*\|)*\s*:?-+:?\s*\|?$")
+_TABLE_CELL = re.compile(r"\s*\|\s*")
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _saved_pct(raw: int, sent: int) -> float:
+    return round(100 * (1 - sent / raw), 1) if raw else 0.0
+
+
+def _short(value: Any) -> str:
+    """1234567 -> 1.23M, 0.000123 -> 0.000123: 3-4 significant digits."""
+    number = _number(value)
+    for limit, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(number) >= limit:
+            return f"{number / limit:.3g}{suffix}"
+    return f"{number:.4g}"
+
+
+def compact_trending(output: Any) -> Optional[str]:
+    """get_trending_pairs result as a header plus one row per pair."""
+    if not isinstance(output, dict) or not isinstance(output.get("pairs"), list):
+        return None
+    rows = ["symbol|address|price$|liq$|vol$|5m%|1h%|6h%|24h%"]
+    for pair in output["pairs"]:
+        token = pair.get("tokenBase") or {}
+        change = pair.get("priceChange") or {}
+        rows.append("|".join([
+            str(token.get("symbol") or "?"),
+            str(token.get("address") or ""),
+            _short(token.get("priceUsd")),
+            _short(pair.get("liquidityUsd")),
+            _short(pair.get("volumeUsd")),
+            *(f"{_number(change.get(period)):.2f}" for period in ("5m", "1h", "6h", "24h")),
+        ]))
+    return "\n".join(rows)
+
+
+def compact_markdown(output: Any) -> Optional[str]:
+    """Markdown text without emphasis, padding, blank lines and table rules."""
+    if not isinstance(output, str):
+        return None
+    lines = []
+    for line in output.splitlines():
+        line = _SPACES.sub(" ", _MARKUP.sub("", line)).strip()
+        if not line or _TABLE_RULE.match(line):
+            continue
+        if line.startswith("|"):
+            line = _TABLE_CELL.sub("|", line).strip("|")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def compact_default(output: Any) -> Optional[str]:
+    if isinstance(output, (dict, list)):
+        return json.dumps(output, ensure_ascii=False, separators=(",", ":"), default=str)
+    if isinstance(output, str):
+        return compact_markdown(output)
+    return None
+
+
+COMPACTORS: Dict[str, Callable[[Any], Optional[str]]] = {
+    "get_trending_pairs": compact_trending,
+    "scan_token": compact_markdown,
+    "scan_tokens": compact_markdown,
+}
+
+
+class ObservationCompactor:
+    """Compacts and caps tool outputs, keeping capped ones expandable by handle."""
+
+    def __init__(self, store_size: int = 512):
+        self.store_size = store_size
+        # handle -> full compacted text, least recently used first
+        self._store: "OrderedDict[str, str]" = OrderedDict()
+        self._tools: Dict[str, Dict[str, int]] = {}
+        self._stats = {"expanded": 0, "expand_misses": 0}
+
+    def _put(self, tool_name: str, text: str) -> str:
+        # Content-addressed, so the same output gets the same handle (and replays match)
+        handle = "obs-" + hashlib.sha1(f"{tool_name}\0{text}".encode()).hexdigest()[:10]
+        self._store[handle] = text
+        self._store.move_to_end(handle)
+        while len(self._store) > self.store_size:
+            self._store.popitem(last=False)
+        return handle
+
+    def _cap(
+        self, tool_name: str, text: str, cap: int, count_tokens: Callable[[str], int]
+    ) -> Tuple[str, bool]:
+        tokens = count_tokens(text)
+        if tokens <= cap:
+            return text, False
+        handle = self._put(tool_name, text)
+        budget = max(cap - NOTICE_TOKENS, 0)
+        lines = text.split("\n")
+        kept, used = [], 0
+        for line in lines:
+            used += count_tokens(line) + 1
+            if used > budget:
+                break
+            kept.append(line)
+        if not kept:
+            # A single long line: cut it at the same chars-per-token ratio
+            kept = [text[: int(len(text) * budget / tokens)]]
+            omitted = "the rest of the output"
+        else:
+            omitted = f"{len(lines) - len(kept)} more lines"
+        notice = (
+            f"[truncated: {omitted}. For the full output call {EXPAND_TOOL} "
+            f'with {{"handle": "{handle}"}}]'
+        )
+        return "\n".join(kept + [notice]), True
+
+    def compact(self, tool_name: str, tool_output: Any, count_tokens: Callable[[str], int]) -> str:
+        """
+        Observation text of one tool output.
+
+        Args:
+            tool_name (str): Name of the tool that produced the output
+            tool_output (ToolOutput): Output of the tool call
+            count_tokens (Callable): Token counter of the LLM receiving the prompt
+
+        Returns:
+            str: Compacted, capped text (str(tool_output) for errors and expansions)
+        """
+        raw = str(tool_output)
+        if not settings.observation.compact or tool_output.is_error or tool_name == EXPAND_TOOL:
+            return raw
+        compactor = COMPACTORS.get(tool_name, compact_default)
+        try:
+            text = compactor(tool_output.raw_output)
+        except Exception as e:
+            logger.warning("Could not compact %s output: %s", tool_name, e)
+            text = None
+        if text is None:
+            text = raw
+        text, truncated = self._cap(tool_name, text, settings.observation.cap_for(tool_name), count_tokens)
+
+        raw_tokens, sent_tokens = count_tokens(raw), count_tokens(text)
+        stats = self._tools.setdefault(
+            tool_name, {"calls": 0, "raw_tokens": 0, "sent_tokens": 0, "truncated": 0}
+        )
+        stats["calls"] += 1
+        stats["raw_tokens"] += raw_tokens
+        stats["sent_tokens"] += sent_tokens
+        stats["truncated"] += truncated
+        OBSERVATION_TOKENS.labels(tool_name, "raw").inc(raw_tokens)
+        OBSERVATION_TOKENS.labels(tool_name, "sent").inc(sent_tokens)
+        return text
+
+    def expand(self, handle: str) -> Optional[str]:
+        """Full compacted text of a capped Observation, or None if unknown or evicted."""
+        text = self._store.get(handle.strip())
+        if text is None:
+            self._stats["expand_misses"] += 1
+            return None
+        self._store.move_to_end(handle.strip())
+        self._stats["expanded"] += 1
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        tools = {
+            name: {**s, "saved_pct": _saved_pct(s["raw_tokens"], s["sent_tokens"])}
+            for name, s in self._tools.items()
+        }
+        raw = sum(s["raw_tokens"] for s in self._tools.values())
+        sent = sum(s["sent_tokens"] for s in self._tools.values())
+        return {
+            **self._stats,
+            "stored": len(self._store),
+            "raw_tokens": raw,
+            "sent_tokens": sent,
+            "saved_pct": _saved_pct(raw, sent),
+            "tools": tools,
+        }
+
+
+observation_compactor = ObservationCompactor(store_size=settings.observation.store_size)
+register_stats("observations", observation_compactor.stats)
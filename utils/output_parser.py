@@ -1,7 +1,18 @@
-"""ReAct output parser."""
+"""ReAct output parser.
 
+LLM output is tokenized once by a single precompiled keyword pattern; the
+keyword positions are then read by a small state machine that builds the
+reasoning step. ReActStreamParser accepts the output in chunks (as it streams
+from the provider) and only scans the new text of each chunk; the streaming
+agent (agents.astream_react_chat) feeds it the final answer stream to find
+where the answer starts.
+"""
+
+import json
 import re
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
+
+import dirtyjson
 
 from llama_index.core.agent.react.types import (
     ActionReasoningStep,
@@ -11,74 +22,216 @@ from llama_index.core.agent.react.types import (
 from llama_index.core.output_parsers.utils import extract_json_str
 from llama_index.core.types import BaseOutputParser
 
+THOUGHT = "Thought"
+ACTION = "Action"
+ACTION_INPUT = "Action Input"
+ANSWER = "Answer"
+OBSERVATION = "Observation"
 
-def extract_tool_use(input_text: str) -> Tuple[str, str, str]:
-    pattern = (
-        r"Thought:\s*(.*?)[\n\r]+\s*Action:\s*([^\n\r]+)[\n\r]+\s*Action Input:\s*(\{[^}]+\})"
-    )
-    print(f"input_text: {input_text}")
-    match = re.search(pattern, input_text, re.DOTALL)
-    if not match:
-        raise ValueError(f"Could not parse output. Please follow the thought-action-input format: {input_text}")
-
-    thought = match.group(1).strip()
-    action = match.group(2).strip()
-    action_input = match.group(3).strip()
-    
-    return thought, action, action_input
+# "Action Input" must come before "Action" so the longer keyword wins. No
+# lookbehind: a leading assertion disables the regex engine's first-character
+# prefilter and makes the scan about 4x slower
+KEYWORD_PATTERN = re.compile(r"(Thought|Action Input|Action|Answer|Observation):")
+# Text at the end of a chunk that may still grow into a keyword (or into the
+# " None" after "Action:"), so it is scanned again with the next chunk
+SCAN_HOLDBACK = len("Action Input:") + len(" None") + 1
+ACTION_NONE_PATTERN = re.compile(r"[ \t]*None\b")
+# Strings (with escapes) are skipped whole, so braces inside them do not count
+JSON_STRUCTURE_PATTERN = re.compile(r""""(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[{}]""")
+SINGLE_QUOTE_PATTERN = re.compile(r"(?<!\w)\'|\'(?!\w)")
+KEY_VALUE_PATTERN = re.compile(r'"(\w+)":\s*"([^"]*)"')
 
 
 def action_input_parser(json_str: str) -> dict:
-    processed_string = re.sub(r"(?<!\w)\'|\'(?!\w)", '"', json_str)
-    pattern = r'"(\w+)":\s*"([^"]*)"'
-    matches = re.findall(pattern, processed_string)
-    return dict(matches)
-
-
-def extract_final_response(input_text: str) -> Tuple[str, str]:
-    # Pattern 1: Normal case with Thought and Answer
-    pattern1 = r"\s*Thought:(.*?)Answer:(.*?)(?:$)"
-    # Pattern 2: Case with Action: None and answer in the last line
-    pattern2 = r"\s*Thought:(.*?)Action:\s*None\s*(.*?)(?:$)"
-    # Pattern 3: Case with only Thought
-    pattern3 = r"\s*Thought:(.*?)(?:$)"
-
-    match1 = re.search(pattern1, input_text, re.DOTALL)
-    match2 = re.search(pattern2, input_text, re.DOTALL)
-    match3 = re.search(pattern3, input_text, re.DOTALL)
-
-    if match1:
-        thought = match1.group(1).strip()
-        answer = match1.group(2).strip()
-    elif match2:
-        thought = match2.group(1).strip()
-        answer = match2.group(2).strip()
-    elif match3:
-        thought = match3.group(1).strip()
-        answer = thought.split(".")[-1].strip() if len(thought.split(".")[-1]) > 3 else thought.split(".")[-2].strip()
-    else:
-        raise ValueError(
-            f"Could not extract final answer from input text: {input_text}"
-        )
-
-    return thought, answer
-
-
-def parse_action_reasoning_step(output: str) -> ActionReasoningStep:
-    """
-    Parse an action reasoning step from the LLM output.
-    """
-    import dirtyjson as json
+    processed_string = SINGLE_QUOTE_PATTERN.sub('"', json_str)
+    return dict(KEY_VALUE_PATTERN.findall(processed_string))
+
 
-    thought, action, action_input = extract_tool_use(output)
-    json_str = extract_json_str(action_input)
+def parse_action_input(action_input: str) -> dict:
+    json_str = action_input if action_input.startswith("{") else extract_json_str(action_input)
+    # Models almost always emit valid JSON; dirtyjson is pure Python and far slower
+    try:
+        return json.loads(json_str)
+    except ValueError:
+        pass
     try:
-        action_input_dict = json.loads(json_str)
+        return dict(dirtyjson.loads(json_str))
     except Exception:
-        action_input_dict = action_input_parser(json_str)
-    return ActionReasoningStep(
-        thought=thought, action=action, action_input=action_input_dict
-    )
+        return action_input_parser(json_str)
+
+
+def _json_object_end(text: str, start: int, end: int) -> int:
+    """Index after the JSON object opening at start, or -1 if it is not closed before end."""
+    depth = 0
+    for match in JSON_STRUCTURE_PATTERN.finditer(text, start, end):
+        token = match.group()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return -1
+
+
+class MultiActionReasoningStep(BaseReasoningStep):
+    """Several independent tool calls requested in a single LLM turn."""
+
+    thought: str
+    actions: List[ActionReasoningStep]
+
+    def get_content(self) -> str:
+        """Get content."""
+        lines = [f"Thought: {self.thought}"]
+        for step in self.actions:
+            lines.append(f"Action: {step.action}")
+            lines.append(f"Action Input: {step.action_input}")
+        return "\n".join(lines)
+
+    @property
+    def is_done(self) -> bool:
+        """Is the reasoning step the last one."""
+        return False
+
+
+class ReActStreamParser:
+    """
+    Incremental ReAct parser: feed() chunks, then reasoning_step().
+
+    Keyword positions are recorded as the text arrives, so each character is
+    scanned once however many chunks the output comes in. Once "Answer:" (or
+    "Action: None") has been seen, `answer` returns the answer received so far.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._scanned = 0
+        # (keyword, keyword start, content start)
+        self.keywords: List[Tuple[str, int, int]] = []
+        # Keyword index of the first occurrence of each keyword
+        self._first: Dict[str, int] = {}
+        # Keyword index of the first "Action: None"
+        self._action_none: Optional[int] = None
+        self._action_none_end = 0
+
+    def feed(self, chunk: str) -> None:
+        self.text += chunk
+        self._scan(len(self.text) - SCAN_HOLDBACK)
+
+    def close(self) -> None:
+        self._scan(len(self.text))
+
+    def _scan(self, safe_end: int) -> None:
+        if safe_end <= self._scanned:
+            return
+        for match in KEYWORD_PATTERN.finditer(self.text, self._scanned):
+            if match.start() >= safe_end:
+                break
+            keyword = match.group(1)
+            self._first.setdefault(keyword, len(self.keywords))
+            if keyword == ACTION and self._action_none is None:
+                none = ACTION_NONE_PATTERN.match(self.text, match.end())
+                if none:
+                    self._action_none = len(self.keywords)
+                    self._action_none_end = none.end()
+            self.keywords.append((keyword, match.start(), match.end()))
+            self._scanned = match.end()
+        self._scanned = max(self._scanned, safe_end)
+
+    def _answer_bounds(self) -> Optional[Tuple[int, int]]:
+        """(opening keyword start, answer start), "Answer:" winning over "Action: None"."""
+        if ANSWER in self._first:
+            _, start, end = self.keywords[self._first[ANSWER]]
+            return start, end
+        if self._action_none is not None:
+            return self.keywords[self._action_none][1], self._action_none_end
+        return None
+
+    @property
+    def answer_start(self) -> Optional[int]:
+        """Offset in text where the answer begins, or None before the answer started."""
+        bounds = self._answer_bounds()
+        return None if bounds is None else bounds[1]
+
+    @property
+    def answer(self) -> Optional[str]:
+        """Answer text received so far, or None before the answer started."""
+        bounds = self._answer_bounds()
+        if bounds is None:
+            return None
+        return self.text[bounds[1]:].strip()
+
+    def _content_end(self, index: int) -> int:
+        return self.keywords[index + 1][1] if index + 1 < len(self.keywords) else len(self.text)
+
+    def _actions(self) -> List[Tuple[str, str]]:
+        """(action, raw input) pairs before any hallucinated Observation."""
+        actions = []
+        pending_action: Optional[str] = None
+        for index, (name, _, content_start) in enumerate(self.keywords):
+            if name == OBSERVATION:
+                break
+            content_end = self._content_end(index)
+            if name == ACTION:
+                lines = self.text[content_start:content_end].strip().splitlines()
+                pending_action = lines[0].strip() if lines else ""
+            elif name == ACTION_INPUT and pending_action:
+                brace = self.text.find("{", content_start, content_end)
+                close = _json_object_end(self.text, brace, content_end) if brace != -1 else -1
+                if close != -1:
+                    actions.append((pending_action, self.text[brace:close]))
+                pending_action = None
+        return actions
+
+    def reasoning_step(self, is_streaming: bool = False) -> BaseReasoningStep:
+        """Build the reasoning step from everything fed so far."""
+        self.close()
+        output = self.text
+        thought_index = self._first.get(THOUGHT)
+        if thought_index is None:
+            return ResponseReasoningStep(
+                thought="(Implicit) I can answer without any more tools!",
+                response=output,
+                is_streaming=is_streaming,
+            )
+        thought_start = self.keywords[thought_index][2]
+
+        # An "Action" takes priority over an "Answer", unless it is "Action: None"
+        has_action = self._action_none is None and ACTION in self._first
+        answer_bounds = self._answer_bounds()
+        if has_action or (answer_bounds is None and ACTION_INPUT in self._first):
+            actions = self._actions()
+            if not actions:
+                raise ValueError(
+                    f"Could not parse output. Please follow the thought-action-input format: {output}"
+                )
+            thought = output[thought_start:self._content_end(thought_index)].strip()
+            steps = [
+                ActionReasoningStep(
+                    thought=thought, action=name, action_input=parse_action_input(raw)
+                )
+                for name, raw in actions
+            ]
+            if len(steps) > 1:
+                return MultiActionReasoningStep(thought=thought, actions=steps)
+            return steps[0]
+
+        if answer_bounds is not None:
+            opener, answer_start = answer_bounds
+            return ResponseReasoningStep(
+                thought=output[thought_start:max(thought_start, opener)].strip(),
+                response=output[answer_start:].strip(),
+                is_streaming=is_streaming,
+            )
+
+        # Only a Thought: its last sentence is the answer
+        thought = output[thought_start:].strip()
+        sentences = thought.split(".")
+        if len(sentences[-1]) > 3 or len(sentences) == 1:
+            answer = sentences[-1].strip()
+        else:
+            answer = sentences[-2].strip()
+        return ResponseReasoningStep(thought=thought, response=answer, is_streaming=is_streaming)
 
 
 class ReActOutputParser(BaseOutputParser):
@@ -94,43 +247,16 @@ class ReActOutputParser(BaseOutputParser):
             Action: <action>
             Action Input: <action_input>
             ```
+           possibly with several Action / Action Input pairs after one Thought.
         2. If the agent can answer the question without any tools:
             ```
             Thought: <thought>
             Answer: <answer>
             ```
         """
-        
-        print(f"output-ReActOutputParser: {output}")
-        
-        if "Thought:" not in output:
-            return ResponseReasoningStep(
-                thought="(Implicit) I can answer without any more tools!",
-                response=output,
-                is_streaming=is_streaming,
-            )
-            
-            
-        # An "Action" should take priority over an "Answer"
-        if "Action:" in output and "Action: None" not in output:
-            return parse_action_reasoning_step(output)
-            
-        if "Answer:" in output or "Action: None" in output:
-            thought, answer = extract_final_response(output)
-            return ResponseReasoningStep(
-                thought=thought, response=answer, is_streaming=is_streaming
-            )
-            
-        if "Action Input:" in output:
-            return parse_action_reasoning_step(output)
-        
-        if "Thought:" in output:
-            thought, answer = extract_final_response(output)
-            return ResponseReasoningStep(
-                thought=thought, response=answer, is_streaming=is_streaming
-            )
-
-        raise ValueError(f"Could not parse output: {output}")
+        parser = ReActStreamParser()
+        parser.feed(output)
+        return parser.reasoning_step(is_streaming=is_streaming)
 
     def format(self, output: str) -> str:
         """Format a query with structured output formatting instructions."""
@@ -0,0 +1,163 @@
+"""Heuristic routing of user queries to the cheapest path that can answer them.
+
+Tiers:
+    direct  - greetings and small talk, answered by one short LLM call
+    simple  - a single lookup ("price of X", "trending pairs"), run by the
+              ReAct agent on the fast model with a low max_iterations
+    complex - everything else, run on the larger model
+
+The classifier is pure string matching and takes microseconds; when in doubt
+it picks the more capable tier.
+"""
+
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMCompletionEndEvent,
+)
+
+from commons.stats import register_stats
+from LLM.prompt_cache import extract_cache_usage
+
+DIRECT = "direct"
+SIMPLE = "simple"
+COMPLEX = "complex"
+TIERS = (DIRECT, SIMPLE, COMPLEX)
+
+GREETING_PATTERN = re.compile(
+    r"(?:(?:hi+|hey+|hello+|yo|gm|gn|good (?:morning|afternoon|evening|night)|"
+    r"thanks?(?: you)?|thank you(?: so much)?|thx|ty|ok(?:ay)?|cool|nice|great|bye|"
+    r"see you|how are you(?: doing)?|what'?s up|who are you|what can you do|"
+    r"xin chào|chào(?: bạn)?|cảm ơn)\b(?: there| bot| agent)?[\s!.?,:)]*)+",
+    re.IGNORECASE,
+)
+# Anything that looks like a token: 0x addresses, Sui coin types, $TICKER or
+# an all-caps word of 2-10 characters
+TOKEN_PATTERN = re.compile(
+    r"0x[0-9a-fA-F]{6,}(::\w+::\w+)?|\$[A-Za-z][A-Za-z0-9]{1,9}\b|\b[A-Z][A-Z0-9]{1,9}\b"
+)
+LOOKUP_PATTERN = re.compile(
+    r"\b(price|giá|scan|info|address|contract|liquidity|market ?cap|mcap|volume|"
+    r"trending|top pairs?|hot)\b",
+    re.IGNORECASE,
+)
+COMPLEX_PATTERN = re.compile(
+    r"\b(compare|comparison|vs\.?|versus|which|why|should|analy[sz]e|analysis|"
+    r"strategy|recommend|explain|difference|better|best|worst|predict|and then)\b",
+    re.IGNORECASE,
+)
+
+MAX_DIRECT_WORDS = 8
+MAX_SIMPLE_WORDS = 16
+
+
+@dataclass
+class RouteDecision:
+    tier: str
+    reason: str
+    classify_ms: float
+
+
+def classify_query(query: str) -> RouteDecision:
+    """
+    Pick a tier for a user query.
+
+    Args:
+        query (str): The user's message
+
+    Returns:
+        RouteDecision: Tier, the rule that matched and the classification time
+    """
+    started = time.perf_counter()
+    text = query.strip()
+    words = text.split()
+    tokens = TOKEN_PATTERN.findall(text)
+
+    if not text:
+        tier, reason = DIRECT, "empty"
+    elif COMPLEX_PATTERN.search(text):
+        tier, reason = COMPLEX, "reasoning keyword"
+    elif len(words) <= MAX_DIRECT_WORDS and GREETING_PATTERN.fullmatch(text):
+        tier, reason = DIRECT, "greeting"
+    elif len(words) <= MAX_SIMPLE_WORDS and len(tokens) <= 1 and LOOKUP_PATTERN.search(text):
+        tier, reason = SIMPLE, "single lookup"
+    elif len(words) <= 4 and len(tokens) == 1:
+        tier, reason = SIMPLE, "bare token"
+    else:
+        tier, reason = COMPLEX, "default"
+
+    return RouteDecision(tier, reason, (time.perf_counter() - started) * 1000)
+
+
+# Tier of the run in progress, so LLM usage can be attributed to it
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+
+class RouterStats(BaseEventHandler):
+    """Per-tier request counts, latencies and LLM usage."""
+
+    tiers: Dict[str, Dict[str, Any]] = {}
+    latencies: Dict[str, Deque[float]] = {}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RouterStats"
+
+    def _tier(self, tier: str) -> Dict[str, Any]:
+        if tier not in self.tiers:
+            self.tiers[tier] = {
+                "requests": 0, "errors": 0, "escalations": 0, "llm_calls": 0, "prompt_tokens": 0,
+            }
+            self.latencies[tier] = deque(maxlen=1000)
+        return self.tiers[tier]
+
+    def record(self, tier: str, elapsed: float, error: bool = False) -> None:
+        stats = self._tier(tier)
+        stats["requests"] += 1
+        if error:
+            stats["errors"] += 1
+        self.latencies[tier].append(elapsed)
+
+    def record_escalation(self, tier: str) -> None:
+        """A request that gave up on `tier`; it is recorded once, under the tier that answered."""
+        self._tier(tier)["escalations"] += 1
+
+    def handle(self, event, **kwargs) -> None:
+        if not isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            return
+        tier = current_route.get()
+        if tier is None or event.response is None:
+            return
+        stats = self._tier(tier)
+        stats["llm_calls"] += 1
+        usage = extract_cache_usage(getattr(event.response, "raw", None))
+        if usage is not None:
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for tier, stats in self.tiers.items():
+            latencies = sorted(self.latencies[tier])
+            result[tier] = {
+                **stats,
+                "llm_calls_per_request": round(stats["llm_calls"] / stats["requests"], 2)
+                if stats["requests"] else 0.0,
+                "latency_ms_p50": round(1000 * latencies[len(latencies) // 2], 1)
+                if latencies else 0.0,
+                "latency_ms_p95": round(1000 * latencies[int(len(latencies) * 0.95) - 1], 1)
+                if latencies else 0.0,
+            }
+        return result
+
+
+router_stats = RouterStats()
+get_dispatcher().add_event_handler(router_stats)
+register_stats("router", router_stats.stats)
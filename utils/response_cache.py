@@ -0,0 +1,242 @@
+"""Cache of final agent answers for repeated, near-identical questions.
+
+Queries are normalized (case, punctuation, filler words) and turned into a
+sparse hashed n-gram vector, a CPU-only embedding that needs no model
+download. A lookup matches an entry with the same normalized text, or with a
+cosine similarity above the threshold. The entry must also mention exactly the
+same entities (token names, tickers, addresses), so "price of LOFI" never
+answers "price of HIPPO".
+
+An entry expires with the freshest data it used: the TTL is the smallest
+TTL of the tools called for the answer, and answers without tools last
+`static_ttl`. Answers without tools, or from user-specific tools, are stored
+per user (keyed by a hash of the jwt) instead of globally.
+"""
+
+import hashlib
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from commons.stats import register_stats
+from config.settings import settings
+
+DIMENSIONS = 1 << 18
+
+STOPWORDS = frozenset(
+    "a an the is are was were be of on in at to for and or me my i you your us we "
+    "what whats what's which show tell give list get find please can could would "
+    "now today currently right current latest some any about do does there this "
+    "sui coin coins token tokens pair pairs".split()
+)
+# Words describing what is asked; any other content word is an entity
+INTENT_WORDS = frozenset(
+    "price prices trending trend top hot market cap mcap marketcap "
+    "liquidity volume scan info information address contract chart change "
+    "performance metrics how much worth value hello hi hey thanks thank who".split()
+)
+# Follow-ups depend on the conversation, so they are never cached
+REFERENCE_PATTERN = re.compile(r"\b(it|its|it's|that|those|these|them|they|this one|same|above)\b")
+PUNCTUATION = re.compile(r"[^\w\s:$]")
+CONTRACTIONS = re.compile(r"'(s|re|m)\b|'")
+
+
+def normalize_query(query: str) -> str:
+    text = PUNCTUATION.sub(" ", CONTRACTIONS.sub("", query.lower()))
+    return " ".join(word for word in text.split() if word not in STOPWORDS)
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % DIMENSIONS
+
+
+def embed(normalized: str) -> Dict[int, float]:
+    """Sparse, L2-normalized vector of word unigrams/bigrams and char trigrams."""
+    words = normalized.split()
+    vector: Dict[int, float] = {}
+    features: List[Tuple[str, float]] = [(f"w:{w}", 1.0) for w in words]
+    features += [(f"b:{a} {b}", 0.7) for a, b in zip(words, words[1:])]
+    padded = f" {normalized} "
+    features += [(f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        index = _hash(feature)
+        vector[index] = vector.get(index, 0.0) + weight
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {index: value / norm for index, value in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+def entities(normalized: str) -> FrozenSet[str]:
+    return frozenset(word for word in normalized.split() if word not in INTENT_WORDS)
+
+
+@dataclass
+class _Entry:
+    normalized: str
+    vector: Dict[int, float]
+    entities: FrozenSet[str]
+    answer: str
+    scope: str
+    tools: Tuple[str, ...]
+    expires_at: float
+
+
+class ResponseCache:
+    """Similarity-keyed answer cache with tool-dependent TTLs."""
+
+    def __init__(
+        self,
+        tool_ttls: Dict[str, float],
+        static_ttl: float = 3600.0,
+        threshold: float = 0.8,
+        maxsize: int = 512,
+        user_scoped_tools: Iterable[str] = (),
+    ):
+        self.tool_ttls = dict(tool_ttls)
+        self.static_ttl = static_ttl
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.user_scoped_tools = frozenset(user_scoped_tools)
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._stats = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "skipped": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def user_scope(jwt_token: Optional[str]) -> str:
+        if not jwt_token:
+            return "user:anonymous"
+        return "user:" + hashlib.sha256(jwt_token.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def cacheable(query: str) -> bool:
+        return bool(query.strip()) and not REFERENCE_PATTERN.search(query.lower())
+
+    def ttl_for(self, tools: Iterable[str]) -> float:
+        ttls = [self.tool_ttls.get(tool, 0.0) for tool in tools]
+        return min(ttls) if ttls else self.static_ttl
+
+    def get(self, query: str, jwt_token: Optional[str] = None) -> Optional[str]:
+        """
+        Return a cached answer for query, if one is fresh and similar enough.
+
+        Args:
+            query (str): User's message
+            jwt_token (str, optional): Selects the user's private entries
+
+        Returns:
+            str or None: Cached answer
+        """
+        if not self.cacheable(query):
+            return None
+        normalized = normalize_query(query)
+        scopes = ("global", self.user_scope(jwt_token))
+        now = time.monotonic()
+
+        for scope in scopes:
+            entry = self._entries.get((scope, normalized))
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end((scope, normalized))
+                self._stats["exact_hits"] += 1
+                return entry.answer
+
+        vector = embed(normalized)
+        wanted = entities(normalized)
+        best: Optional[_Entry] = None
+        best_score = self.threshold
+        for key, entry in list(self._entries.items()):
+            if entry.expires_at <= now:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                continue
+            if entry.scope not in scopes or entry.entities != wanted:
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["similar_hits"] += 1
+        return best.answer
+
+    def put(
+        self,
+        query: str,
+        answer: str,
+        tools: Iterable[str],
+        jwt_token: Optional[str] = None,
+    ) -> None:
+        """
+        Store an answer produced by the agent.
+
+        Args:
+            query (str): User's message
+            answer (str): Final answer
+            tools (Iterable[str]): Names of the tools the run called
+            jwt_token (str, optional): Owner of user-scoped answers
+        """
+        tools = tuple(dict.fromkeys(tools))
+        ttl = self.ttl_for(tools)
+        if not answer or ttl <= 0 or not self.cacheable(query):
+            self._stats["skipped"] += 1
+            return
+        user_scoped = not tools or any(tool in self.user_scoped_tools for tool in tools)
+        scope = self.user_scope(jwt_token) if user_scoped else "global"
+        normalized = normalize_query(query)
+        self._entries[(scope, normalized)] = _Entry(
+            normalized=normalized,
+            vector=embed(normalized),
+            entities=entities(normalized),
+            answer=answer,
+            scope=scope,
+            tools=tools,
+            expires_at=time.monotonic() + ttl,
+        )
+        self._entries.move_to_end((scope, normalized))
+        self._stats["stores"] += 1
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._stats["exact_hits"] + self._stats["similar_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    tool_ttls={
+        "get_trending_pairs": settings.cache.trending_ttl,
+        "scan_token": settings.cache.top_pair_ttl,
+        "scan_tokens": settings.cache.top_pair_ttl,
+        "search_token": settings.cache.search_ttl,
+    },
+    static_ttl=settings.cache.response_static_ttl,
+    threshold=settings.cache.response_similarity,
+    maxsize=settings.cache.response_max_entries,
+)
+register_stats("response_cache", response_cache.stats)
@@ -0,0 +1,382 @@
+"""Local token index answering search_token without a remote round trip.
+
+Tokens are pulled in bulk from the paged trending lists every `interval`
+seconds (page 1 comes from the market snapshot when it is running, which
+already polls it), plus whatever the remote search returns on a miss, and saved to a
+JSON file so a restarted worker (or the Telegram bot, which only calls
+aload()) starts with the index loaded. The file is read once at startup, in
+a worker thread; lookups never touch the disk.
+
+A pull costs WORKERS x resolutions x (pages - 1) requests per interval with
+the snapshot running (one more page per resolution without it), e.g.
+5 x 4 x 4 = 80 every 10 minutes.
+
+Prices and liquidity in the index are as old as the token's last sighting,
+up to `expire`; callers must check `seen` before quoting them.
+
+Lookups are either exact, on the upper-case symbol (candidates ranked by
+liquidity), or fuzzy, on normalized symbols and names: a prefix match or
+trigram similarity for typos. Tokens not seen for `expire` seconds are
+dropped, so delisted tokens age out.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from commons.http_client import http_client
+from commons.stats import register_stats
+from config import settings
+from utils.concurrency import run_sync
+from utils.market_snapshot import market_snapshot
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+# Keys scanned past the insertion point of a prefix query
+PREFIX_SCAN = 50
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lower-case alphanumerics only, so 'Hippo Token' and 'hippo-token' match."""
+    return _NON_ALNUM.sub("", text.lower())
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TokenIndex:
+    """Symbol and name index over known tokens, persisted to disk."""
+
+    def __init__(
+        self,
+        path: str,
+        interval: float = 600.0,
+        pages: int = 5,
+        page_size: int = 100,
+        expire: float = 7 * 24 * 3600,
+        fuzzy_threshold: float = 0.5,
+    ):
+        self.path = path
+        self.interval = interval
+        self.pages = pages
+        self.page_size = page_size
+        self.expire = expire
+        self.fuzzy_threshold = fuzzy_threshold
+        # address -> {address, symbol, name, priceUsd, liquidityUsd, seen}
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        # upper-case symbol -> addresses
+        self._by_symbol: Dict[str, Set[str]] = {}
+        # normalized symbol, name or name word -> addresses
+        self._by_key: Dict[str, Set[str]] = {}
+        self._keys: List[str] = []
+        self._key_grams: Dict[str, int] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._loaded = False
+        self._pulled_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "exact": 0,
+            "fuzzy": 0,
+            "misses": 0,
+            "pulls": 0,
+            "pull_errors": 0,
+            "shared_pages": 0,
+            "last_pull_ms": 0.0,
+            "loaded": 0,
+        }
+
+    # Indexing
+
+    def _index(self, address: str, token: Dict[str, Any]) -> None:
+        if token["symbol"]:
+            self._by_symbol.setdefault(token["symbol"].upper(), set()).add(address)
+        keys = {normalize(token["symbol"]), normalize(token["name"])}
+        # Words of the name too, so 'deepbok' is close to 'DeepBook Token'
+        keys.update(normalize(word) for word in token["name"].split())
+        for key in keys:
+            if len(key) < 2:
+                continue
+            if key not in self._by_key:
+                self._by_key[key] = set()
+                insort(self._keys, key)
+                grams = trigrams(key)
+                self._key_grams[key] = len(grams)
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(key)
+            self._by_key[key].add(address)
+
+    def _reindex(self) -> None:
+        self._by_symbol, self._by_key, self._keys = {}, {}, []
+        self._key_grams, self._postings = {}, {}
+        for address, token in self._tokens.items():
+            self._index(address, token)
+
+    def ingest(self, pairs: Iterable[Dict[str, Any]], seen: Optional[float] = None) -> int:
+        """
+        Add or update the base tokens of pair payloads (trending or search docs).
+
+        Returns:
+            int: Number of tokens not in the index before
+        """
+        seen = seen or time.time()
+        added = 0
+        for pair in pairs:
+            base = pair.get("tokenBase") or {}
+            address = base.get("address")
+            if not address:
+                continue
+            token = {
+                "address": address,
+                "symbol": base.get("symbol") or "",
+                "name": base.get("name") or "",
+                "priceUsd": base.get("priceUsd"),
+                "liquidityUsd": _float(pair.get("liquidityUsd")),
+                "seen": seen,
+            }
+            previous = self._tokens.get(address)
+            # Entries are replaced, never mutated, so a snapshot copy stays consistent
+            self._tokens[address] = token
+            if previous is None:
+                added += 1
+                self._index(address, token)
+            elif (previous["symbol"], previous["name"]) != (token["symbol"], token["name"]):
+                # Renamed upstream; the old keys must go, which needs a rebuild
+                self._reindex()
+        return added
+
+    def expire_old(self, now: Optional[float] = None) -> int:
+        cutoff = (now or time.time()) - self.expire
+        expired = [a for a, token in self._tokens.items() if token["seen"] < cutoff]
+        for address in expired:
+            del self._tokens[address]
+        if expired:
+            self._reindex()
+        return len(expired)
+
+    # Lookups
+
+    def _ranked(self, addresses: Iterable[str]) -> List[Dict[str, Any]]:
+        tokens = (self._tokens[a] for a in addresses if a in self._tokens)
+        return sorted(tokens, key=lambda t: t["liquidityUsd"], reverse=True)
+
+    def exact(self, symbol: str) -> List[Dict[str, Any]]:
+        """Tokens with this symbol (case-insensitive), most liquid first."""
+        return self._ranked(self._by_symbol.get(symbol.strip().upper(), ()))
+
+    def fuzzy(self, query: str, limit: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Tokens whose symbol or name starts with, or is close to, the query.
+
+        Returns:
+            list: (score, token) pairs scoring at least fuzzy_threshold, best
+                score first and, within a score band, most liquid first
+        """
+        key = normalize(query)
+        if len(key) < 2:
+            return []
+
+        scores: Dict[str, float] = {}
+        start = bisect_left(self._keys, key)
+        for candidate in self._keys[start:start + PREFIX_SCAN]:
+            if not candidate.startswith(key):
+                break
+            scores[candidate] = 0.5 + 0.5 * len(key) / len(candidate)
+
+        grams = trigrams(key)
+        shared = Counter(k for gram in grams for k in self._postings.get(gram, ()))
+        for candidate, n in shared.items():
+            similarity = n / (len(grams) + self._key_grams[candidate] - n)
+            if similarity > scores.get(candidate, 0.0):
+                scores[candidate] = similarity
+
+        best: Dict[str, float] = {}
+        for candidate, score in scores.items():
+            if score < self.fuzzy_threshold:
+                continue
+            for address in self._by_key.get(candidate, ()):
+                best[address] = max(best.get(address, 0.0), score)
+        ranked = sorted(
+            best,
+            key=lambda a: (round(best[a], 1), self._tokens[a]["liquidityUsd"]),
+            reverse=True,
+        )
+        return [(best[a], self._tokens[a]) for a in ranked[:limit]]
+
+    def resolve(
+        self, query: str, min_liquidity: float = 0.0, limit: int = 10
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Answer a search locally.
+
+        Returns:
+            tuple: ("exact", tokens) for a symbol match, ("fuzzy", tokens) for
+                close matches above min_liquidity, or (None, []) when the
+                remote search should be asked
+        """
+        tokens = self.exact(query)
+        if tokens:
+            self._stats["exact"] += 1
+            return "exact", tokens
+        tokens = [t for _, t in self.fuzzy(query, limit) if t["liquidityUsd"] > min_liquidity]
+        if tokens:
+            self._stats["fuzzy"] += 1
+            return "fuzzy", tokens
+        self._stats["misses"] += 1
+        return None, []
+
+    # Persistence
+
+    def load(self) -> int:
+        """Load the snapshot on disk, if any. Returns the number of tokens loaded."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Could not read token index %s: %s", self.path, e)
+            return 0
+        if data.get("version") != SNAPSHOT_VERSION:
+            return 0
+        self._tokens = {token["address"]: token for token in data.get("tokens", [])}
+        self._pulled_at = data.get("pulled_at")
+        if not self.expire_old():
+            self._reindex()
+        self._stats["loaded"] = len(self._tokens)
+        return len(self._tokens)
+
+    def _write(self, tokens: List[Dict[str, Any]], pulled_at: Optional[float]) -> None:
+        # Every worker saves; a per-process temp file and a rename keep the file whole
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "pulled_at": pulled_at, "tokens": tokens},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    async def aload(self) -> int:
+        """Load the snapshot once, off the event loop."""
+        if self._loaded:
+            return len(self._tokens)
+        self._loaded = True
+        return await run_sync(self.load)
+
+    async def save(self) -> None:
+        await run_sync(self._write, list(self._tokens.values()), self._pulled_at)
+
+    # Bulk pulls
+
+    async def _request_page(self, resolution: str, page: int) -> List[Dict[str, Any]]:
+        response = await http_client.get(
+            f"{settings.raiden.api_common_url}/api/v1/sui/pairs/trending",
+            headers={"accept": "application/json"},
+            params={"page": page, "limit": self.page_size, "resolution": resolution,
+                    "network": "sui"},
+        )
+        response.raise_for_status()
+        return response.json() or []
+
+    async def _first_page(self, resolution: str) -> List[Dict[str, Any]]:
+        # The snapshot polls page 1 every few seconds; reuse it when it is as long
+        shared = market_snapshot.trending_page(resolution)
+        if shared is not None and market_snapshot.page_size >= self.page_size:
+            self._stats["shared_pages"] += 1
+            return shared[: self.page_size]
+        return await self._request_page(resolution, 1)
+
+    async def _pull_resolution(self, resolution: str) -> List[Dict[str, Any]]:
+        pairs = []
+        for page in range(1, self.pages + 1):
+            if page == 1:
+                batch = await self._first_page(resolution)
+            else:
+                batch = await self._request_page(resolution, page)
+            pairs.extend(batch)
+            if len(batch) < self.page_size:
+                break
+        return pairs
+
+    async def refresh(self) -> None:
+        """Pull the trending pages of every resolution, expire old tokens and save."""
+        started = time.perf_counter()
+        resolutions = [r.strip() for r in settings.market.resolutions.split(",") if r.strip()]
+        results = await asyncio.gather(
+            *(self._pull_resolution(r) for r in resolutions), return_exceptions=True
+        )
+        now = time.time()
+        pulled = False
+        for resolution, pairs in zip(resolutions, results):
+            if isinstance(pairs, BaseException):
+                self._stats["pull_errors"] += 1
+                logger.warning("Token index pull of %s failed: %s", resolution, pairs)
+                continue
+            self.ingest(pairs, seen=now)
+            pulled = True
+        if not pulled:
+            return
+        self.expire_old(now)
+        self._pulled_at = now
+        self._stats["pulls"] += 1
+        self._stats["last_pull_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        await self.save()
+
+    async def _run(self) -> None:
+        # A snapshot saved recently (e.g. by another worker) postpones the first pull
+        if self._pulled_at is not None:
+            await asyncio.sleep(max(0.0, self.interval - (time.time() - self._pulled_at)))
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._stats["pull_errors"] += 1
+                logger.warning("Token index refresh failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        await self.aload()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "tokens": len(self._tokens),
+            "symbols": len(self._by_symbol),
+            "keys": len(self._keys),
+            "age_s": None if self._pulled_at is None else round(time.time() - self._pulled_at, 1),
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+token_index = TokenIndex(
+    path=settings.token_index.path,
+    interval=settings.token_index.interval,
+    pages=settings.token_index.pages,
+    page_size=settings.token_index.page_size,
+    expire=settings.token_index.expire,
+    fuzzy_threshold=settings.token_index.fuzzy_threshold,
+)
+register_stats("token_index", token_index.stats)